@@ -0,0 +1,226 @@
+import asyncio
+import math
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional
+from urllib.parse import parse_qs
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.config import settings
+from app.content_negotiation import NegotiatedResponse, error_response
+
+# Requests are admitted per class, each with its own concurrency limit, so a
+# burst of slow searches cannot take the threads and connections that point
+# reads and writes need. Requests over the limit wait in a short bounded
+# queue; when that queue is full, or the wait times out, they are rejected
+# at once with 503 and Retry-After instead of piling up in the thread pool.
+# Long polls of the change feed have their own class without a queue: they
+# hold no thread or connection while they wait, but each one re-checks the
+# change log every second, so only `admission_long_poll_limit` run at once.
+
+READ = "read"
+WRITE = "write"
+BULK = "bulk"
+LONG_POLL = "long_poll"
+
+# Routes (below the API prefix) that scan many rows or move a lot of data
+BULK_ROUTES = [
+    ("GET", re.compile(r"/customers/?")),
+    ("GET", re.compile(r"/employments/?")),
+    ("GET", re.compile(r"/(customers|employments)/stats/geo")),
+    ("GET", re.compile(r"/customers/\d+/possible-duplicates")),
+    ("POST", re.compile(r"/imports/?")),
+    ("POST", re.compile(r"/admin/snapshots/?")),
+    ("GET", re.compile(r"/admin/snapshots/download")),
+    ("POST", re.compile(r"/admin/analytics/exports/?")),
+    ("GET", re.compile(r"/admin/analytics/exports/[^/]+")),
+]
+
+_MAX_CLIENTS = 10000
+
+
+def long_poll_wait(query_string: bytes) -> int:
+    """The `wait` seconds of a change feed request, 0 if it does not wait."""
+    wait = parse_qs(query_string.decode("latin-1")).get("wait", ["0"])[-1]
+    return int(wait) if wait.isdigit() else 0
+
+
+def route_class(method: str, path: str, query_string: bytes = b"") -> Optional[str]:
+    """Admission class of a request, or None if it is not limited."""
+    if method == "OPTIONS" or not path.startswith(settings.api_v1_str):
+        return None
+    path = path[len(settings.api_v1_str):]
+
+    # Long polls spend their time waiting on the change feed, not on a thread
+    if method == "GET" and path.rstrip("/") == "/changes" and long_poll_wait(query_string) > 0:
+        return LONG_POLL
+
+    for bulk_method, pattern in BULK_ROUTES:
+        if method == bulk_method and pattern.fullmatch(path):
+            return BULK
+    return READ if method in ("GET", "HEAD") else WRITE
+
+
+class ConcurrencyLimiter:
+    """At most `limit` requests at a time, with up to `queue_size` more waiting in arrival order."""
+
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        """Take a slot, waiting up to `timeout` seconds. Returns False if none was free."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        if len(self._waiters) >= self.queue_size:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return True
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the wait expired
+            if waiter.done() and not waiter.cancelled():
+                return True
+            waiter.cancel()
+            return False
+        except asyncio.CancelledError:
+            # The client went away, pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self) -> None:
+        # Hand the slot straight to the oldest waiter, so it cannot be taken by a newcomer
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {"active": self.active, "limit": self.limit, "waiting": self.waiting, "queue_size": self.queue_size}
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take a token, returning 0 or the seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    def __init__(self):
+        self.limiters = {
+            READ: ConcurrencyLimiter(settings.admission_read_limit, settings.admission_queue_size),
+            WRITE: ConcurrencyLimiter(settings.admission_write_limit, settings.admission_queue_size),
+            BULK: ConcurrencyLimiter(settings.admission_bulk_limit, settings.admission_queue_size),
+            # Rejected at once when full, a long poll would rather retry than queue
+            LONG_POLL: ConcurrencyLimiter(settings.admission_long_poll_limit, 0),
+        }
+        self.rejected: Dict[str, int] = {name: 0 for name in self.limiters}
+        self.rate_limited = 0
+        # Least recently seen clients are dropped first
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def client_retry_after(self, client: str) -> float:
+        """0 if the client may send another request, else the seconds until it may."""
+        if settings.admission_client_rate <= 0:
+            return 0.0
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = TokenBucket(settings.admission_client_rate, settings.admission_client_burst)
+            if len(self._buckets) > _MAX_CLIENTS:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+        return bucket.take()
+
+    def saturated(self) -> bool:
+        return any(limiter.waiting > 0 for limiter in self.limiters.values())
+
+    def stats(self) -> dict:
+        return {
+            name: {**limiter.stats(), "rejected": self.rejected[name]}
+            for name, limiter in self.limiters.items()
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """
+    Limit concurrent API requests per class (reads, writes, bulk/search) and,
+    when `admission_client_rate` is set, the request rate of each client.
+
+    Overload is answered with 503 (class at capacity) or 429 (client over its
+    rate), both with a Retry-After header. Requests outside the API prefix,
+    such as /health, are never limited.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.admission_control_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        request_class = route_class(scope["method"], scope["path"], scope.get("query_string", b""))
+        if request_class is None:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else ""
+        retry_after = self.controller.client_retry_after(client)
+        if retry_after:
+            self.controller.rate_limited += 1
+            await _reject(scope, 429, "Too many requests, slow down", retry_after)(scope, receive, send)
+            return
+
+        limiter = self.controller.limiters[request_class]
+        if not await limiter.acquire(settings.admission_queue_timeout_ms / 1000):
+            self.controller.rejected[request_class] += 1
+            await _reject(scope, 503, "Server is busy, retry later", settings.admission_retry_after_seconds)(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
+
+
+def _reject(scope: Scope, status_code: int, detail: str, retry_after: float) -> NegotiatedResponse:
+    return error_response(
+        Headers(scope=scope).get("accept", ""),
+        status_code=status_code,
+        content={"detail": detail, "status_code": status_code, "success": False},
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+    )
@@ -0,0 +1,242 @@
+import argparse
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, Table, select
+from app import models, sharding
+from app.config import settings
+from app.database import SessionLocal
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover
+    pyarrow = None
+
+# Column-oriented exports of the customers and employments tables for
+# analytics, so loading them does not page through the JSON API.
+#
+# Rows are streamed from the database in batches of
+# `analytics_export_batch_size` and each batch is written as one Arrow record
+# batch, so memory stays bounded by a batch whatever the table size. Both
+# tables of a shard are read in one transaction, a consistent snapshot when
+# the database runs in WAL mode. Files are written next to their destination
+# and moved into a new timestamped folder once complete; older folders beyond
+# `analytics_export_keep` are removed.
+#
+# Arrow IPC files can be memory-mapped and read without copying or decoding,
+# Parquet files are smaller and compressed. Readers load them with
+# read_export(), or pyarrow / pandas directly.
+
+TABLES: Dict[str, Table] = {
+    "customers": models.Customer.__table__,
+    "employments": models.Employment.__table__,
+}
+FORMATS = {
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+class AnalyticsExportError(Exception):
+    pass
+
+
+class ExportInProgress(AnalyticsExportError):
+    pass
+
+
+class ExportUnavailable(AnalyticsExportError):
+    pass
+
+
+_lock = threading.Lock()
+
+
+def _require_pyarrow() -> None:
+    if pyarrow is None:
+        raise ExportUnavailable("Analytics exports need pyarrow, install it with: pip install pyarrow")
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column.type, Integer):
+        return pyarrow.int64()
+    if isinstance(column.type, Float):
+        return pyarrow.float64()
+    if isinstance(column.type, DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(column.type, Date):
+        return pyarrow.date32()
+    return pyarrow.string()
+
+
+def arrow_schema(table: Table):
+    """The Arrow schema of an exported table, one field per column."""
+    _require_pyarrow()
+    return pyarrow.schema([
+        pyarrow.field(column.name, _arrow_type(column), nullable=column.nullable)
+        for column in table.columns
+    ])
+
+
+class _Writer:
+    def __init__(self, path: str, schema, export_format: str):
+        self._sink = None
+        if export_format == "parquet":
+            self._writer = pyarrow.parquet.ParquetWriter(path, schema, compression="zstd")
+        else:
+            self._sink = pyarrow.OSFile(path, "wb")
+            self._writer = pyarrow.ipc.new_file(self._sink, schema)
+
+    def write(self, batch) -> None:
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+
+
+def _export_table(connections: list, table: Table, path: str, export_format: str, batch_size: int) -> int:
+    schema = arrow_schema(table)
+    writer = _Writer(path, schema, export_format)
+    rows = 0
+    try:
+        for connection in connections:
+            result = connection.execution_options(yield_per=batch_size).execute(
+                select(table).order_by(table.c.id)
+            )
+            for partition in result.partitions():
+                columns = list(zip(*partition))
+                writer.write(pyarrow.RecordBatch.from_arrays(
+                    [pyarrow.array(values, type=field.type) for values, field in zip(columns, schema)],
+                    schema=schema
+                ))
+                rows += len(partition)
+    finally:
+        writer.close()
+    return rows
+
+
+def _prune(directory: str, keep: int) -> None:
+    folders = sorted(
+        name for name in os.listdir(directory)
+        if os.path.isdir(os.path.join(directory, name)) and not name.endswith(".partial")
+    )
+    for name in folders[:-keep] if keep > 0 else []:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+
+def create_export(
+    export_format: Optional[str] = None,
+    directory: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> List[dict]:
+    """
+    Export the customers and employments tables into a new timestamped folder
+    of `directory`, returning the path, rows, size and duration of each file.
+    Only one export runs at a time, ExportInProgress is raised while another
+    is in progress.
+    """
+    _require_pyarrow()
+    export_format = export_format or settings.analytics_export_format
+    if export_format not in FORMATS:
+        raise AnalyticsExportError(f"Unknown export format: {export_format}")
+    directory = directory or settings.analytics_export_directory
+    batch_size = batch_size or settings.analytics_export_batch_size
+    extension = FORMATS[export_format][0]
+
+    if not _lock.acquire(blocking=False):
+        raise ExportInProgress("Another analytics export is in progress")
+    try:
+        created_at = datetime.utcnow()
+        folder = os.path.join(directory, created_at.strftime("%Y%m%dT%H%M%S%f"))
+        # Written under a temporary name and renamed once every table is complete
+        partial_folder = f"{folder}.partial"
+        os.makedirs(partial_folder)
+
+        exports = []
+        db = SessionLocal()
+        try:
+            router = sharding.get_router(db)
+            connections = [sharding.connection_for_shard(db, shard_id) for shard_id in (router.shard_ids if router else [None])]
+            for name, table in TABLES.items():
+                started = time.perf_counter()
+                rows = _export_table(connections, table, os.path.join(partial_folder, f"{name}{extension}"), export_format, batch_size)
+                exports.append({
+                    "table": name,
+                    "format": export_format,
+                    "path": os.path.join(folder, f"{name}{extension}"),
+                    "rows": rows,
+                    "duration_seconds": round(time.perf_counter() - started, 3),
+                    "created_at": created_at,
+                })
+        except Exception as e:
+            shutil.rmtree(partial_folder, ignore_errors=True)
+            raise AnalyticsExportError(f"Analytics export failed: {e}") from e
+        finally:
+            db.close()
+
+        os.replace(partial_folder, folder)
+        for export in exports:
+            export["bytes"] = os.path.getsize(export["path"])
+        _prune(directory, settings.analytics_export_keep)
+        return exports
+    finally:
+        _lock.release()
+
+
+def latest_export(table: str, export_format: Optional[str] = None, directory: Optional[str] = None) -> Optional[str]:
+    """Path of the newest export of `table` in the given format, or None if there is none."""
+    export_format = export_format or settings.analytics_export_format
+    directory = directory or settings.analytics_export_directory
+    if table not in TABLES or export_format not in FORMATS or not os.path.isdir(directory):
+        return None
+    filename = f"{table}{FORMATS[export_format][0]}"
+    for name in sorted(os.listdir(directory), reverse=True):
+        path = os.path.join(directory, name, filename)
+        if not name.endswith(".partial") and os.path.isfile(path):
+            return path
+    return None
+
+
+def read_export(path: str):
+    """
+    Load an exported file as a pyarrow Table through a memory map.
+
+    Arrow IPC files are read without copying: the table's buffers point into
+    the mapped file and pages are loaded as columns are used. Parquet files
+    are decoded from the mapped file. Call `.to_pandas()` on the result for a
+    DataFrame.
+    """
+    _require_pyarrow()
+    if path.endswith(FORMATS["parquet"][0]):
+        return pyarrow.parquet.read_table(path, memory_map=True)
+    with pyarrow.memory_map(path, "r") as source:
+        return pyarrow.ipc.open_file(source).read_all()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the customers and employments tables as Arrow IPC or Parquet files for analytics."
+    )
+    parser.add_argument("--format", choices=list(FORMATS), default=None, help="Defaults to ANALYTICS_EXPORT_FORMAT")
+    parser.add_argument("--directory", default=None, help="Defaults to ANALYTICS_EXPORT_DIRECTORY")
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows per record batch, defaults to ANALYTICS_EXPORT_BATCH_SIZE")
+    args = parser.parse_args()
+
+    for export in create_export(export_format=args.format, directory=args.directory, batch_size=args.batch_size):
+        print(
+            f"{export['table']}: {export['path']}, {export['rows']} rows, "
+            f"{export['bytes']} bytes in {export['duration_seconds']}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.endpoints import customers, employments, registration
+from app.api.endpoints import analytics, changes, customers, employments, imports, registration, snapshots
 
 api_router = APIRouter()
 
@@ -20,4 +20,28 @@ api_router.include_router(
     registration.router,
     prefix="/registration",
     tags=["registration"]
-) 
\ No newline at end of file
+)
+
+api_router.include_router(
+    imports.router,
+    prefix="/imports",
+    tags=["imports"]
+)
+
+api_router.include_router(
+    changes.router,
+    prefix="/changes",
+    tags=["changes"]
+)
+
+api_router.include_router(
+    snapshots.router,
+    prefix="/admin/snapshots",
+    tags=["admin"]
+)
+
+api_router.include_router(
+    analytics.router,
+    prefix="/admin/analytics",
+    tags=["admin"]
+)
@@ -0,0 +1,85 @@
+import os
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from app.analytics_export import (
+    FORMATS,
+    AnalyticsExportError,
+    ExportInProgress,
+    ExportUnavailable,
+    create_export,
+    latest_export,
+)
+from app.api.endpoints.snapshots import require_admin_token
+from app.content_negotiation import ContentNegotiationRoute
+from app import schemas
+
+router = APIRouter(route_class=ContentNegotiationRoute)
+
+
+@router.post(
+    "/exports",
+    response_model=schemas.AnalyticsExportListResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_admin_token)]
+)
+def create_analytics_export(
+    format: schemas.AnalyticsExportFormat = Query(schemas.AnalyticsExportFormat.ARROW, description="arrow or parquet")
+):
+    """
+    Export the customers and employments tables as column-oriented files.
+
+    Rows are streamed from the database in batches into one file per table,
+    in a new folder of the server's analytics export directory. Download
+    them with `GET /exports/{table}`.
+
+    - **format**: Arrow IPC (memory-mappable) or Parquet (smaller)
+    """
+    try:
+        exports = create_export(export_format=format.value)
+    except ExportUnavailable as e:
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail=str(e)
+        )
+    except ExportInProgress as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except AnalyticsExportError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+    return schemas.AnalyticsExportListResponse(exports=exports)
+
+
+@router.get("/exports/{table}", dependencies=[Depends(require_admin_token)])
+def download_analytics_export(
+    table: schemas.AnalyticsTable,
+    format: schemas.AnalyticsExportFormat = Query(schemas.AnalyticsExportFormat.ARROW, description="arrow or parquet")
+):
+    """
+    Download the latest export of a table.
+
+    The file is served as written by the export, without querying the
+    database. Load it with `app.analytics_export.read_export`, or with
+    pyarrow or pandas.
+
+    - **table**: customers or employments
+    - **format**: The format of the export to download
+    """
+    path = latest_export(table.value, format.value)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No {format.value} export of {table.value} found, create one with POST /exports"
+        )
+
+    extension, media_type = FORMATS[format.value]
+    created = os.path.basename(os.path.dirname(path))
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=f"{table.value}-{created}{extension}"
+    )
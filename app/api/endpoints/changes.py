@@ -0,0 +1,72 @@
+import json
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.changes import change_feed
+from app.content_negotiation import ContentNegotiationRoute
+from app.database import get_read_db
+from app import crud, schemas
+
+router = APIRouter(route_class=ContentNegotiationRoute)
+
+
+def _read_changes(db: Session, since: int, limit: int) -> list:
+    changes = crud.ChangeLogCRUD.get_changes(db, since, limit)
+    # Give the connection back to the pool, a long poll holds none while it
+    # waits. Closing detaches the loaded changes, they stay readable.
+    db.close()
+    return changes
+
+
+@router.get("/", response_model=schemas.ChangeListResponse)
+async def get_changes(
+    request: Request,
+    since: int = Query(0, ge=0, description="Return changes with a sequence number greater than this"),
+    limit: int = Query(100, ge=1, le=1000, description="Number of changes to return"),
+    wait: int = Query(0, ge=0, le=60, description="Seconds to wait for new changes when none are available"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve customer and employment changes in commit order.
+    
+    Pass the returned `next_since` as `since` on the next call to sync
+    incrementally. With `wait` set, the request is held open (long polling)
+    until a new change is committed or the wait expires.
+    
+    - **since**: Sequence number of the last change already seen
+    - **limit**: Maximum number of changes to return (max 1000)
+    - **wait**: Seconds to wait for new changes (max 60)
+    """
+    version = change_feed.version
+    changes = await run_in_threadpool(_read_changes, db, since, limit + 1)
+    
+    # Re-check at least every second so commits from other processes are seen too,
+    # and stop waiting once the client has gone away
+    deadline = getattr(request.state, "deadline", None)
+    remaining = wait
+    while not changes and remaining > 0 and not (deadline and deadline.disconnected):
+        timeout = min(remaining, 1)
+        await change_feed.wait(version, timeout)
+        remaining -= timeout
+        version = change_feed.version
+        changes = await run_in_threadpool(_read_changes, db, since, limit + 1)
+    
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    
+    return schemas.ChangeListResponse(
+        changes=[
+            schemas.ChangeResponse(
+                seq=change.seq,
+                entity=change.entity,
+                entity_id=change.entity_id,
+                customer_id=change.customer_id,
+                operation=change.operation,
+                data=json.loads(change.data) if change.data else None,
+                created_at=change.created_at
+            )
+            for change in changes
+        ],
+        next_since=changes[-1].seq if changes else since,
+        has_more=has_more
+    )
@@ -1,20 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from fastapi.encoders import jsonable_encoder
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
-from app import crud, schemas
+from datetime import datetime
+from app.config import settings
+from app.content_negotiation import NegotiatedResponse, json_body_response, json_negotiated
+from app.database import get_db, get_read_db
+from app.single_flight import SingleFlightRoute
+from app import crud, dedup, models, read_model, schemas
 
-router = APIRouter()
+router = APIRouter(route_class=SingleFlightRoute)
+
+
+def idempotent_replay(db: Session, key: str, path: str, request_hash: str) -> Optional[Response]:
+    """The stored response of an earlier POST with the same Idempotency-Key, or None."""
+    stored = crud.IdempotencyCRUD.get_response(
+        db=db,
+        key=key,
+        method="POST",
+        path=path,
+        request_hash=request_hash
+    )
+    if stored is None:
+        return None
+    # Stored as JSON, re-encoded when the retry negotiated another format
+    return json_body_response(
+        stored.response_body,
+        status_code=stored.status_code,
+        headers={"Idempotent-Replayed": "true"}
+    )
 
 
 @router.post("/", response_model=schemas.CustomerResponse, status_code=status.HTTP_201_CREATED)
 def create_customer(
     customer: schemas.CustomerCreate,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db)
 ):
     """
     Create a new customer.
     
+    Send an `Idempotency-Key` header to make retries safe: a repeated request
+    with the same key replays the original response instead of creating the
+    customer again.
+    
     - **first_name**: Customer's first name (required)
     - **last_name**: Customer's last name (required)
     - **email**: Customer's email address (required, must be unique)
@@ -26,7 +55,34 @@ def create_customer(
     - **postal_code**: Customer's postal code (required)
     - **country**: Customer's country (required)
     """
-    return crud.CustomerCRUD.create_customer(db=db, customer_data=customer)
+    if not idempotency_key:
+        return crud.CustomerCRUD.create_customer(db=db, customer_data=customer)
+    
+    request_hash = crud.IdempotencyCRUD.hash_request(customer.dict())
+    replay = idempotent_replay(db, idempotency_key, "/customers", request_hash)
+    if replay:
+        return replay
+    
+    # Stored in the same transaction as the customer, a retry finds both or neither
+    def store_response(db_customer: models.Customer) -> None:
+        crud.IdempotencyCRUD.add_response(
+            db=db,
+            key=idempotency_key,
+            method="POST",
+            path="/customers",
+            request_hash=request_hash,
+            status_code=status.HTTP_201_CREATED,
+            response_body=schemas.CustomerResponse.from_orm(db_customer).json()
+        )
+    
+    try:
+        return crud.CustomerCRUD.create_customer(db=db, customer_data=customer, before_commit=store_response)
+    except HTTPException:
+        # A concurrent request with the same key committed first, answer with its response
+        replay = idempotent_replay(db, idempotency_key, "/customers", request_hash)
+        if replay:
+            return replay
+        raise
 
 
 @router.get("/", response_model=schemas.CustomerListResponse)
@@ -35,43 +91,150 @@ def get_customers(
     limit: int = Query(100, ge=1, le=1000, description="Number of records to return"),
     search: Optional[str] = Query(None, description="Search in name, email, or city"),
     is_active: Optional[bool] = Query(None, description="Filter by active status"),
-    db: Session = Depends(get_db)
+    country: Optional[str] = Query(None, description="Filter by country (exact match)"),
+    state: Optional[str] = Query(None, description="Filter by state/province (exact match)"),
+    city: Optional[str] = Query(None, description="Filter by city (exact match)"),
+    updated_since: Optional[datetime] = Query(None, description="Only records created or modified at or after this time (UTC)"),
+    created_since: Optional[datetime] = Query(None, description="Only records created at or after this time (UTC)"),
+    after_id: Optional[int] = Query(None, ge=0, description="Keyset pagination: return records with an ID greater than this"),
+    include_archived: bool = Query(False, description="Also return archived customers"),
+    include: Optional[schemas.CustomerInclude] = Query(None, description="Embed related data in each customer: employment"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve a list of customers with pagination and filtering.
     
+    With `include=employment` every customer comes with its employment, as
+    in `GET /customers/{customer_id}`, so listing customers with their jobs
+    takes one request instead of one more per customer.
+    
     - **skip**: Number of records to skip for pagination
     - **limit**: Maximum number of records to return (max 1000)
     - **search**: Search term to filter customers by name, email, or city
     - **is_active**: Filter by customer active status
+    - **country**, **state**, **city**: Only customers in exactly this location
+    - **updated_since**: Only customers created or modified at or after this time, ordered by modification time
+    - **created_since**: Only customers created at or after this time
+    - **after_id**: Return customers with an ID greater than this, in ID order. Pass the last ID of the previous page instead of `skip` for efficient deep pagination
+    - **include_archived**: Also return customers moved to the archive (sorted by ID unless `updated_since` is given)
+    - **include**: `employment` to embed each customer's current (else most recent) employment
     """
+    include_employment = include == schemas.CustomerInclude.EMPLOYMENT
+    page = skip // limit + 1 if limit > 0 else 1
+    # The read model holds prebuilt JSON, other formats are encoded from the rows
+    if settings.read_model_enabled and json_negotiated() and not include_archived:
+        customers, total = crud.CustomerReadModelCRUD.get_customers(
+            db=db,
+            skip=skip,
+            limit=limit,
+            search=search,
+            is_active=is_active,
+            country=country,
+            state=state,
+            city=city,
+            updated_since=updated_since,
+            created_since=created_since,
+            after_id=after_id,
+            include_employment=include_employment
+        )
+        return json_body_response(read_model.list_json(customers, total, page, len(customers)))
+    
     customers, total = crud.CustomerCRUD.get_customers(
         db=db, 
         skip=skip, 
         limit=limit,
         search=search,
-        is_active=is_active
+        is_active=is_active,
+        country=country,
+        state=state,
+        city=city,
+        updated_since=updated_since,
+        created_since=created_since,
+        after_id=after_id,
+        include_archived=include_archived
     )
     
+    if include_employment:
+        # All employments of the page in one query instead of one per customer
+        employments = crud.EmploymentCRUD.get_employments_by_customers(
+            db=db,
+            customer_ids=[customer.id for customer in customers],
+            include_archived=include_archived
+        )
+        response = schemas.CustomerWithEmploymentListResponse(
+            customers=[
+                schemas.CustomerWithEmploymentResponse(**customer.__dict__, employment=employments.get(customer.id))
+                for customer in customers
+            ],
+            total=total,
+            page=page,
+            size=len(customers)
+        )
+        # Returned as is, the declared response model would drop the employments
+        if json_negotiated():
+            return json_body_response(response.json())
+        return NegotiatedResponse(jsonable_encoder(response))
+    
     return schemas.CustomerListResponse(
         customers=customers,
         total=total,
-        page=skip // limit + 1 if limit > 0 else 1,
+        page=page,
         size=len(customers)
     )
 
 
+@router.get("/stats/geo", response_model=schemas.GeoStatsResponse)
+def get_customer_geo_stats(
+    level: schemas.GeoLevel = Query(schemas.GeoLevel.COUNTRY, description="Group by country, state or city"),
+    country: Optional[str] = Query(None, description="Only locations in this country"),
+    state: Optional[str] = Query(None, description="Only locations in this state/province"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Count customers per country, state or city, largest groups first.
+    
+    Counts come from precomputed rollups, so the cost depends on the number
+    of locations rather than the number of customers. `active_count` counts
+    only active customers.
+    
+    - **level**: Group by `country`, `state` or `city`
+    - **country**: Drill down into one country
+    - **state**: Drill down into one state/province
+    """
+    groups = crud.GeoStatsCRUD.get_geo_stats(
+        db=db,
+        entity="customer",
+        level=level.value,
+        country=country,
+        state=state
+    )
+    
+    return schemas.GeoStatsResponse(
+        level=level,
+        groups=groups,
+        total=sum(group["count"] for group in groups)
+    )
+
+
 @router.get("/{customer_id}", response_model=schemas.CustomerWithEmploymentResponse)
 def get_customer(
     customer_id: int,
-    db: Session = Depends(get_db)
+    include_archived: bool = Query(False, description="Also look in archived customers"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve a specific customer by ID with their employment information.
     
     - **customer_id**: The ID of the customer to retrieve
+    - **include_archived**: Also look in archived customers
     """
-    customer = crud.CustomerCRUD.get_customer(db=db, customer_id=customer_id)
+    if settings.read_model_enabled and json_negotiated():
+        body = crud.CustomerReadModelCRUD.get_customer_json(db=db, customer_id=customer_id)
+        if body:
+            return json_body_response(body)
+    
+    # Archived customers are not in the read model
+    customer = crud.ReadCRUD.get_customer(db=db, customer_id=customer_id, include_archived=include_archived)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -79,14 +242,94 @@ def get_customer(
         )
     
     # Get employment information
-    employment = crud.EmploymentCRUD.get_employment_by_customer(db=db, customer_id=customer_id)
+    employment = crud.ReadCRUD.get_employment_by_customer(
+        db=db,
+        customer_id=customer_id,
+        include_archived=include_archived
+    )
     
     return schemas.CustomerWithEmploymentResponse(
-        **customer.__dict__,
+        **customer,
         employment=employment
     )
 
 
+@router.get("/{customer_id}/possible-duplicates", response_model=schemas.PossibleDuplicateListResponse)
+def get_possible_duplicates(
+    customer_id: int,
+    limit: int = Query(20, ge=1, le=100, description="Number of candidates to return"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Find customers that may be the same person as this one.
+    
+    Candidates share a phone number, a similar-sounding name with the same
+    date of birth, or a postal code and similar-sounding last name. The
+    score is the fraction of these keys that match.
+    
+    - **customer_id**: The ID of the customer to check
+    - **limit**: Maximum number of candidates to return, best matches first
+    """
+    customer = crud.CustomerCRUD.get_customer(db=db, customer_id=customer_id)
+    if not customer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    
+    duplicates, total = crud.DuplicateCRUD.get_possible_duplicates(db=db, customer_id=customer_id, limit=limit)
+    
+    return schemas.PossibleDuplicateListResponse(
+        customer_id=customer_id,
+        duplicates=[
+            schemas.PossibleDuplicateResponse(
+                customer=duplicate,
+                matched_keys=matched_keys,
+                score=round(len(matched_keys) / len(dedup.KEY_TYPES), 2)
+            )
+            for duplicate, matched_keys in duplicates
+        ],
+        total=total
+    )
+
+
+@router.get("/{customer_id}/employments", response_model=schemas.EmploymentHistoryResponse)
+def get_employment_history(
+    customer_id: int,
+    skip: int = Query(0, ge=0, description="Number of records to skip"),
+    limit: int = Query(20, ge=1, le=100, description="Number of records to return"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve a customer's employment history, newest first.
+    
+    - **customer_id**: The ID of the customer
+    - **skip**: Number of records to skip for pagination
+    - **limit**: Maximum number of records to return (max 100)
+    """
+    customer = crud.CustomerCRUD.get_customer(db=db, customer_id=customer_id)
+    if not customer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    
+    employments, total = crud.EmploymentCRUD.get_employment_history(
+        db=db,
+        customer_id=customer_id,
+        skip=skip,
+        limit=limit
+    )
+    
+    return schemas.EmploymentHistoryResponse(
+        customer_id=customer_id,
+        employments=employments,
+        total=total,
+        page=skip // limit + 1 if limit > 0 else 1,
+        size=len(employments)
+    )
+
+
 @router.put("/{customer_id}", response_model=schemas.CustomerResponse)
 def update_customer(
     customer_id: int,
@@ -141,14 +384,22 @@ def hard_delete_customer(
 @router.get("/email/{email}", response_model=schemas.CustomerWithEmploymentResponse)
 def get_customer_by_email(
     email: str,
-    db: Session = Depends(get_db)
+    include_archived: bool = Query(False, description="Also look in archived customers"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve a customer by email address.
     
     - **email**: The email address of the customer to retrieve
+    - **include_archived**: Also look in archived customers
     """
-    customer = crud.CustomerCRUD.get_customer_by_email(db=db, email=email)
+    if settings.read_model_enabled and json_negotiated():
+        body = crud.CustomerReadModelCRUD.get_customer_json_by_email(db=db, email=email)
+        if body:
+            return json_body_response(body)
+    
+    # Archived customers are not in the read model
+    customer = crud.ReadCRUD.get_customer_by_email(db=db, email=email, include_archived=include_archived)
     if not customer:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -156,9 +407,48 @@ def get_customer_by_email(
         )
     
     # Get employment information
-    employment = crud.EmploymentCRUD.get_employment_by_customer(db=db, customer_id=customer.id)
+    employment = crud.ReadCRUD.get_employment_by_customer(
+        db=db,
+        customer_id=customer["id"],
+        include_archived=include_archived
+    )
+    
+    return schemas.CustomerWithEmploymentResponse(
+        **customer,
+        employment=employment
+    )
+
+
+@router.get("/phone/{phone}", response_model=schemas.CustomerWithEmploymentResponse)
+def get_customer_by_phone(
+    phone: str,
+    db: Session = Depends(get_read_db)
+):
+    """
+    Retrieve a customer by phone number, e.g. from a caller ID.
+    
+    Formatting is ignored, so "+1 (555) 123-4567" and "5551234567" match the
+    same customer. If several customers share the number, active customers
+    come first, then the oldest.
+    
+    - **phone**: The phone number of the customer to retrieve
+    """
+    customer = crud.CustomerCRUD.get_customer_by_phone(db=db, phone=phone)
+    if not customer:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Customer not found"
+        )
+    
+    if settings.read_model_enabled and json_negotiated():
+        body = crud.CustomerReadModelCRUD.get_customer_json(db=db, customer_id=customer.id)
+        if body:
+            return json_body_response(body)
+    
+    # Get employment information
+    employment = crud.ReadCRUD.get_employment_by_customer(db=db, customer_id=customer.id)
     
     return schemas.CustomerWithEmploymentResponse(
         **customer.__dict__,
         employment=employment
-    ) 
\ No newline at end of file
+    )
@@ -1,10 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import datetime
+from app.database import SessionLocal, get_db, get_read_db
+from app.single_flight import SingleFlightRoute
+from app.suggest import suggestion_index
 from app import crud, schemas
 
-router = APIRouter()
+router = APIRouter(route_class=SingleFlightRoute)
 
 
 @router.post("/", response_model=schemas.EmploymentResponse, status_code=status.HTTP_201_CREATED)
@@ -16,6 +20,9 @@ def create_employment(
     """
     Create employment information for a customer.
     
+    A customer can have several employments. Adding a current employment
+    moves the previous current one into the history.
+    
     - **customer_id**: The ID of the customer
     - **company_name**: Name of the company (required)
     - **job_title**: Job title/position (required)
@@ -45,7 +52,12 @@ def get_employments(
     search: Optional[str] = Query(None, description="Search in company name, job title, or department"),
     employment_type: Optional[str] = Query(None, description="Filter by employment type"),
     is_current: Optional[bool] = Query(None, description="Filter by current employment status"),
-    db: Session = Depends(get_db)
+    work_country: Optional[str] = Query(None, description="Filter by work country (exact match)"),
+    work_city: Optional[str] = Query(None, description="Filter by work city (exact match)"),
+    updated_since: Optional[datetime] = Query(None, description="Only records created or modified at or after this time (UTC)"),
+    created_since: Optional[datetime] = Query(None, description="Only records created at or after this time (UTC)"),
+    after_id: Optional[int] = Query(None, ge=0, description="Keyset pagination: return records with an ID greater than this"),
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve a list of employments with pagination and filtering.
@@ -55,6 +67,10 @@ def get_employments(
     - **search**: Search term to filter employments by company, job title, or department
     - **employment_type**: Filter by employment type
     - **is_current**: Filter by current employment status
+    - **work_country**, **work_city**: Only employments at exactly this work location
+    - **updated_since**: Only employments created or modified at or after this time, ordered by modification time
+    - **created_since**: Only employments created at or after this time
+    - **after_id**: Return employments with an ID greater than this, in ID order. Pass the last ID of the previous page instead of `skip` for efficient deep pagination
     """
     employments, total = crud.EmploymentCRUD.get_employments(
         db=db, 
@@ -62,7 +78,12 @@ def get_employments(
         limit=limit,
         search=search,
         employment_type=employment_type,
-        is_current=is_current
+        is_current=is_current,
+        work_country=work_country,
+        work_city=work_city,
+        updated_since=updated_since,
+        created_since=created_since,
+        after_id=after_id
     )
     
     return schemas.EmploymentListResponse(
@@ -73,10 +94,71 @@ def get_employments(
     )
 
 
+@router.get("/stats/geo", response_model=schemas.GeoStatsResponse)
+def get_employment_geo_stats(
+    level: schemas.GeoLevel = Query(schemas.GeoLevel.COUNTRY, description="Group by work country, state or city"),
+    country: Optional[str] = Query(None, description="Only work locations in this country"),
+    state: Optional[str] = Query(None, description="Only work locations in this state/province"),
+    db: Session = Depends(get_read_db)
+):
+    """
+    Count employments per work country, state or city, largest groups first.
+    
+    Counts come from precomputed rollups, so the cost depends on the number
+    of locations rather than the number of employments. `active_count` counts
+    only current employments.
+    
+    - **level**: Group by `country`, `state` or `city` of the work location
+    - **country**: Drill down into one work country
+    - **state**: Drill down into one work state/province
+    """
+    groups = crud.GeoStatsCRUD.get_geo_stats(
+        db=db,
+        entity="employment",
+        level=level.value,
+        country=country,
+        state=state
+    )
+    
+    return schemas.GeoStatsResponse(
+        level=level,
+        groups=groups,
+        total=sum(group["count"] for group in groups)
+    )
+
+
+@router.get("/suggest", response_model=schemas.SuggestionListResponse)
+async def suggest_employment_values(
+    field: schemas.SuggestField = Query(..., description="Field to complete"),
+    prefix: str = Query(..., min_length=1, max_length=100, description="What the user has typed so far"),
+    limit: int = Query(10, ge=1, le=50, description="Number of suggestions to return"),
+):
+    """
+    Suggest company names or job titles for typeahead completion.
+    
+    Returns the distinct values of the field that start with the prefix,
+    ignoring case, most used first. Served from an in-memory index, the
+    database is not queried.
+    
+    - **field**: `company_name` or `job_title`
+    - **prefix**: Beginning of the value (case-insensitive)
+    - **limit**: Number of suggestions to return (max 50)
+    """
+    if not suggestion_index.built:
+        await run_in_threadpool(suggestion_index.rebuild, SessionLocal)
+    
+    suggestions = suggestion_index.suggest(field.value, prefix, limit)
+    return schemas.SuggestionListResponse(
+        field=field,
+        prefix=prefix,
+        suggestions=[schemas.SuggestionResponse(value=value, count=count) for value, count in suggestions]
+    )
+
+
 @router.get("/{employment_id}", response_model=schemas.EmploymentWithCustomerResponse)
 def get_employment(
     employment_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Retrieve a specific employment by ID with customer information.
@@ -96,14 +178,16 @@ def get_employment(
 @router.get("/customer/{customer_id}", response_model=schemas.EmploymentResponse)
 def get_employment_by_customer(
     customer_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
-    Retrieve employment information for a specific customer.
+    Retrieve the current employment of a specific customer, or the most
+    recent one if the customer has no current job. The full history is at
+    `GET /customers/{customer_id}/employments`.
     
     - **customer_id**: The ID of the customer
     """
-    employment = crud.EmploymentCRUD.get_employment_by_customer(db=db, customer_id=customer_id)
+    employment = crud.ReadCRUD.get_employment_by_customer(db=db, customer_id=customer_id)
     if not employment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
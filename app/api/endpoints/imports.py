@@ -0,0 +1,83 @@
+import json
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.orm import Session
+from app.content_negotiation import ContentNegotiationRoute
+from app.database import get_db
+from app.imports import import_runner
+from app import crud, models, schemas
+
+router = APIRouter(route_class=ContentNegotiationRoute)
+
+
+def _job_response(job: models.ImportJob) -> schemas.ImportJobResponse:
+    return schemas.ImportJobResponse(
+        job_id=job.id,
+        filename=job.filename,
+        status=job.status,
+        total_bytes=job.total_bytes,
+        bytes_processed=job.bytes_processed,
+        progress=round(100 * job.bytes_processed / job.total_bytes, 2) if job.total_bytes else 100.0,
+        rows_processed=job.rows_processed,
+        rows_imported=job.rows_imported,
+        rows_failed=job.rows_failed,
+        rows_per_second=round(job.rows_processed / job.processing_seconds, 1) if job.processing_seconds else None,
+        errors=json.loads(job.errors) if job.errors else [],
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        updated_at=job.updated_at,
+        completed_at=job.completed_at
+    )
+
+
+@router.post("/", response_model=schemas.ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+def create_import(
+    file: UploadFile = File(..., description="UTF-8 CSV file with a header row"),
+    db: Session = Depends(get_db)
+):
+    """
+    Upload a CSV file of customer registrations for background import.
+    
+    The header names the columns, which are the customer and employment
+    fields of `POST /registration/` without nesting (e.g. `email`,
+    `company_name`). Required fields must have a column; empty cells of
+    optional fields are treated as missing.
+    
+    Rows are validated like `POST /registration/` and committed in chunks.
+    Invalid rows and already registered emails are reported per row without
+    stopping the import. An import interrupted by a restart resumes after
+    its last committed chunk. Use the returned job ID with
+    `GET /imports/{job_id}` to follow its progress.
+    """
+    try:
+        job = import_runner.submit(db=db, upload=file.file, filename=file.filename or "upload.csv")
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    return _job_response(job)
+
+
+@router.get("/{job_id}", response_model=schemas.ImportJobResponse)
+def get_import(
+    job_id: str,
+    db: Session = Depends(get_db)
+):
+    """
+    Retrieve the progress of a CSV import.
+    
+    - **job_id**: The job ID returned by `POST /imports/`
+    
+    Reports the bytes and rows processed so far, the import throughput in
+    rows per second, and the first row errors (up to `IMPORT_MAX_ERRORS`).
+    """
+    job = crud.ImportJobCRUD.get_job(db, job_id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found"
+        )
+    
+    return _job_response(job)
@@ -1,14 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
+from typing import Optional
+from app.config import settings
+from app.api.endpoints.customers import idempotent_replay
+from app.content_negotiation import ContentNegotiationRoute
 from app.database import get_db
+from app.registration_queue import registration_queue
 from app import crud, schemas
 
-router = APIRouter()
+router = APIRouter(route_class=ContentNegotiationRoute)
 
 
 @router.post("/", response_model=schemas.CustomerWithEmploymentResponse, status_code=status.HTTP_201_CREATED)
 def register_customer_with_employment(
     registration: schemas.CustomerRegistration,
+    idempotency_key: Optional[str] = Header(None, max_length=255),
     db: Session = Depends(get_db)
 ):
     """
@@ -17,6 +23,10 @@ def register_customer_with_employment(
     This endpoint creates both customer and employment records atomically.
     If either creation fails, the entire transaction is rolled back.
     
+    Send an `Idempotency-Key` header to make retries safe: a repeated request
+    with the same key replays the original response instead of registering
+    the customer again.
+    
     **Customer Information:**
     - **first_name**: Customer's first name (required)
     - **last_name**: Customer's last name (required)
@@ -44,10 +54,33 @@ def register_customer_with_employment(
     - **work_country**: Work country (optional)
     - **is_current_employment**: Whether this is current employment (default: True)
     """
+    store_response = None
+    if idempotency_key:
+        request_hash = crud.IdempotencyCRUD.hash_request(registration.dict())
+        replay = idempotent_replay(db, idempotency_key, "/registration", request_hash)
+        if replay:
+            return replay
+        
+        # Stored in the same transaction as the registration, a retry finds both or neither
+        def store_response(customer, employment) -> None:
+            crud.IdempotencyCRUD.add_response(
+                db=db,
+                key=idempotency_key,
+                method="POST",
+                path="/registration",
+                request_hash=request_hash,
+                status_code=status.HTTP_201_CREATED,
+                response_body=schemas.CustomerWithEmploymentResponse(
+                    **customer.__dict__,
+                    employment=employment
+                ).json()
+            )
+    
     try:
         customer, employment = crud.CustomerRegistrationCRUD.create_customer_with_employment(
             db=db, 
-            registration_data=registration
+            registration_data=registration,
+            before_commit=store_response
         )
         
         return schemas.CustomerWithEmploymentResponse(
@@ -56,6 +89,11 @@ def register_customer_with_employment(
         )
         
     except HTTPException:
+        # A concurrent request with the same key committed first, answer with its response
+        if idempotency_key:
+            replay = idempotent_replay(db, idempotency_key, "/registration", request_hash)
+            if replay:
+                return replay
         # Re-raise HTTP exceptions as they already have proper status codes
         raise
     except Exception as e:
@@ -63,4 +101,53 @@ def register_customer_with_employment(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Registration failed: {str(e)}"
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.post("/async", response_model=schemas.RegistrationTicketResponse, status_code=status.HTTP_202_ACCEPTED)
+def enqueue_registration(
+    registration: schemas.CustomerRegistration
+):
+    """
+    Accept a registration for background processing.
+    
+    The request is validated immediately and queued for the background writer,
+    which persists queued registrations in batched transactions. Use the
+    returned ticket ID with `GET /registration/tickets/{ticket_id}` to check
+    the outcome.
+    
+    Accepts the same body as `POST /registration/`.
+    """
+    if not settings.registration_queue_enabled:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Asynchronous registration is disabled"
+        )
+    
+    ticket = registration_queue.submit(registration)
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Registration queue is full, retry later"
+        )
+    
+    return ticket
+
+
+@router.get("/tickets/{ticket_id}", response_model=schemas.RegistrationTicketResponse)
+def get_registration_ticket(
+    ticket_id: str
+):
+    """
+    Retrieve the status of an asynchronous registration.
+    
+    - **ticket_id**: The ticket ID returned by `POST /registration/async`
+    """
+    ticket = registration_queue.get_ticket(ticket_id)
+    if not ticket:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Registration ticket not found"
+        )
+    
+    return ticket
@@ -0,0 +1,101 @@
+import hmac
+import shutil
+import tempfile
+from typing import List, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
+from app.config import settings
+from app.content_negotiation import ContentNegotiationRoute
+from app.snapshots import SnapshotError, SnapshotInProgress, create_snapshots, snapshot_databases
+from app import schemas
+
+router = APIRouter(route_class=ContentNegotiationRoute)
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    if not settings.snapshot_admin_token:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin endpoints are disabled, set SNAPSHOT_ADMIN_TOKEN to enable them"
+        )
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.snapshot_admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or missing X-Admin-Token header"
+        )
+
+
+def _snapshot(directory: Optional[str], databases: Optional[List[str]]) -> List[dict]:
+    unknown = [name for name in databases or [] if name not in snapshot_databases()]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Database not found: {', '.join(unknown)}"
+        )
+    
+    try:
+        return create_snapshots(directory=directory, databases=databases)
+    except SnapshotInProgress as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except SnapshotError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+
+@router.post(
+    "/",
+    response_model=schemas.SnapshotListResponse,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(require_admin_token)]
+)
+def create_snapshot(
+    database: Optional[List[str]] = Query(None, description="primary or shard_<id>, repeatable (default: all)")
+):
+    """
+    Snapshot the live databases into a new folder of the server's snapshot directory.
+    
+    The copy runs in small steps on its own connection, so requests keep
+    being served while it runs. Each snapshot reports its size, duration and
+    throughput, and how often concurrent writes made it start over.
+    
+    - **database**: Only snapshot these databases
+    """
+    return schemas.SnapshotListResponse(snapshots=_snapshot(None, database))
+
+
+@router.get("/download", dependencies=[Depends(require_admin_token)])
+def download_snapshot(
+    database: str = Query("primary", description="primary or shard_<id>")
+):
+    """
+    Snapshot a live database and download it as a SQLite file.
+    
+    The duration, throughput and restarts of the copy are reported in the
+    `X-Snapshot-*` response headers. The server keeps no copy.
+    
+    - **database**: The database to snapshot
+    """
+    directory = tempfile.mkdtemp(prefix="snapshot-")
+    try:
+        snapshot = _snapshot(directory, [database])[0]
+    except Exception:
+        shutil.rmtree(directory)
+        raise
+    
+    return FileResponse(
+        snapshot["path"],
+        media_type="application/vnd.sqlite3",
+        filename=f"{database}-{snapshot['created_at'].strftime('%Y%m%dT%H%M%S')}.db",
+        headers={
+            "X-Snapshot-Duration-Ms": str(round(snapshot["duration_seconds"] * 1000)),
+            "X-Snapshot-Throughput-MBps": str(snapshot["throughput_mb_per_second"]),
+            "X-Snapshot-Restarts": str(snapshot["restarts"]),
+        },
+        background=BackgroundTask(shutil.rmtree, directory)
+    )
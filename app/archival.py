@@ -0,0 +1,31 @@
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Move customers that have been inactive for a long time into the archive tables."
+    )
+    parser.add_argument("--older-than-days", type=int, default=None, help="Defaults to ARCHIVE_AFTER_DAYS")
+    parser.add_argument("--batch-size", type=int, default=None, help="Defaults to ARCHIVE_BATCH_SIZE")
+    args = parser.parse_args()
+
+    from app import crud, models
+    from app.database import SessionLocal, engine, shard_engines
+
+    for database_engine in [engine, *shard_engines.values()]:
+        models.Base.metadata.create_all(bind=database_engine)
+
+    db = SessionLocal()
+    try:
+        archived = crud.ArchiveCRUD.archive_inactive_customers(
+            db,
+            older_than_days=args.older_than_days,
+            batch_size=args.batch_size
+        )
+    finally:
+        db.close()
+    print(f"Archived {archived} customers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import itertools
+import re
+from datetime import date, datetime
+from enum import Enum
+from typing import Annotated, Any, Dict, List, Optional, Tuple, Type, Union, get_args, get_origin
+from email_validator import EmailNotValidError, validate_email
+from email_validator.rfc_constants import CASE_INSENSITIVE_MAILBOX_NAMES, DOT_ATOM_TEXT, EMAIL_MAX_LENGTH
+from pydantic import BaseModel, EmailStr, ValidationError
+from pydantic.types import StringConstraints
+
+# Column-wise validation for large batches of schema objects.
+#
+# Each field is checked over the whole column in one tight loop, with
+# per-batch work hoisted out of the rows: `date.today()` is read once and each
+# distinct email domain is validated once. The fast checks are deliberately
+# conservative. They only accept values that the Pydantic schema accepts
+# unchanged (apart from whitespace stripping and email normalization). Any
+# row they are unsure about is re-validated by the schema itself, so the
+# accepted values and the reported errors are identical to per-row
+# validation.
+
+_MISSING = object()
+_ASCII_WHITESPACE = " \t\n\r\f\v"
+_ISO_DATE = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}")
+_ASCII_DOMAIN = re.compile(r"[A-Za-z0-9.-]+")
+_DIGITS = str.maketrans("", "", "0123456789")
+
+# Custom validators in schemas.py that the column checks reproduce
+_KNOWN_VALIDATORS = {
+    "validate_date_of_birth",
+    "validate_phone",
+    "validate_start_date",
+    "validate_end_date",
+}
+
+_plans: Dict[type, Optional[list]] = {}
+
+
+def _unwrap(annotation) -> Tuple[Any, list, bool]:
+    """Split an annotation into (type, metadata, nullable)."""
+    nullable = False
+    if get_origin(annotation) is Union:
+        args = [arg for arg in get_args(annotation) if arg is not type(None)]
+        if len(args) != 1:
+            return None, [], False
+        nullable = True
+        annotation = args[0]
+    metadata = []
+    if get_origin(annotation) is Annotated:
+        metadata = list(annotation.__metadata__)
+        annotation = get_args(annotation)[0]
+    return annotation, metadata, nullable
+
+
+def _plan(model: Type[BaseModel]) -> Optional[list]:
+    """Describe how to check each field of `model`, or None if it is not supported."""
+    if model in _plans:
+        return _plans[model]
+
+    decorators = model.__pydantic_decorators__
+    supported = (
+        set(decorators.validators) <= _KNOWN_VALIDATORS
+        and not decorators.field_validators
+        and not decorators.model_validators
+        and not decorators.root_validators
+    )
+
+    plan = []
+    for name, field in model.model_fields.items():
+        annotation, metadata, nullable = _unwrap(field.annotation)
+        metadata = metadata + list(field.metadata)
+        required = field.is_required()
+        default = None if required else field.default
+
+        if annotation is str and len(metadata) == 1 and isinstance(metadata[0], StringConstraints):
+            constraints = metadata[0]
+            if constraints.pattern or constraints.to_upper or constraints.to_lower or constraints.strict:
+                supported = False
+            kind = ("str", constraints.min_length or 0, constraints.max_length, constraints.strip_whitespace)
+        elif annotation is EmailStr and not metadata:
+            kind = ("email",)
+        elif annotation is date and not metadata:
+            kind = ("date",)
+        elif annotation is bool and not metadata:
+            kind = ("bool",)
+        elif isinstance(annotation, type) and issubclass(annotation, Enum) and not metadata:
+            kind = ("enum", annotation)
+        elif isinstance(annotation, type) and issubclass(annotation, BaseModel) and not metadata:
+            kind = ("model", annotation)
+        else:
+            kind = None
+            supported = False
+
+        plan.append((name, kind, required, default, nullable))
+
+    _plans[model] = plan if supported else None
+    return _plans[model]
+
+
+def _check_column(kind, column: list, bad: set, required: bool, default: Any, nullable: bool) -> list:
+    """Check one column, adding the index of every doubtful value to `bad`."""
+    values = [None] * len(column)
+    kind_name = kind[0]
+
+    if kind_name == "model":
+        models, errors = validate_batch(kind[1], [value if type(value) is dict else _MISSING for value in column])
+        for i, model in enumerate(models):
+            if model is None:
+                bad.add(i)
+            values[i] = model
+        return values
+
+    if kind_name == "str":
+        _, min_length, max_length, strip = kind
+        max_length = max_length if max_length is not None else float("inf")
+    elif kind_name == "email":
+        domains: Dict[str, Optional[Tuple[str, str]]] = {}
+    elif kind_name == "enum":
+        members = kind[1]._value2member_map_
+
+    for i, value in enumerate(column):
+        if value is _MISSING:
+            if required:
+                bad.add(i)
+            else:
+                values[i] = default
+            continue
+        if value is None:
+            if nullable:
+                values[i] = None
+            else:
+                bad.add(i)
+            continue
+
+        if kind_name == "str":
+            if type(value) is not str:
+                bad.add(i)
+                continue
+            if strip:
+                stripped = value.strip(_ASCII_WHITESPACE)
+                # Leave exotic Unicode whitespace to the schema
+                if stripped != stripped.strip():
+                    bad.add(i)
+                    continue
+                value = stripped
+            if min_length <= len(value) <= max_length:
+                values[i] = value
+            else:
+                bad.add(i)
+
+        elif kind_name == "email":
+            if type(value) is not str:
+                bad.add(i)
+                continue
+            local, _, domain = value.rpartition("@")
+            if (
+                not local
+                or len(local) > 64
+                or not DOT_ATOM_TEXT.match(local)
+                or local.lower() in CASE_INSENSITIVE_MAILBOX_NAMES
+                or not _ASCII_DOMAIN.fullmatch(domain)
+            ):
+                bad.add(i)
+                continue
+            if domain not in domains:
+                try:
+                    validated = validate_email("a@" + domain, check_deliverability=False)
+                    domains[domain] = (validated.domain, validated.ascii_domain)
+                except EmailNotValidError:
+                    domains[domain] = None
+            if domains[domain] is None:
+                bad.add(i)
+                continue
+            normalized = local + "@" + domains[domain][0]
+            ascii_email = local + "@" + domains[domain][1]
+            if max(len(value.encode()), len(normalized.encode()), len(ascii_email)) > EMAIL_MAX_LENGTH:
+                bad.add(i)
+                continue
+            values[i] = normalized
+
+        elif kind_name == "date":
+            if type(value) is date:
+                values[i] = value
+            elif type(value) is str and _ISO_DATE.fullmatch(value):
+                try:
+                    values[i] = date.fromisoformat(value)
+                except ValueError:
+                    bad.add(i)
+            else:
+                bad.add(i)
+
+        elif kind_name == "bool":
+            if value is True or value is False:
+                values[i] = value
+            else:
+                bad.add(i)
+
+        elif kind_name == "enum":
+            if type(value) is str and value in members:
+                values[i] = members[value]
+            elif type(value) is kind[1]:
+                values[i] = value
+            else:
+                bad.add(i)
+
+    return values
+
+
+def _apply_validators(columns: Dict[str, list], bad: set, validators) -> None:
+    """Column-wise equivalents of the custom validators in schemas.py."""
+    today = date.today()
+
+    if "validate_date_of_birth" in validators:
+        for i, value in enumerate(columns["date_of_birth"]):
+            if value is not None and (value >= today or value.year < 1900):
+                bad.add(i)
+
+    if "validate_phone" in validators:
+        for i, value in enumerate(columns["phone"]):
+            if value is None:
+                continue
+            # Non-ASCII digits are counted by str.isdigit, leave those to the schema
+            if not value.isascii() or len(value) - len(value.translate(_DIGITS)) < 10:
+                bad.add(i)
+
+    if "validate_start_date" in validators:
+        for i, value in enumerate(columns["start_date"]):
+            if value is not None and value > today:
+                bad.add(i)
+
+    if "validate_end_date" in validators:
+        for i, (end_date, start_date) in enumerate(zip(columns["end_date"], columns["start_date"])):
+            if end_date and start_date is not None and end_date <= start_date:
+                bad.add(i)
+
+
+def validate_batch(
+    model: Type[BaseModel],
+    rows: List[Any]
+) -> Tuple[List[Optional[BaseModel]], Dict[int, list]]:
+    """
+    Validate `rows` (dicts of input data) against `model` column by column.
+
+    Returns one model instance per row (None for invalid rows) and the
+    validation errors of each invalid row keyed by row index, in the same
+    format as `ValidationError.errors()`.
+    """
+    plan = _plan(model)
+    bad = set(range(len(rows)))
+    columns: Dict[str, list] = {}
+
+    if plan is not None:
+        bad = {i for i, row in enumerate(rows) if type(row) is not dict}
+        for name, kind, required, default, nullable in plan:
+            column = [row.get(name, _MISSING) if type(row) is dict else _MISSING for row in rows]
+            columns[name] = _check_column(kind, column, bad, required, default, nullable)
+        _apply_validators(columns, bad, set(model.__pydantic_decorators__.validators))
+
+    names = list(columns)
+    name_set = set(names)
+    results: List[Optional[BaseModel]] = [None] * len(rows)
+    errors: Dict[int, list] = {}
+
+    # Unsupported models have no columns, every row then goes through the schema
+    row_values = zip(*columns.values()) if columns else itertools.repeat(())
+
+    for i, (row, values) in enumerate(zip(rows, row_values)):
+        if row is _MISSING:
+            continue
+        if i in bad:
+            # Let the schema decide, so values and errors match per-row validation exactly
+            try:
+                results[i] = model.model_validate(row)
+            except ValidationError as e:
+                errors[i] = e.errors()
+            continue
+        results[i] = model.model_construct(_fields_set=name_set & row.keys(), **dict(zip(names, values)))
+
+    return results, errors
@@ -0,0 +1,48 @@
+import asyncio
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class ChangeFeed:
+    """
+    Wakes long-polling readers of the change log when a transaction that
+    recorded changes commits in this process.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def notify(self) -> None:
+        with self._lock:
+            self._version += 1
+
+    async def wait(self, version: int, timeout: float, poll_interval: float = 0.1) -> bool:
+        """Wait until the feed moves past `version`, returning False on timeout."""
+        deadline = time.monotonic() + timeout
+        while self._version == version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(poll_interval, remaining))
+        return True
+
+
+change_feed = ChangeFeed()
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_change_feed(session):
+    if session.info.pop("changes_pending", False):
+        change_feed.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_changes(session):
+    session.info.pop("changes_pending", None)
@@ -0,0 +1,281 @@
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Brotli and Zstandard are optional, gzip is always available
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+COMPRESSIBLE_TYPES = (
+    "application/json", "application/msgpack", "application/cbor",
+    "text/", "application/javascript", "application/xml",
+)
+# Requests carrying credentials may get responses meant only for them
+CREDENTIAL_HEADERS = ("authorization", "x-admin-token")
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Supported encodings in server preference order."""
+    encodings = []
+    if zstandard:
+        encodings.append("zstd")
+    if brotli:
+        encodings.append("br")
+    encodings.append("gzip")
+    return tuple(encodings)
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+
+    for encoding in available_encodings():
+        if accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+
+class _Compressor:
+    """Incremental compressor with a common interface for all encodings."""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == "br":
+            self._compressor = brotli.Compressor(quality=min(level, 11))
+        else:
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def sync_flush(self) -> bytes:
+        """Emit everything compressed so far without ending the stream."""
+        if self.encoding == "zstd":
+            return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._compressor.flush()
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
+
+
+def shared_cache_policy(cache_control: str) -> Optional[bool]:
+    """
+    True if a Cache-Control header allows shared caching of the response,
+    False if it forbids it, None if it says neither.
+    """
+    directives = {}
+    for directive in cache_control.lower().split(","):
+        name, _, value = directive.strip().partition("=")
+        directives[name] = value.strip('" ')
+    if "no-store" in directives or "private" in directives:
+        return False
+    if "public" in directives:
+        return True
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name, "").isdigit() and int(directives[name]) > 0:
+            return True
+    return None
+
+
+class CompressedCache:
+    """LRU cache of compressed bodies keyed by a digest of the uncompressed body."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[tuple, bytes]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def put(self, key: tuple, body: bytes) -> None:
+        if len(body) > self.max_bytes or key in self._entries:
+            return
+        self._entries[key] = body
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd, brotli or gzip, as negotiated by Accept-Encoding.
+
+    Complete bodies smaller than `minimum_size` are sent as-is. The
+    compression level can be overridden per route with `route_levels` (path
+    prefix -> level). Streaming responses are compressed chunk by chunk from
+    the first chunk, each flushed so the client can decode it as soon as it
+    arrives.
+
+    Complete bodies of shared responses are cached compressed, so repeated
+    identical responses skip re-compression: those of `cache_routes` (path
+    prefixes) and those whose Cache-Control allows shared caching. Responses
+    marked no-store or private, that set cookies, or that answer requests
+    carrying credentials are never cached, whatever the route.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        level: int = 6,
+        route_levels: Optional[Dict[str, int]] = None,
+        cache_bytes: int = 16 * 1024 * 1024,
+        cache_routes: Optional[List[str]] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.level = level
+        # Longest prefix wins
+        self.route_levels = sorted((route_levels or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.cache = CompressedCache(cache_bytes) if cache_bytes > 0 else None
+        self.cache_routes = tuple(cache_routes or ())
+
+    def level_for(self, path: str) -> int:
+        for prefix, level in self.route_levels:
+            if path.startswith(prefix):
+                return level
+        return self.level
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, self.level_for(scope["path"]), send)
+        responder.shared_request = self.cache is not None and not any(
+            name in request_headers for name in CREDENTIAL_HEADERS
+        )
+        responder.cache_route = scope["path"].startswith(self.cache_routes) if self.cache_routes else False
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, level: int, send: Send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.level = level
+        self._send = send
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+        self.shared_request = False
+        self.cache_route = False
+        self.cacheable = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            policy = shared_cache_policy(headers.get("cache-control", ""))
+            self.cacheable = (
+                self.shared_request
+                and "set-cookie" not in headers
+                and (self.cache_route if policy is None else policy)
+            )
+            if self.passthrough:
+                await self._send(message)
+            else:
+                # Hold the headers until the first body message shows whether to compress
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor:
+            await self._send({"type": "http.response.body", "body": self._compress_chunk(body, more_body), "more_body": more_body})
+            return
+
+        # Only a complete body can be too small to be worth compressing
+        if not more_body and len(body) < self.middleware.minimum_size:
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+
+        if not more_body:
+            compressed = self._compress_complete(body)
+            headers["Content-Length"] = str(len(compressed))
+            await self._send(self.start_message)
+            await self._send({"type": "http.response.body", "body": compressed, "more_body": False})
+            return
+
+        # Streaming response: compress and send each chunk as it arrives, never
+        # holding small events back until enough bytes have accumulated
+        del headers["Content-Length"]
+        self.compressor = _Compressor(self.encoding, self.level)
+        await self._send(self.start_message)
+        await self._send({"type": "http.response.body", "body": self._compress_chunk(body, True), "more_body": True})
+
+    def _compress_chunk(self, body: bytes, more_body: bool) -> bytes:
+        chunk = self.compressor.compress(body)
+        if not more_body:
+            return chunk + self.compressor.flush()
+        # Without a flush the compressor would hold small chunks back until its window fills
+        if body:
+            chunk += self.compressor.sync_flush()
+        return chunk
+
+    def _compress_complete(self, body: bytes) -> bytes:
+        cache = self.middleware.cache if self.cacheable else None
+        key = (self.encoding, self.level, hashlib.sha1(body).digest())
+        if cache:
+            compressed = cache.get(key)
+            if compressed is not None:
+                return compressed
+
+        compressor = _Compressor(self.encoding, self.level)
+        compressed = compressor.compress(body) + compressor.flush()
+        if cache:
+            cache.put(key, compressed)
+        return compressed
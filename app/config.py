@@ -1,10 +1,15 @@
-from typing import Optional
+from typing import Dict, List, Optional
 import os
 
 
 class Settings:
     # Database settings
     database_url: str = "sqlite:///./customer_registration.db"
+    read_replica_urls: List[str] = []
+    read_your_writes_seconds: int = 5
+    shard_urls: List[str] = []
+    shard_two_phase_commit: bool = False
+    sqlite_journal_mode: str = "wal"
     
     # API settings
     api_v1_str: str = "/api/v1"
@@ -15,14 +20,146 @@ class Settings:
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Idempotency settings
+    idempotency_ttl_seconds: int = 86400
+    
+    # Admission control settings
+    # Keep the limits' sum within the database pool (5 + 10 overflow by default)
+    admission_control_enabled: bool = True
+    admission_read_limit: int = 8
+    admission_write_limit: int = 4
+    admission_bulk_limit: int = 2
+    admission_long_poll_limit: int = 50
+    admission_queue_size: int = 50
+    admission_queue_timeout_ms: int = 1000
+    admission_retry_after_seconds: int = 1
+    admission_client_rate: float = 0
+    admission_client_burst: int = 20
+    health_check_timeout_seconds: float = 2
+    
+    # Request deadline settings (0 disables)
+    request_deadline_read_ms: int = 5000
+    request_deadline_bulk_ms: int = 15000
+    
+    # Response compression settings
+    compression_minimum_size: int = 1024
+    compression_level: int = 6
+    compression_route_levels: Dict[str, int] = {}
+    compression_cache_bytes: int = 16 * 1024 * 1024
+    # Only aggregate responses, without customer data, are cached by default
+    compression_cache_routes: List[str] = [
+        "/api/v1/customers/stats/", "/api/v1/employments/stats/", "/api/v1/employments/suggest",
+    ]
+    
+    # Asynchronous registration queue settings
+    registration_queue_enabled: bool = True
+    registration_queue_max_size: int = 10000
+    registration_queue_batch_size: int = 200
+    registration_queue_flush_interval_ms: int = 50
+    registration_ticket_ttl_seconds: int = 3600
+    
+    # CSV import settings
+    import_directory: str = "./imports"
+    import_chunk_size: int = 1000
+    import_max_errors: int = 1000
+    
+    # Request coalescing settings
+    single_flight_enabled: bool = True
+    
+    # Read model settings
+    read_model_enabled: bool = True
+    
+    # Email pre-check filter settings
+    email_filter_enabled: bool = True
+    email_filter_capacity: int = 100000
+    email_filter_false_positive_rate: float = 0.01
+    
+    # Snapshot settings
+    snapshot_directory: str = "./snapshots"
+    snapshot_pages_per_step: int = 64
+    snapshot_step_pause_ms: int = 10
+    snapshot_max_restarts: int = 20
+    snapshot_admin_token: str = ""
+    
+    # Analytics export settings
+    analytics_export_directory: str = "./analytics"
+    analytics_export_format: str = "arrow"
+    analytics_export_batch_size: int = 10000
+    analytics_export_keep: int = 3
+    
+    # Archival settings
+    archive_after_days: int = 365
+    archive_batch_size: int = 500
+    
+    # Duplicate detection settings
+    dedup_max_block_size: int = 100
+    
     def __init__(self):
         # Override with environment variables if they exist
         self.database_url = os.getenv("DATABASE_URL", self.database_url)
+        self.read_replica_urls = [url.strip() for url in os.getenv("READ_REPLICA_URLS", "").split(",") if url.strip()]
+        self.read_your_writes_seconds = int(os.getenv("READ_YOUR_WRITES_SECONDS", self.read_your_writes_seconds))
+        self.shard_urls = [url.strip() for url in os.getenv("SHARD_URLS", "").split(",") if url.strip()]
+        self.shard_two_phase_commit = os.getenv("SHARD_TWO_PHASE_COMMIT", str(self.shard_two_phase_commit)).lower() == "true"
+        self.sqlite_journal_mode = os.getenv("SQLITE_JOURNAL_MODE", self.sqlite_journal_mode)
         self.api_v1_str = os.getenv("API_V1_STR", self.api_v1_str)
         self.project_name = os.getenv("PROJECT_NAME", self.project_name)
         self.secret_key = os.getenv("SECRET_KEY", self.secret_key)
         self.algorithm = os.getenv("ALGORITHM", self.algorithm)
         self.access_token_expire_minutes = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", self.access_token_expire_minutes))
+        self.idempotency_ttl_seconds = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", self.idempotency_ttl_seconds))
+        self.admission_control_enabled = os.getenv("ADMISSION_CONTROL_ENABLED", str(self.admission_control_enabled)).lower() == "true"
+        self.admission_read_limit = int(os.getenv("ADMISSION_READ_LIMIT", self.admission_read_limit))
+        self.admission_write_limit = int(os.getenv("ADMISSION_WRITE_LIMIT", self.admission_write_limit))
+        self.admission_bulk_limit = int(os.getenv("ADMISSION_BULK_LIMIT", self.admission_bulk_limit))
+        self.admission_long_poll_limit = int(os.getenv("ADMISSION_LONG_POLL_LIMIT", self.admission_long_poll_limit))
+        self.admission_queue_size = int(os.getenv("ADMISSION_QUEUE_SIZE", self.admission_queue_size))
+        self.admission_queue_timeout_ms = int(os.getenv("ADMISSION_QUEUE_TIMEOUT_MS", self.admission_queue_timeout_ms))
+        self.admission_retry_after_seconds = int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", self.admission_retry_after_seconds))
+        self.admission_client_rate = float(os.getenv("ADMISSION_CLIENT_RATE", self.admission_client_rate))
+        self.admission_client_burst = int(os.getenv("ADMISSION_CLIENT_BURST", self.admission_client_burst))
+        self.health_check_timeout_seconds = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", self.health_check_timeout_seconds))
+        self.request_deadline_read_ms = int(os.getenv("REQUEST_DEADLINE_READ_MS", self.request_deadline_read_ms))
+        self.request_deadline_bulk_ms = int(os.getenv("REQUEST_DEADLINE_BULK_MS", self.request_deadline_bulk_ms))
+        self.compression_minimum_size = int(os.getenv("COMPRESSION_MINIMUM_SIZE", self.compression_minimum_size))
+        self.compression_level = int(os.getenv("COMPRESSION_LEVEL", self.compression_level))
+        self.compression_route_levels = {
+            prefix.strip(): int(level)
+            for prefix, _, level in (
+                item.partition("=") for item in os.getenv("COMPRESSION_ROUTE_LEVELS", "").split(",") if item.strip()
+            )
+        }
+        self.compression_cache_bytes = int(os.getenv("COMPRESSION_CACHE_BYTES", self.compression_cache_bytes))
+        self.compression_cache_routes = [
+            prefix.strip()
+            for prefix in os.getenv("COMPRESSION_CACHE_ROUTES", ",".join(self.compression_cache_routes)).split(",")
+            if prefix.strip()
+        ]
+        self.registration_queue_enabled = os.getenv("REGISTRATION_QUEUE_ENABLED", str(self.registration_queue_enabled)).lower() == "true"
+        self.registration_queue_max_size = int(os.getenv("REGISTRATION_QUEUE_MAX_SIZE", self.registration_queue_max_size))
+        self.registration_queue_batch_size = int(os.getenv("REGISTRATION_QUEUE_BATCH_SIZE", self.registration_queue_batch_size))
+        self.registration_queue_flush_interval_ms = int(os.getenv("REGISTRATION_QUEUE_FLUSH_INTERVAL_MS", self.registration_queue_flush_interval_ms))
+        self.registration_ticket_ttl_seconds = int(os.getenv("REGISTRATION_TICKET_TTL_SECONDS", self.registration_ticket_ttl_seconds))
+        self.import_directory = os.getenv("IMPORT_DIRECTORY", self.import_directory)
+        self.import_chunk_size = int(os.getenv("IMPORT_CHUNK_SIZE", self.import_chunk_size))
+        self.import_max_errors = int(os.getenv("IMPORT_MAX_ERRORS", self.import_max_errors))
+        self.single_flight_enabled = os.getenv("SINGLE_FLIGHT_ENABLED", str(self.single_flight_enabled)).lower() == "true"
+        self.read_model_enabled = os.getenv("READ_MODEL_ENABLED", str(self.read_model_enabled)).lower() == "true"
+        self.email_filter_enabled = os.getenv("EMAIL_FILTER_ENABLED", str(self.email_filter_enabled)).lower() == "true"
+        self.email_filter_capacity = int(os.getenv("EMAIL_FILTER_CAPACITY", self.email_filter_capacity))
+        self.email_filter_false_positive_rate = float(os.getenv("EMAIL_FILTER_FALSE_POSITIVE_RATE", self.email_filter_false_positive_rate))
+        self.snapshot_directory = os.getenv("SNAPSHOT_DIRECTORY", self.snapshot_directory)
+        self.snapshot_pages_per_step = int(os.getenv("SNAPSHOT_PAGES_PER_STEP", self.snapshot_pages_per_step))
+        self.snapshot_step_pause_ms = int(os.getenv("SNAPSHOT_STEP_PAUSE_MS", self.snapshot_step_pause_ms))
+        self.snapshot_max_restarts = int(os.getenv("SNAPSHOT_MAX_RESTARTS", self.snapshot_max_restarts))
+        self.snapshot_admin_token = os.getenv("SNAPSHOT_ADMIN_TOKEN", self.snapshot_admin_token)
+        self.analytics_export_directory = os.getenv("ANALYTICS_EXPORT_DIRECTORY", self.analytics_export_directory)
+        self.analytics_export_format = os.getenv("ANALYTICS_EXPORT_FORMAT", self.analytics_export_format)
+        self.analytics_export_batch_size = int(os.getenv("ANALYTICS_EXPORT_BATCH_SIZE", self.analytics_export_batch_size))
+        self.analytics_export_keep = int(os.getenv("ANALYTICS_EXPORT_KEEP", self.analytics_export_keep))
+        self.archive_after_days = int(os.getenv("ARCHIVE_AFTER_DAYS", self.archive_after_days))
+        self.archive_batch_size = int(os.getenv("ARCHIVE_BATCH_SIZE", self.archive_batch_size))
+        self.dedup_max_block_size = int(os.getenv("DEDUP_MAX_BLOCK_SIZE", self.dedup_max_block_size))
 
 
 settings = Settings() 
\ No newline at end of file
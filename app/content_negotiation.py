@@ -0,0 +1,179 @@
+import json
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+from fastapi import HTTPException, Request, Response, status
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+# MessagePack and CBOR are optional, JSON is always available
+try:
+    import msgpack
+except ImportError:  # pragma: no cover
+    msgpack = None
+
+try:
+    import cbor2
+except ImportError:  # pragma: no cover
+    cbor2 = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+CBOR = "application/cbor"
+
+# Alternative spellings clients use for the same formats
+MEDIA_TYPE_ALIASES = {
+    "application/x-msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+_response_media_type: ContextVar[str] = ContextVar("response_media_type", default=JSON)
+
+
+def _encoders() -> Dict[str, Callable[[Any], bytes]]:
+    encoders = {}
+    if msgpack:
+        encoders[MSGPACK] = msgpack.packb
+    if cbor2:
+        encoders[CBOR] = cbor2.dumps
+    return encoders
+
+
+def _decoders() -> Dict[str, Callable[[bytes], Any]]:
+    decoders = {}
+    if msgpack:
+        decoders[MSGPACK] = msgpack.unpackb
+    if cbor2:
+        decoders[CBOR] = cbor2.loads
+    return decoders
+
+
+def _media_type(value: str) -> str:
+    media_type = value.split(";", 1)[0].strip().lower()
+    return MEDIA_TYPE_ALIASES.get(media_type, media_type)
+
+
+def negotiate_media_type(accept: str) -> str:
+    """Pick the response format from an Accept header, preferring JSON on ties."""
+    best, best_quality = JSON, 0.0
+    for part in accept.split(","):
+        media_type = _media_type(part)
+        quality = 1.0
+        for param in part.split(";")[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type in _encoders() and quality > best_quality:
+            best, best_quality = media_type, quality
+        elif media_type in (JSON, "*/*", "application/*") and quality >= best_quality:
+            best, best_quality = JSON, quality
+    return best
+
+
+class NegotiatedResponse(JSONResponse):
+    """JSON response that renders as MessagePack or CBOR when the client asked for it."""
+
+    def __init__(
+        self,
+        content: Any,
+        status_code: int = 200,
+        headers: Optional[dict] = None,
+        media_type: Optional[str] = None,
+        background=None,
+    ):
+        super().__init__(content, status_code, headers, media_type or _response_media_type.get(), background)
+
+    def render(self, content: Any) -> bytes:
+        encoder = _encoders().get(self.media_type)
+        if encoder:
+            return encoder(content)
+        return super().render(content)
+
+
+def json_negotiated() -> bool:
+    """
+    Whether the current request negotiated JSON. Prebuilt JSON bodies are
+    only worth serving then, other formats are better encoded from the rows.
+    """
+    return _response_media_type.get() == JSON
+
+
+def json_body_response(body: str, status_code: int = 200, headers: Optional[dict] = None) -> Response:
+    """
+    Response for an already serialized JSON body. It is sent as is to JSON
+    clients and decoded only when MessagePack or CBOR was negotiated, so use
+    it for bodies that only exist as JSON, such as stored responses.
+    """
+    media_type = _response_media_type.get()
+    if media_type == JSON:
+        return Response(content=body, status_code=status_code, headers=headers, media_type=JSON)
+    return NegotiatedResponse(json.loads(body), status_code=status_code, headers=headers, media_type=media_type)
+
+
+def error_response(accept: str, status_code: int, content: Any, headers: Optional[dict] = None) -> NegotiatedResponse:
+    """
+    Error response in the format the Accept header asks for. Exception
+    handlers and middleware run outside ContentNegotiationRoute, so they
+    negotiate from the header themselves.
+    """
+    return NegotiatedResponse(content, status_code, headers, media_type=negotiate_media_type(accept))
+
+
+class ContentNegotiationRoute(APIRoute):
+    """
+    Route that serves responses as JSON, MessagePack or CBOR according to the
+    Accept header, and accepts request bodies in any of those formats.
+    """
+
+    def __init__(self, *args, response_class=Default(NegotiatedResponse), **kwargs):
+        if isinstance(response_class, DefaultPlaceholder) and response_class.value is JSONResponse:
+            response_class = Default(NegotiatedResponse)
+        super().__init__(*args, response_class=response_class, **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def negotiated_handler(request: Request) -> Response:
+            token = _response_media_type.set(negotiate_media_type(request.headers.get("accept", "")))
+            try:
+                request = await _decode_binary_body(request)
+                return await handler(request)
+            finally:
+                _response_media_type.reset(token)
+
+        return negotiated_handler
+
+
+async def _decode_binary_body(request: Request) -> Request:
+    content_type = _media_type(request.headers.get("content-type", ""))
+    if content_type not in (MSGPACK, CBOR):
+        return request
+
+    decoder = _decoders().get(content_type)
+    if not decoder:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"{content_type} request bodies are not supported by this server"
+        )
+
+    body = await request.body()
+    try:
+        data = decoder(body)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Request body is not valid {content_type}"
+        )
+
+    # Present the decoded body to FastAPI as an already parsed JSON body
+    scope = dict(request.scope)
+    scope["headers"] = [
+        (name, value) for name, value in request.scope["headers"] if name != b"content-type"
+    ] + [(b"content-type", JSON.encode())]
+    decoded_request = Request(scope, request.receive)
+    decoded_request._body = body
+    decoded_request._json = data
+    return decoded_request
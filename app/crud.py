@@ -1,37 +1,203 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import List, Optional
-from app import models, schemas
+from sqlalchemy.orm import Query, Session, aliased
+from sqlalchemy import and_, bindparam, delete, event, func, insert, or_, select
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.exc import IntegrityError
+from typing import Callable, List, Optional
+from datetime import datetime, timedelta
+import hashlib
+import heapq
+import itertools
+import json
+from app import dedup, geo, models, read_model, schemas, sharding, suggest
+from app.config import settings
+from app.email_filter import email_filter
 from fastapi import HTTPException, status
 
 
+def _merge_pages(queries: List[tuple[Query, list]], skip: int, limit: int, router) -> tuple[list, int]:
+    """Page through several (query, order_by) pairs as if they were one sorted query."""
+    pages = []
+    total = 0
+    for query, order_by in queries:
+        if router:
+            rows, count = router.scatter_gather(query, order_by, 0, skip + limit)
+        else:
+            rows, count = query.order_by(*order_by).limit(skip + limit).all(), query.count()
+        pages.append(rows)
+        total += count
+    
+    keys = [column.key for column in queries[0][1]]
+    merged = heapq.merge(*pages, key=lambda row: tuple(getattr(row, key) for key in keys))
+    return list(itertools.islice(merged, skip, skip + limit)), total
+
+
+def _filter_customers(
+    query: Query,
+    model,
+    search: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    country: Optional[str] = None,
+    state: Optional[str] = None,
+    city: Optional[str] = None,
+    updated_since: Optional[datetime] = None,
+    created_since: Optional[datetime] = None,
+    after_id: Optional[int] = None
+) -> tuple[Query, list]:
+    """Apply the customer list filters to a query on `model`, returning it with its order (empty for the default)."""
+    # Apply filters
+    if search:
+        search_filter = or_(
+            model.first_name.ilike(f"%{search}%"),
+            model.last_name.ilike(f"%{search}%"),
+            model.email.ilike(f"%{search}%"),
+            model.city.ilike(f"%{search}%")
+        )
+        query = query.filter(search_filter)
+    
+    if is_active is not None:
+        query = query.filter(model.is_active == is_active)
+    
+    # Exact-match location filters, served by their indexes
+    if country:
+        query = query.filter(model.country == country)
+    
+    if state:
+        query = query.filter(model.state == state)
+    
+    if city:
+        query = query.filter(model.city == city)
+    
+    order_by = []
+    if updated_since:
+        # Page in modification order so deltas can be fetched incrementally
+        query = query.filter(model.updated_at >= updated_since)
+        order_by = [model.updated_at, model.id]
+    
+    if created_since:
+        query = query.filter(model.created_at >= created_since)
+    
+    if after_id is not None:
+        # Keyset pagination: continue after the last id of the previous page
+        query = query.filter(model.id > after_id)
+        order_by = order_by or [model.id]
+    
+    return query, order_by
+
+
 class CustomerCRUD:
     @staticmethod
-    def create_customer(db: Session, customer_data: schemas.CustomerCreate) -> models.Customer:
-        # Check if email already exists
-        existing_customer = db.query(models.Customer).filter(
-            models.Customer.email == customer_data.email
-        ).first()
+    def create_customer(
+        db: Session,
+        customer_data: schemas.CustomerCreate,
+        before_commit: Optional[Callable[[models.Customer], None]] = None
+    ) -> models.Customer:
+        """
+        Create a customer. `before_commit` is called with the flushed customer
+        right before it is committed, so callers can write their own
+        bookkeeping in the same transaction.
+        """
+        # Check if email already exists, archived customers keep their email
+        CustomerCRUD._check_email_available(db, customer_data.email)
         
-        if existing_customer:
+        db_customer = models.Customer(**customer_data.dict())
+        db.add(db_customer)
+        try:
+            ChangeLogCRUD.record(db, "customer", "create", db_customer)
+            DuplicateCRUD.sync_blocking_keys(db, db_customer, is_new=True)
+            if before_commit:
+                before_commit(db_customer)
+            db.commit()
+        except IntegrityError:
+            # The unique email index caught an email the check let through
+            db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Email already registered"
             )
-        
-        db_customer = models.Customer(**customer_data.dict())
-        db.add(db_customer)
-        db.commit()
         db.refresh(db_customer)
         return db_customer
     
     @staticmethod
-    def get_customer(db: Session, customer_id: int) -> Optional[models.Customer]:
-        return db.query(models.Customer).filter(models.Customer.id == customer_id).first()
+    def _check_email_available(db: Session, email: str) -> None:
+        # The query is skipped when the email filter rules the email out
+        if not email_filter.might_contain(email):
+            if CustomerCRUD._archived_email_unguarded(db, [email]):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Email already registered"
+                )
+            return
+        if CustomerCRUD.get_customer_by_email(db, email, include_archived=True):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        email_filter.record_false_positives()
+    
+    @staticmethod
+    def _archived_email_unguarded(db: Session, emails: List[str]) -> set:
+        """
+        Emails of `emails` held by archived customers, when no unique index
+        guards them. The filter only learns of other server processes'
+        archivals after a restart, so a miss cannot vouch for the archive.
+        When sharded the directory keeps archived emails taken, no lookup.
+        """
+        if sharding.get_router(db) or not emails:
+            return set()
+        return {
+            email for (email,) in db.query(models.ArchivedCustomer.email).filter(
+                models.ArchivedCustomer.email.in_(emails)
+            )
+        }
+    
+    @staticmethod
+    def get_customer(db: Session, customer_id: int, include_archived: bool = False) -> Optional[models.Customer]:
+        customer = db.query(models.Customer).filter(models.Customer.id == customer_id).first()
+        if customer is None and include_archived:
+            customer = db.query(models.ArchivedCustomer).filter(
+                models.ArchivedCustomer.id == customer_id
+            ).order_by(models.ArchivedCustomer.archive_id.desc()).first()
+        return customer
+    
+    @staticmethod
+    def get_customer_by_email(db: Session, email: str, include_archived: bool = False) -> Optional[models.Customer]:
+        customer = db.query(models.Customer).filter(models.Customer.email == email).first()
+        if customer is None and include_archived:
+            customer = db.query(models.ArchivedCustomer).filter(
+                models.ArchivedCustomer.email == email
+            ).order_by(models.ArchivedCustomer.archive_id.desc()).first()
+        return customer
     
     @staticmethod
-    def get_customer_by_email(db: Session, email: str) -> Optional[models.Customer]:
-        return db.query(models.Customer).filter(models.Customer.email == email).first()
+    def get_customer_by_phone(db: Session, phone: str) -> Optional[models.Customer]:
+        digits = dedup.normalize_phone(phone)
+        if not digits:
+            return None
+        
+        # Several customers can share a number, prefer active ones, then the oldest.
+        # Picked in Python so the choice is the same when the matches span shards.
+        def best_match(customers: List[models.Customer]) -> Optional[models.Customer]:
+            return min(customers, key=lambda customer: (not customer.is_active, customer.id), default=None)
+        
+        customer = best_match(db.query(models.Customer).filter(
+            models.Customer.phone_normalized == digits
+        ).all())
+        if customer or len(digits) < 10:
+            return customer
+        
+        # Fall back to the national number (the phone blocking key), so numbers
+        # match with or without a country code
+        customer_ids = [
+            customer_id for (customer_id,) in db.query(models.CustomerBlockingKey.customer_id).filter(
+                models.CustomerBlockingKey.key_type == "phone",
+                models.CustomerBlockingKey.key_value == digits[-10:]
+            )
+        ]
+        if not customer_ids:
+            return None
+        return best_match(db.query(models.Customer).filter(
+            models.Customer.id.in_(customer_ids)
+        ).all())
     
     @staticmethod
     def get_customers(
@@ -39,22 +205,47 @@ class CustomerCRUD:
         skip: int = 0, 
         limit: int = 100,
         search: Optional[str] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        country: Optional[str] = None,
+        state: Optional[str] = None,
+        city: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        created_since: Optional[datetime] = None,
+        after_id: Optional[int] = None,
+        include_archived: bool = False
     ) -> tuple[List[models.Customer], int]:
-        query = db.query(models.Customer)
+        queries = []
+        for model in [models.Customer, models.ArchivedCustomer] if include_archived else [models.Customer]:
+            query, order_by = _filter_customers(
+                db.query(model),
+                model,
+                search=search,
+                is_active=is_active,
+                country=country,
+                state=state,
+                city=city,
+                updated_since=updated_since,
+                created_since=created_since,
+                after_id=after_id
+            )
+            queries.append((model, query, order_by))
         
-        # Apply filters
-        if search:
-            search_filter = or_(
-                models.Customer.first_name.ilike(f"%{search}%"),
-                models.Customer.last_name.ilike(f"%{search}%"),
-                models.Customer.email.ilike(f"%{search}%"),
-                models.Customer.city.ilike(f"%{search}%")
+        router = sharding.get_router(db)
+        if include_archived:
+            # Archived customers live in their own table, page through both as one
+            return _merge_pages(
+                [(query, order_by or [model.id]) for model, query, order_by in queries],
+                skip,
+                limit,
+                router
             )
-            query = query.filter(search_filter)
         
-        if is_active is not None:
-            query = query.filter(models.Customer.is_active == is_active)
+        _, query, order_by = queries[0]
+        if router:
+            return router.scatter_gather(query, order_by or [models.Customer.id], skip, limit)
+        
+        if order_by:
+            query = query.order_by(*order_by)
         
         # Get total count
         total = query.count()
@@ -79,19 +270,23 @@ class CustomerCRUD:
         
         # Check if email is being updated and if it already exists
         if customer_data.email and customer_data.email != db_customer.email:
-            existing_customer = CustomerCRUD.get_customer_by_email(db, customer_data.email)
-            if existing_customer:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Email already registered"
-                )
+            CustomerCRUD._check_email_available(db, customer_data.email)
         
         # Update only provided fields
         update_data = customer_data.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_customer, field, value)
         
-        db.commit()
+        try:
+            ChangeLogCRUD.record(db, "customer", "update", db_customer)
+            DuplicateCRUD.sync_blocking_keys(db, db_customer)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
         db.refresh(db_customer)
         return db_customer
     
@@ -106,6 +301,7 @@ class CustomerCRUD:
         
         # Soft delete - set is_active to False
         db_customer.is_active = False
+        ChangeLogCRUD.record(db, "customer", "delete", db_customer)
         db.commit()
         return True
     
@@ -118,6 +314,10 @@ class CustomerCRUD:
                 detail="Customer not found"
             )
         
+        for employment in db_customer.employments:
+            ChangeLogCRUD.record(db, "employment", "hard_delete", employment)
+        ChangeLogCRUD.record(db, "customer", "hard_delete", db_customer)
+        DuplicateCRUD.delete_blocking_keys(db, customer_id)
         db.delete(db_customer)
         db.commit()
         return True
@@ -138,33 +338,112 @@ class EmploymentCRUD:
                 detail="Customer not found"
             )
         
-        # Check if customer already has employment
-        existing_employment = db.query(models.Employment).filter(
-            models.Employment.customer_id == customer_id
-        ).first()
-        
-        if existing_employment:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Customer already has employment information"
-            )
+        # A new current employment moves the previous one into the history
+        if employment_data.is_current_employment:
+            EmploymentCRUD._unset_current_employment(db, customer_id)
         
         db_employment = models.Employment(
             customer_id=customer_id,
             **employment_data.dict()
         )
         db.add(db_employment)
+        ChangeLogCRUD.record(db, "employment", "create", db_employment)
         db.commit()
         db.refresh(db_employment)
         return db_employment
     
+    @staticmethod
+    def _unset_current_employment(db: Session, customer_id: int) -> None:
+        current = db.query(models.Employment).filter(
+            models.Employment.customer_id == customer_id,
+            models.Employment.is_current_employment == True
+        ).first()
+        if current:
+            current.is_current_employment = False
+            # Flushes now, so the unique current-employment index never sees two current rows
+            ChangeLogCRUD.record(db, "employment", "update", current)
+    
     @staticmethod
     def get_employment(db: Session, employment_id: int) -> Optional[models.Employment]:
         return db.query(models.Employment).filter(models.Employment.id == employment_id).first()
     
     @staticmethod
-    def get_employment_by_customer(db: Session, customer_id: int) -> Optional[models.Employment]:
-        return db.query(models.Employment).filter(models.Employment.customer_id == customer_id).first()
+    def get_employment_by_customer(
+        db: Session,
+        customer_id: int,
+        include_archived: bool = False
+    ) -> Optional[models.Employment]:
+        # The current employment, a single lookup in the partial current-employment index
+        employment = db.query(models.Employment).filter(
+            models.Employment.customer_id == customer_id,
+            models.Employment.is_current_employment == True
+        ).first()
+        
+        if employment is None:
+            # Customers without a current job show their most recent one
+            employment = db.query(models.Employment).filter(
+                models.Employment.customer_id == customer_id
+            ).order_by(models.Employment.start_date.desc(), models.Employment.id.desc()).first()
+        
+        if employment is None and include_archived:
+            employment = db.query(models.ArchivedEmployment).filter(
+                models.ArchivedEmployment.customer_id == customer_id
+            ).order_by(models.ArchivedEmployment.archive_id.desc()).first()
+        return employment
+    
+    @staticmethod
+    def get_employments_by_customers(
+        db: Session,
+        customer_ids: List[int],
+        include_archived: bool = False
+    ) -> dict[int, models.Employment]:
+        """
+        The employment get_employment_by_customer returns for each customer,
+        keyed by customer id, loaded for all of them with one IN query (and
+        one more for archived employments of the rest).
+        """
+        employments: dict[int, models.Employment] = {}
+        if not customer_ids:
+            return employments
+        
+        # Per customer: the current employment first, then the most recent
+        for employment in db.query(models.Employment).filter(
+            models.Employment.customer_id.in_(customer_ids)
+        ).order_by(
+            models.Employment.customer_id,
+            models.Employment.is_current_employment.desc(),
+            models.Employment.start_date.desc(),
+            models.Employment.id.desc()
+        ):
+            employments.setdefault(employment.customer_id, employment)
+        
+        missing = [customer_id for customer_id in customer_ids if customer_id not in employments]
+        if include_archived and missing:
+            for employment in db.query(models.ArchivedEmployment).filter(
+                models.ArchivedEmployment.customer_id.in_(missing)
+            ).order_by(models.ArchivedEmployment.customer_id, models.ArchivedEmployment.archive_id.desc()):
+                employments.setdefault(employment.customer_id, employment)
+        return employments
+    
+    @staticmethod
+    def get_employment_history(
+        db: Session,
+        customer_id: int,
+        skip: int = 0,
+        limit: int = 100
+    ) -> tuple[List[models.Employment], int]:
+        # Newest first, read in index order from the customer's history index.
+        # Counted without a subquery so sharded sessions route it to the customer's shard.
+        total = db.query(func.count(models.Employment.id)).filter(
+            models.Employment.customer_id == customer_id
+        ).scalar()
+        employments = db.query(models.Employment).filter(
+            models.Employment.customer_id == customer_id
+        ).order_by(
+            models.Employment.start_date.desc(),
+            models.Employment.id.desc()
+        ).offset(skip).limit(limit).all()
+        return employments, total
     
     @staticmethod
     def get_employments(
@@ -173,7 +452,12 @@ class EmploymentCRUD:
         limit: int = 100,
         search: Optional[str] = None,
         employment_type: Optional[str] = None,
-        is_current: Optional[bool] = None
+        is_current: Optional[bool] = None,
+        work_country: Optional[str] = None,
+        work_city: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        created_since: Optional[datetime] = None,
+        after_id: Optional[int] = None
     ) -> tuple[List[models.Employment], int]:
         query = db.query(models.Employment)
         
@@ -192,6 +476,34 @@ class EmploymentCRUD:
         if is_current is not None:
             query = query.filter(models.Employment.is_current_employment == is_current)
         
+        # Exact-match location filters, served by their indexes
+        if work_country:
+            query = query.filter(models.Employment.work_country == work_country)
+        
+        if work_city:
+            query = query.filter(models.Employment.work_city == work_city)
+        
+        order_by = []
+        if updated_since:
+            # Page in modification order so deltas can be fetched incrementally
+            query = query.filter(models.Employment.updated_at >= updated_since)
+            order_by = [models.Employment.updated_at, models.Employment.id]
+        
+        if created_since:
+            query = query.filter(models.Employment.created_at >= created_since)
+        
+        if after_id is not None:
+            # Keyset pagination: continue after the last id of the previous page
+            query = query.filter(models.Employment.id > after_id)
+            order_by = order_by or [models.Employment.id]
+        
+        router = sharding.get_router(db)
+        if router:
+            return router.scatter_gather(query, order_by or [models.Employment.id], skip, limit)
+        
+        if order_by:
+            query = query.order_by(*order_by)
+        
         # Get total count
         total = query.count()
         
@@ -215,9 +527,13 @@ class EmploymentCRUD:
         
         # Update only provided fields
         update_data = employment_data.dict(exclude_unset=True)
+        if update_data.get("is_current_employment") and not db_employment.is_current_employment:
+            EmploymentCRUD._unset_current_employment(db, db_employment.customer_id)
+        
         for field, value in update_data.items():
             setattr(db_employment, field, value)
         
+        ChangeLogCRUD.record(db, "employment", "update", db_employment)
         db.commit()
         db.refresh(db_employment)
         return db_employment
@@ -231,25 +547,777 @@ class EmploymentCRUD:
                 detail="Employment not found"
             )
         
+        ChangeLogCRUD.record(db, "employment", "hard_delete", db_employment)
         db.delete(db_employment)
         db.commit()
         return True
 
 
+# Prebuilt statements for ReadCRUD. Built once, so SQLAlchemy computes their
+# cache keys once and reuses the compiled SQL on every call.
+_customers = models.Customer.__table__
+_archived_customers = models.ArchivedCustomer.__table__
+_employments = models.Employment.__table__
+_archived_employments = models.ArchivedEmployment.__table__
+
+_CUSTOMER_BY_ID = select(_customers).where(_customers.c.id == bindparam("customer_id"))
+_CUSTOMER_BY_EMAIL = select(_customers).where(_customers.c.email == bindparam("email"))
+_ARCHIVED_CUSTOMER_BY_ID = select(_archived_customers).where(
+    _archived_customers.c.id == bindparam("customer_id")
+).order_by(_archived_customers.c.archive_id.desc()).limit(1)
+_ARCHIVED_CUSTOMER_BY_EMAIL = select(_archived_customers).where(
+    _archived_customers.c.email == bindparam("email")
+).order_by(_archived_customers.c.archive_id.desc()).limit(1)
+_CURRENT_EMPLOYMENT = select(_employments).where(
+    _employments.c.customer_id == bindparam("customer_id"),
+    _employments.c.is_current_employment == True
+)
+_LATEST_EMPLOYMENT = select(_employments).where(
+    _employments.c.customer_id == bindparam("customer_id")
+).order_by(_employments.c.start_date.desc(), _employments.c.id.desc()).limit(1)
+_ARCHIVED_EMPLOYMENT = select(_archived_employments).where(
+    _archived_employments.c.customer_id == bindparam("customer_id")
+).order_by(_archived_employments.c.archive_id.desc()).limit(1)
+
+_read_model = models.CustomerReadModel.__table__
+_READ_MODEL_BY_ID = select(_read_model.c.data, _read_model.c.employment).where(
+    _read_model.c.id == bindparam("customer_id")
+)
+_READ_MODEL_BY_EMAIL = select(_read_model.c.data, _read_model.c.employment).where(
+    _read_model.c.email == bindparam("email")
+)
+
+
+class ReadCRUD:
+    """
+    ORM-free single-row reads for the hot GET endpoints.
+    
+    Same lookups as CustomerCRUD.get_customer, get_customer_by_email and
+    EmploymentCRUD.get_employment_by_customer. They run the prebuilt Core
+    statements above on the session's connection and return row mappings,
+    which the response schemas read directly. Rows are not added to the
+    session, so anything that is going to be modified must be loaded
+    through the ORM methods instead.
+    """
+    @staticmethod
+    def _connection(db: Session, customer_id: int):
+        # With sharding, go straight to the shard holding the customer
+        router = sharding.get_router(db)
+        return sharding.connection_for_shard(db, router.shard_for_id(customer_id) if router else None)
+    
+    @staticmethod
+    def _email_connection(db: Session, email: str):
+        if not sharding.get_router(db):
+            return db.connection()
+        # The directory maps the email to the customer id, and so to its shard
+        customer_ids = sharding.lookup_customer_ids(db, [email])
+        return ReadCRUD._connection(db, customer_ids[0]) if customer_ids else None
+    
+    @staticmethod
+    def _first(connection, *statements, **params) -> Optional[RowMapping]:
+        for statement in statements:
+            row = connection.execute(statement, params).mappings().first()
+            if row is not None:
+                return row
+        return None
+    
+    @staticmethod
+    def get_customer(db: Session, customer_id: int, include_archived: bool = False) -> Optional[RowMapping]:
+        statements = (_CUSTOMER_BY_ID, _ARCHIVED_CUSTOMER_BY_ID) if include_archived else (_CUSTOMER_BY_ID,)
+        return ReadCRUD._first(ReadCRUD._connection(db, customer_id), *statements, customer_id=customer_id)
+    
+    @staticmethod
+    def get_customer_by_email(db: Session, email: str, include_archived: bool = False) -> Optional[RowMapping]:
+        statements = (_CUSTOMER_BY_EMAIL, _ARCHIVED_CUSTOMER_BY_EMAIL) if include_archived else (_CUSTOMER_BY_EMAIL,)
+        connection = ReadCRUD._email_connection(db, email)
+        return ReadCRUD._first(connection, *statements, email=email) if connection else None
+    
+    @staticmethod
+    def get_employment_by_customer(
+        db: Session,
+        customer_id: int,
+        include_archived: bool = False
+    ) -> Optional[RowMapping]:
+        # The current employment, else the most recent one, as in EmploymentCRUD
+        statements = (_CURRENT_EMPLOYMENT, _LATEST_EMPLOYMENT)
+        if include_archived:
+            statements += (_ARCHIVED_EMPLOYMENT,)
+        return ReadCRUD._first(ReadCRUD._connection(db, customer_id), *statements, customer_id=customer_id)
+
+
+class CustomerReadModelCRUD:
+    """
+    Customer reads served from the pre-serialized read model (app/read_model.py).
+    
+    They return response JSON rather than rows: nothing is hydrated or
+    validated, the stored fragments are only concatenated. Archived
+    customers are not in the read model, those reads stay on ReadCRUD
+    and CustomerCRUD.
+    """
+    @staticmethod
+    def get_customer_json(db: Session, customer_id: int) -> Optional[str]:
+        """CustomerWithEmploymentResponse JSON of a customer, or None if it is not in the read model."""
+        row = ReadCRUD._first(ReadCRUD._connection(db, customer_id), _READ_MODEL_BY_ID, customer_id=customer_id)
+        return read_model.detail_json(row["data"], row["employment"]) if row else None
+    
+    @staticmethod
+    def get_customer_json_by_email(db: Session, email: str) -> Optional[str]:
+        connection = ReadCRUD._email_connection(db, email)
+        row = ReadCRUD._first(connection, _READ_MODEL_BY_EMAIL, email=email) if connection else None
+        return read_model.detail_json(row["data"], row["employment"]) if row else None
+    
+    @staticmethod
+    def get_customers(
+        db: Session,
+        skip: int = 0,
+        limit: int = 100,
+        search: Optional[str] = None,
+        is_active: Optional[bool] = None,
+        country: Optional[str] = None,
+        state: Optional[str] = None,
+        city: Optional[str] = None,
+        updated_since: Optional[datetime] = None,
+        created_since: Optional[datetime] = None,
+        after_id: Optional[int] = None,
+        include_employment: bool = False
+    ) -> tuple[List[str], int]:
+        """
+        Same filters and order as CustomerCRUD.get_customers, returning
+        CustomerResponse JSON strings, or CustomerWithEmploymentResponse ones
+        with `include_employment`.
+        """
+        model = models.CustomerReadModel
+        # The sort columns are selected too, scatter_gather merges the shard pages on them
+        columns = [model.id, model.updated_at, model.data] + ([model.employment] if include_employment else [])
+        query, order_by = _filter_customers(
+            db.query(*columns),
+            model,
+            search=search,
+            is_active=is_active,
+            country=country,
+            state=state,
+            city=city,
+            updated_since=updated_since,
+            created_since=created_since,
+            after_id=after_id
+        )
+        order_by = order_by or [model.id]
+        
+        router = sharding.get_router(db)
+        if router:
+            rows, total = router.scatter_gather(query, order_by, skip, limit)
+        else:
+            total = query.count()
+            rows = query.order_by(*order_by).offset(skip).limit(limit).all()
+        
+        if include_employment:
+            return [read_model.detail_json(row.data, row.employment) for row in rows], total
+        return [row.data for row in rows], total
+    
+    @staticmethod
+    def rebuild(db: Session, batch_size: int = 1000) -> int:
+        """Regenerate the read model on every shard from the base tables, returning the number of customers."""
+        router = sharding.get_router(db)
+        count = 0
+        for shard_id in router.shard_ids if router else [None]:
+            count += read_model.rebuild(sharding.connection_for_shard(db, shard_id), batch_size)
+        db.commit()
+        return count
+
+
 class CustomerRegistrationCRUD:
     @staticmethod
     def create_customer_with_employment(
         db: Session, 
-        registration_data: schemas.CustomerRegistration
+        registration_data: schemas.CustomerRegistration,
+        before_commit: Optional[Callable[[models.Customer, models.Employment], None]] = None
     ) -> tuple[models.Customer, models.Employment]:
-        # Create customer first
-        customer = CustomerCRUD.create_customer(db, registration_data.customer)
-        
-        # Create employment
-        employment = EmploymentCRUD.create_employment(
-            db, 
-            customer.id, 
-            registration_data.employment
+        """
+        Create a customer and their employment in a single transaction.
+        `before_commit` is called with both, flushed, right before they are
+        committed.
+        """
+        CustomerCRUD._check_email_available(db, registration_data.customer.email)
+        
+        # A new customer has no current employment to move into the history
+        customer = models.Customer(**registration_data.customer.dict())
+        employment = models.Employment(**registration_data.employment.dict())
+        customer.employments.append(employment)
+        db.add(customer)
+        try:
+            ChangeLogCRUD.record(db, "customer", "create", customer)
+            ChangeLogCRUD.record(db, "employment", "create", employment)
+            DuplicateCRUD.sync_blocking_keys(db, customer, is_new=True)
+            if before_commit:
+                before_commit(customer, employment)
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Email already registered"
+            )
+        
+        db.refresh(customer)
+        db.refresh(employment)
+        return customer, employment
+    
+    @staticmethod
+    def create_customers_with_employment_batch(
+        db: Session,
+        registrations: List[schemas.CustomerRegistration],
+        before_commit: Optional[Callable[[List[tuple[Optional[int], Optional[str]]]], None]] = None
+    ) -> List[tuple[Optional[int], Optional[str]]]:
+        """
+        Register many customers in a single transaction.
+        
+        Returns a (customer_id, error) pair per registration, in order.
+        `before_commit` is called with those results right before they are
+        committed, so callers can write their own bookkeeping with them.
+        """
+        # Only emails the email filter cannot rule out are looked up
+        emails = list({registration.customer.email for registration in registrations})
+        checked = [email for email in emails if email_filter.might_contain(email)]
+        taken = {
+            email
+            for model in (models.Customer, models.ArchivedCustomer)
+            for (email,) in db.query(model.email).filter(model.email.in_(checked))
+        } if checked else set()
+        email_filter.record_false_positives(len(set(checked) - taken))
+        taken |= CustomerCRUD._archived_email_unguarded(db, list(set(emails) - set(checked)))
+        
+        results = []
+        created = []
+        for registration in registrations:
+            if registration.customer.email in taken:
+                results.append((None, "Email already registered"))
+                continue
+            taken.add(registration.customer.email)
+            
+            db_customer = models.Customer(**registration.customer.dict())
+            db_customer.employments.append(models.Employment(**registration.employment.dict()))
+            db.add(db_customer)
+            created.append((len(results), db_customer))
+            results.append((None, None))
+        
+        try:
+            db.flush()
+            for index, db_customer in created:
+                ChangeLogCRUD.record(db, "customer", "create", db_customer)
+                ChangeLogCRUD.record(db, "employment", "create", db_customer.employments[0])
+                DuplicateCRUD.sync_blocking_keys(db, db_customer, is_new=True)
+                results[index] = (db_customer.id, None)
+            if before_commit:
+                before_commit(results)
+            db.commit()
+        except IntegrityError:
+            # Another writer took one of the emails, fall back to one transaction per registration
+            db.rollback()
+            results = []
+            for registration in registrations:
+                try:
+                    customer, _ = CustomerRegistrationCRUD.create_customer_with_employment(db, registration)
+                    results.append((customer.id, None))
+                except HTTPException as e:
+                    db.rollback()
+                    results.append((None, e.detail))
+                except IntegrityError:
+                    db.rollback()
+                    results.append((None, "Email already registered"))
+            if before_commit:
+                before_commit(results)
+                db.commit()
+        
+        return results
+
+
+class IdempotencyCRUD:
+    @staticmethod
+    def hash_request(payload: dict) -> str:
+        body = json.dumps(payload, sort_keys=True, default=str)
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+    
+    @staticmethod
+    def get_response(
+        db: Session,
+        key: str,
+        method: str,
+        path: str,
+        request_hash: str
+    ) -> Optional[models.IdempotencyKey]:
+        record = db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.key == key
+        ).first()
+        
+        if not record or record.expires_at <= datetime.utcnow():
+            return None
+        
+        # The same key must not be reused for a different request
+        if (record.method, record.path, record.request_hash) != (method, path, request_hash):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        
+        return record
+    
+    @staticmethod
+    def add_response(
+        db: Session,
+        key: str,
+        method: str,
+        path: str,
+        request_hash: str,
+        status_code: int,
+        response_body: str
+    ) -> None:
+        """
+        Store the response of a request under its key. Not committed here: the
+        caller commits it together with the changes the response describes, so
+        a retry finds either both or neither.
+        """
+        now = datetime.utcnow()
+        
+        # Drop expired keys so the table stays compact
+        db.query(models.IdempotencyKey).filter(
+            models.IdempotencyKey.expires_at <= now
+        ).delete(synchronize_session=False)
+        
+        db.merge(models.IdempotencyKey(
+            key=key,
+            method=method,
+            path=path,
+            request_hash=request_hash,
+            status_code=status_code,
+            response_body=response_body,
+            created_at=now,
+            expires_at=now + timedelta(seconds=settings.idempotency_ttl_seconds)
+        ))
+
+
+class ChangeLogCRUD:
+    @staticmethod
+    def record(db: Session, entity: str, operation: str, instance) -> models.ChangeLog:
+        """
+        Append a change for `instance` to the change log.
+        
+        Must be called before the caller commits so the change is written in
+        the same transaction as the mutation itself.
+        """
+        # Flush so new rows have their ids and defaults assigned
+        db.flush()
+        
+        # Lock the change log until this transaction ends. The sequence number
+        # is assigned when the change is flushed, so without the lock a later
+        # seq could commit first and a reader that moved past it would never
+        # see the earlier one. With it, seqs become visible in order on every
+        # database; SQLite serializes writers anyway and ignores FOR UPDATE.
+        if not db.info.get("change_log_locked"):
+            db.query(models.ChangeLogLock).filter(models.ChangeLogLock.id == 1).with_for_update().first()
+            db.info["change_log_locked"] = True
+        
+        data = None
+        if operation not in ("hard_delete", "archive"):
+            data = json.dumps(
+                {column.key: getattr(instance, column.key) for column in instance.__table__.columns},
+                default=str
+            )
+        
+        change = models.ChangeLog(
+            entity=entity,
+            entity_id=instance.id,
+            customer_id=instance.id if entity == "customer" else instance.customer_id,
+            operation=operation,
+            data=data,
+            created_at=datetime.utcnow()
         )
+        db.add(change)
+        db.info["changes_pending"] = True
+        return change
+    
+    @staticmethod
+    def get_changes(db: Session, since: int = 0, limit: int = 100) -> List[models.ChangeLog]:
+        return db.query(models.ChangeLog).filter(
+            models.ChangeLog.seq > since
+        ).order_by(models.ChangeLog.seq).limit(limit).all()
+
+
+# The change log lock is released when the transaction ends, the next one
+# recording changes takes it again. Registered here rather than with the
+# change feed so sessions of the CLI tools, which never load it, reset too.
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _release_change_log_lock(session):
+    session.info.pop("change_log_locked", None)
+
+
+class DuplicateCRUD:
+    @staticmethod
+    def sync_blocking_keys(db: Session, customer: models.Customer, is_new: bool = False) -> None:
+        """
+        Bring the blocking keys of `customer` in line with its current fields.
+        
+        Must be called before the caller commits so the keys are written in the
+        same transaction as the customer.
+        """
+        wanted = set(dedup.blocking_keys(customer))
+        
+        existing = []
+        if not is_new:
+            existing = db.query(models.CustomerBlockingKey).filter(
+                models.CustomerBlockingKey.customer_id == customer.id
+            ).all()
         
-        return customer, employment 
\ No newline at end of file
+        for key in existing:
+            if (key.key_type, key.key_value) in wanted:
+                wanted.discard((key.key_type, key.key_value))
+            else:
+                db.delete(key)
+        
+        for key_type, key_value in wanted:
+            db.add(models.CustomerBlockingKey(
+                customer_id=customer.id,
+                key_type=key_type,
+                key_value=key_value
+            ))
+    
+    @staticmethod
+    def delete_blocking_keys(db: Session, customer_id: int) -> None:
+        db.query(models.CustomerBlockingKey).filter(
+            models.CustomerBlockingKey.customer_id == customer_id
+        ).delete(synchronize_session=False)
+    
+    @staticmethod
+    def get_possible_duplicates(
+        db: Session,
+        customer_id: int,
+        limit: int = 20
+    ) -> tuple[List[tuple[models.Customer, List[str]]], int]:
+        """
+        Return customers sharing at least one blocking key with `customer_id`,
+        most matching keys first, together with the keys they share.
+        """
+        own = aliased(models.CustomerBlockingKey)
+        other = aliased(models.CustomerBlockingKey)
+        rows = db.query(other.customer_id, other.key_type).join(
+            own,
+            and_(own.key_type == other.key_type, own.key_value == other.key_value)
+        ).filter(
+            own.customer_id == customer_id,
+            other.customer_id != customer_id
+        ).all()
+        
+        matches: dict[int, List[str]] = {}
+        for duplicate_id, key_type in rows:
+            matches.setdefault(duplicate_id, []).append(key_type)
+        
+        # Keys can outlive their customer (archived before its keys were removed
+        # with it), only count and rank customers that still exist
+        live_ids = {
+            duplicate_id for (duplicate_id,) in db.query(models.Customer.id).filter(
+                models.Customer.id.in_(list(matches))
+            )
+        } if matches else set()
+        matches = {duplicate_id: key_types for duplicate_id, key_types in matches.items() if duplicate_id in live_ids}
+        
+        ranked = sorted(matches.items(), key=lambda item: (-len(item[1]), item[0]))[:limit]
+        customers = {
+            customer.id: customer
+            for customer in db.query(models.Customer).filter(
+                models.Customer.id.in_([duplicate_id for duplicate_id, _ in ranked])
+            )
+        } if ranked else {}
+        
+        duplicates = [
+            (customers[duplicate_id], sorted(key_types, key=dedup.KEY_TYPES.index))
+            for duplicate_id, key_types in ranked
+            if duplicate_id in customers
+        ]
+        return duplicates, len(matches)
+    
+    @staticmethod
+    def find_duplicate_pairs(db: Session, max_block_size: int = 100) -> List[tuple[tuple[int, int], List[str]]]:
+        """
+        Find every pair of customers sharing a blocking key.
+        
+        Keys are read once in index order and only customers within the same
+        block are paired, so the cost grows with the number of keys rather
+        than quadratically with the number of customers. Blocks larger than
+        `max_block_size` are skipped, as a key shared by that many customers
+        says little about any one pair.
+        """
+        pairs: dict[tuple[int, int], List[str]] = {}
+        
+        def pair_block(key_type: str, block: List[int]) -> None:
+            if len(block) < 2 or len(block) > max_block_size:
+                return
+            block = sorted(set(block))
+            for i, customer_id in enumerate(block):
+                for duplicate_id in block[i + 1:]:
+                    pairs.setdefault((customer_id, duplicate_id), []).append(key_type)
+        
+        rows = db.query(
+            models.CustomerBlockingKey.key_type,
+            models.CustomerBlockingKey.key_value,
+            models.CustomerBlockingKey.customer_id
+        ).order_by(
+            models.CustomerBlockingKey.key_type,
+            models.CustomerBlockingKey.key_value
+        ).yield_per(10000)
+        
+        current, block = None, []
+        for key_type, key_value, customer_id in rows:
+            if (key_type, key_value) != current:
+                if current:
+                    pair_block(current[0], block)
+                current, block = (key_type, key_value), []
+            block.append(customer_id)
+        if current:
+            pair_block(current[0], block)
+        
+        return sorted(
+            ((pair, sorted(key_types, key=dedup.KEY_TYPES.index)) for pair, key_types in pairs.items()),
+            key=lambda item: (-len(item[1]), item[0])
+        )
+    
+    @staticmethod
+    def rebuild_blocking_keys(db: Session, batch_size: int = 1000) -> int:
+        """Recompute the blocking keys of all customers, returning the number of customers."""
+        db.query(models.CustomerBlockingKey).delete(synchronize_session=False)
+        
+        count = 0
+        last_id = 0
+        while True:
+            customers, _ = CustomerCRUD.get_customers(db, limit=batch_size, after_id=last_id)
+            if not customers:
+                break
+            for customer in customers:
+                DuplicateCRUD.sync_blocking_keys(db, customer, is_new=True)
+            db.flush()
+            count += len(customers)
+            last_id = customers[-1].id
+        
+        db.commit()
+        return count
+
+
+class GeoStatsCRUD:
+    @staticmethod
+    def get_geo_stats(
+        db: Session,
+        entity: str,
+        level: str = "country",
+        country: Optional[str] = None,
+        state: Optional[str] = None
+    ) -> List[dict]:
+        """
+        Return counts per location at `level` (country, state or city) from the rollups,
+        largest first. `entity` is "customer" or "employment" (by work location).
+        """
+        rollup = models.GeoRollup
+        columns = [getattr(rollup, name) for name in geo.LEVELS[:geo.LEVELS.index(level) + 1]]
+        
+        query = db.query(*columns, rollup.count, rollup.active_count).filter(rollup.entity == entity)
+        if country:
+            query = query.filter(rollup.country == country)
+        if state:
+            query = query.filter(rollup.state == state)
+        
+        # Summed here rather than in SQL so rollups from several shards combine too
+        groups: dict[tuple, list] = {}
+        for *location, count, active_count in query:
+            totals = groups.setdefault(tuple(location), [0, 0])
+            totals[0] += count
+            totals[1] += active_count
+        
+        stats = [
+            {
+                **{name: value or None for name, value in zip(geo.LEVELS, location)},
+                "count": count,
+                "active_count": active_count,
+            }
+            for location, (count, active_count) in groups.items()
+            if count > 0
+        ]
+        stats.sort(key=lambda group: (-group["count"], [group.get(name) or "" for name in geo.LEVELS]))
+        return stats
+
+
+class ArchiveCRUD:
+    @staticmethod
+    def archive_inactive_customers(
+        db: Session,
+        older_than_days: Optional[int] = None,
+        batch_size: Optional[int] = None
+    ) -> int:
+        """
+        Move customers that have been inactive for more than `older_than_days`
+        into customers_archive, together with their employment.
+        
+        Works in batches of `batch_size` customers, each in its own transaction,
+        and returns the number of customers archived. Archived customers keep
+        their email reserved and stay retrievable with `include_archived`.
+        """
+        older_than_days = settings.archive_after_days if older_than_days is None else older_than_days
+        batch_size = batch_size or settings.archive_batch_size
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        router = sharding.get_router(db)
+        
+        archived = 0
+        while True:
+            query = db.query(models.Customer.id).filter(
+                models.Customer.is_active == False,
+                models.Customer.updated_at < cutoff
+            )
+            if not router:
+                # SQLite hands out the largest id again once that row is deleted,
+                # keep the newest customer so an archived id is never reused
+                query = query.filter(models.Customer.id < db.query(func.max(models.Customer.id)).scalar_subquery())
+            customer_ids = [customer_id for (customer_id,) in query.order_by(models.Customer.id).limit(batch_size)]
+            if not customer_ids:
+                break
+            
+            ids_by_shard: dict[Optional[str], List[int]] = {}
+            for customer_id in customer_ids:
+                ids_by_shard.setdefault(router.shard_for_id(customer_id) if router else None, []).append(customer_id)
+            
+            now = datetime.utcnow()
+            rollup_deltas: dict[tuple, list] = {}
+            for shard_id, shard_customer_ids in ids_by_shard.items():
+                connection = sharding.connection_for_shard(db, shard_id)
+                read_model.remove(connection, shard_customer_ids)
+                for model, archive_model, key in (
+                    (models.Employment, models.ArchivedEmployment, models.Employment.customer_id),
+                    (models.Customer, models.ArchivedCustomer, models.Customer.id),
+                ):
+                    rows = connection.execute(select(model.__table__).where(key.in_(shard_customer_ids))).all()
+                    if not rows:
+                        continue
+                    connection.execute(
+                        insert(archive_model.__table__),
+                        [dict(row._mapping, archived_at=now) for row in rows]
+                    )
+                    connection.execute(delete(model.__table__).where(key.in_(shard_customer_ids)))
+                    
+                    # Archived rows leave the location rollups like deleted ones
+                    entity, attributes, active_attribute = geo.TRACKED[model]
+                    for row in rows:
+                        location = tuple(getattr(row, attribute) or "" for attribute in attributes)
+                        delta = rollup_deltas.setdefault((shard_id, entity, location), [0, 0])
+                        delta[0] -= 1
+                        delta[1] -= 1 if getattr(row, active_attribute) is not False else 0
+                        ChangeLogCRUD.record(db, entity, "archive", row)
+                        if model is models.Employment:
+                            suggest.record(db, row, -1)
+            
+            # Archived customers are no longer duplicate candidates
+            db.query(models.CustomerBlockingKey).filter(
+                models.CustomerBlockingKey.customer_id.in_(customer_ids)
+            ).delete(synchronize_session=False)
+            
+            geo.apply_deltas(db, rollup_deltas)
+            db.commit()
+            archived += len(customer_ids)
+        
+        return archived
+
+
+class ImportJobCRUD:
+    @staticmethod
+    def create_job(
+        db: Session,
+        job_id: str,
+        filename: str,
+        columns: List[str],
+        header_bytes: int,
+        total_bytes: int
+    ) -> models.ImportJob:
+        job = models.ImportJob(
+            id=job_id,
+            filename=filename,
+            status=schemas.ImportJobStatus.PENDING.value,
+            columns=json.dumps(columns),
+            total_bytes=total_bytes,
+            bytes_processed=header_bytes,
+            created_at=datetime.utcnow()
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        return job
+    
+    @staticmethod
+    def get_job(db: Session, job_id: str) -> Optional[models.ImportJob]:
+        return db.query(models.ImportJob).filter(models.ImportJob.id == job_id).first()
+    
+    @staticmethod
+    def get_next_job(db: Session) -> Optional[models.ImportJob]:
+        """Oldest import that has not finished, including ones interrupted while running."""
+        return db.query(models.ImportJob).filter(
+            models.ImportJob.status.in_([
+                schemas.ImportJobStatus.PENDING.value,
+                schemas.ImportJobStatus.RUNNING.value
+            ])
+        ).order_by(models.ImportJob.created_at).first()
+    
+    @staticmethod
+    def start_job(db: Session, job: models.ImportJob) -> None:
+        job.status = schemas.ImportJobStatus.RUNNING.value
+        job.started_at = job.started_at or datetime.utcnow()
+        job.updated_at = datetime.utcnow()
+        db.commit()
+    
+    @staticmethod
+    def import_chunk(
+        db: Session,
+        job: models.ImportJob,
+        registrations: List[tuple[int, schemas.CustomerRegistration]],
+        row_errors: List[tuple[int, str]],
+        rows: int,
+        bytes_processed: int,
+        seconds: float
+    ) -> None:
+        """
+        Register a chunk of imported rows and move the job's checkpoint past it.
+        
+        `registrations` and `row_errors` hold the valid and invalid rows of the
+        chunk, keyed by row number. The checkpoint is committed in the same
+        transaction as the registrations, so a chunk interrupted by a crash is
+        either fully imported or retried in full on resume. Only if the batch
+        falls back to one transaction per registration can part of a chunk be
+        committed without the checkpoint; those rows are then reported as
+        already registered on resume.
+        """
+        updated_at = datetime.utcnow()
+        
+        def advance(results: List[tuple[Optional[int], Optional[str]]]) -> None:
+            failed = row_errors + [
+                (row, error)
+                for (row, _), (_, error) in zip(registrations, results)
+                if error
+            ]
+            errors = json.loads(job.errors) if job.errors else []
+            room = settings.import_max_errors - len(errors)
+            if room > 0:
+                errors.extend({"row": row, "error": error} for row, error in sorted(failed)[:room])
+                job.errors = json.dumps(errors)
+            
+            job.rows_processed += rows
+            job.rows_imported += rows - len(failed)
+            job.rows_failed += len(failed)
+            job.bytes_processed = bytes_processed
+            job.processing_seconds += seconds
+            job.updated_at = updated_at
+        
+        CustomerRegistrationCRUD.create_customers_with_employment_batch(
+            db=db,
+            registrations=[registration for _, registration in registrations],
+            before_commit=advance
+        )
+    
+    @staticmethod
+    def finish_job(db: Session, job: models.ImportJob, error: Optional[str] = None) -> None:
+        job.status = (schemas.ImportJobStatus.FAILED if error else schemas.ImportJobStatus.COMPLETED).value
+        job.error = error
+        job.updated_at = job.completed_at = datetime.utcnow()
+        db.commit()
@@ -1,25 +1,108 @@
-from sqlalchemy import create_engine
+import itertools
+import time
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from app import deadlines
 from app.config import settings
 
+# Cookie set after a client's write so its next reads can be routed to the primary
+LAST_WRITE_COOKIE = "last_write_at"
+
+
+def _connect_args(database_url: str) -> dict:
+    return {"check_same_thread": False} if "sqlite" in database_url else {}
+
+
 # Create database engine
 engine = create_engine(
     settings.database_url,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
+    connect_args=_connect_args(settings.database_url)
 )
 
+# Create customer shard engines, keyed by shard id
+shard_engines = {
+    str(shard_id): create_engine(url, connect_args=_connect_args(url))
+    for shard_id, url in enumerate(settings.shard_urls)
+}
+
+# Readers, including online snapshots (app/snapshots.py), do not block writers in WAL mode
+def _set_journal_mode(dbapi_connection, connection_record):
+    dbapi_connection.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+
+
+for writable_engine in [engine, *shard_engines.values()]:
+    if writable_engine.dialect.name == "sqlite" and settings.sqlite_journal_mode:
+        event.listen(writable_engine, "connect", _set_journal_mode)
+
+# Create read replica engines, used only by read endpoints (not combined with sharding)
+replica_engines = [
+    create_engine(url, connect_args=_connect_args(url))
+    for url in settings.read_replica_urls
+] if not shard_engines else []
+
+# Unpooled engines for health checks, so an exhausted pool is not mistaken for an unreachable database
+def _health_check_engine(database_engine):
+    return create_engine(
+        database_engine.url,
+        connect_args=_connect_args(database_engine.url.drivername),
+        poolclass=NullPool
+    )
+
+
+pooled_engines = {
+    "primary": engine,
+    **{f"shard_{shard_id}": shard_engine for shard_id, shard_engine in shard_engines.items()},
+    **{f"replica_{index}": replica_engine for index, replica_engine in enumerate(replica_engines)},
+}
+health_check_engines = {name: _health_check_engine(database_engine) for name, database_engine in pooled_engines.items()}
+
 # Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+if shard_engines:
+    from app.sharding import make_sharded_sessionmaker
+    SessionLocal = make_sharded_sessionmaker(engine, shard_engines, twophase=settings.shard_two_phase_commit)
+else:
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Create replica session classes, picked round-robin
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+_replica_sessions = itertools.cycle(ReplicaSessionLocals)
 
 # Create Base class
 Base = declarative_base()
 
 
 # Dependency to get database session
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    deadlines.attach(db, request)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def _wrote_recently(request: Request) -> bool:
+    try:
+        last_write = float(request.cookies.get(LAST_WRITE_COOKIE, 0))
+    except ValueError:
+        return False
+    return time.time() - last_write < settings.read_your_writes_seconds
+
+
+# Dependency to get a read-only database session, served by a replica when configured
+def get_read_db(request: Request):
+    if ReplicaSessionLocals and not _wrote_recently(request):
+        db = next(_replica_sessions)()
+    else:
+        db = SessionLocal()
+    deadlines.attach(db, request)
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
@@ -0,0 +1,177 @@
+import asyncio
+import math
+import sqlite3
+import time
+from typing import Callable, List, Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import Pool
+from starlette.types import ASGIApp, Receive, Scope, Send
+from app.admission import BULK, LONG_POLL, READ, long_poll_wait, route_class
+from app.config import settings
+
+# API reads get a deadline when they start running, and the database work of
+# their sessions is stopped once it passes or the client disconnects: SQLite
+# queries through a progress handler that interrupts them, PostgreSQL ones
+# through statement_timeout (and a cancel request on disconnect). The
+# interrupted query surfaces as DeadlineExceeded, answered with 504, so a
+# runaway search gives its pool connection back instead of holding it until
+# the query completes. Writes are never interrupted.
+
+# SQLite virtual machine instructions between deadline checks
+_PROGRESS_INSTRUCTIONS = 10000
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, deadline: "Deadline"):
+        self.deadline = deadline
+        self.elapsed = deadline.elapsed()
+        if deadline.disconnected and deadline.cancel_on_disconnect:
+            message = f"Request cancelled after {self.elapsed:.2f}s, the client disconnected"
+        else:
+            message = f"Request exceeded its {deadline.timeout:g}s deadline after {self.elapsed:.2f}s"
+        super().__init__(message)
+
+
+class Deadline:
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self.expires_at = self.started + timeout
+        self.disconnected = False
+        # Cleared while other requests share this one's result (see app/single_flight.py)
+        self.cancel_on_disconnect = True
+        self._cancel_callbacks: List[Callable[[], None]] = []
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def exceeded(self) -> bool:
+        return (self.disconnected and self.cancel_on_disconnect) or time.monotonic() >= self.expires_at
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """Call `callback` if the request is cancelled by a client disconnect."""
+        self._cancel_callbacks.append(callback)
+
+    def client_disconnected(self) -> None:
+        self.disconnected = True
+        if self.cancel_on_disconnect:
+            for callback in self._cancel_callbacks:
+                callback()
+
+    def keep_on_disconnect(self) -> None:
+        self.cancel_on_disconnect = False
+
+
+def route_deadline(method: str, path: str, query_string: bytes = b"") -> Optional[float]:
+    """Deadline in seconds of a request, or None if it has none."""
+    if method not in ("GET", "HEAD"):
+        return None
+    request_class = route_class(method, path, query_string)
+    timeout_ms = {
+        READ: settings.request_deadline_read_ms,
+        BULK: settings.request_deadline_bulk_ms,
+        LONG_POLL: settings.request_deadline_read_ms,
+    }.get(request_class, 0)
+    if timeout_ms <= 0:
+        return None
+    if request_class == LONG_POLL:
+        # The wait itself comes on top of the time its reads may take
+        timeout_ms += long_poll_wait(query_string) * 1000
+    return timeout_ms / 1000
+
+
+def attach(db: Session, request: Request) -> None:
+    """Apply the request's deadline, if it has one, to the queries of `db`."""
+    deadline = getattr(request.state, "deadline", None)
+    if deadline:
+        db.info["deadline"] = deadline
+
+
+@event.listens_for(Session, "after_begin")
+def _apply_deadline(session, transaction, connection):
+    deadline = session.info.get("deadline")
+    if deadline is None:
+        return
+    if deadline.exceeded():
+        raise DeadlineExceeded(deadline)
+
+    # Kept with the pooled connection until it is checked in again
+    connection.info["deadline"] = deadline
+    dbapi_connection = connection.connection.dbapi_connection
+    if connection.dialect.name == "sqlite":
+        dbapi_connection.set_progress_handler(lambda: deadline.exceeded(), _PROGRESS_INSTRUCTIONS)
+    elif connection.dialect.name == "postgresql":
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {max(1, math.ceil(deadline.remaining() * 1000))}")
+        if hasattr(dbapi_connection, "cancel"):
+            record_info = connection.info
+
+            def cancel() -> None:
+                # Unless the connection has moved on to another request
+                if record_info.get("deadline") is deadline:
+                    dbapi_connection.cancel()
+
+            deadline.on_cancel(cancel)
+
+
+@event.listens_for(Pool, "checkin")
+def _clear_deadline(dbapi_connection, connection_record):
+    if connection_record.info.pop("deadline", None) is not None and isinstance(dbapi_connection, sqlite3.Connection):
+        dbapi_connection.set_progress_handler(None, 0)
+
+
+@event.listens_for(Engine, "handle_error")
+def _deadline_error(context):
+    # An interrupted or timed out query of a request past its deadline
+    connection = context.connection
+    deadline = connection.info.get("deadline") if connection is not None and not connection.invalidated else None
+    if deadline is not None and deadline.exceeded():
+        raise DeadlineExceeded(deadline) from context.original_exception
+
+
+class DeadlineMiddleware:
+    """
+    Give API reads a deadline: `request_deadline_read_ms` for point reads and
+    `request_deadline_bulk_ms` for list, search and statistics routes.
+
+    The deadline is stored in the request state, from which the database
+    dependencies apply it to their sessions, and is cancelled early if the
+    client disconnects.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        timeout = None
+        if scope["type"] == "http":
+            timeout = route_deadline(scope["method"], scope["path"], scope.get("query_string", b""))
+        if timeout is None:
+            await self.app(scope, receive, send)
+            return
+
+        deadline = Deadline(timeout)
+        scope.setdefault("state", {})["deadline"] = deadline
+
+        # Read the client's messages as they come, to notice a disconnect
+        # while the request is still running, and hand them on to the app
+        messages: asyncio.Queue = asyncio.Queue()
+
+        async def watch_disconnect() -> None:
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    deadline.client_disconnected()
+                    return
+
+        watcher = asyncio.ensure_future(watch_disconnect())
+        try:
+            await self.app(scope, messages.get, send)
+        finally:
+            watcher.cancel()
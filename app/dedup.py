@@ -0,0 +1,118 @@
+import argparse
+import json
+import unicodedata
+from typing import List, Tuple
+
+# Blocking keys for duplicate-customer detection.
+#
+# Comparing every customer with every other one is O(n²). Instead each
+# customer gets a few cheap keys, and only customers sharing a key are
+# considered possible duplicates:
+#
+#   phone        last 10 digits of the phone number
+#   name_dob     soundex of both names (in either order) plus date of birth
+#   postal_name  normalized postal code plus soundex of the last name
+#
+# Postal codes alone are shared by thousands of people, so they are paired
+# with the last name to keep blocks small.
+
+KEY_TYPES = ("phone", "name_dob", "postal_name")
+
+_SOUNDEX_CODES = {
+    **dict.fromkeys("BFPV", "1"),
+    **dict.fromkeys("CGJKQSXZ", "2"),
+    **dict.fromkeys("DT", "3"),
+    "L": "4",
+    **dict.fromkeys("MN", "5"),
+    "R": "6",
+}
+
+
+def _ascii_letters(value: str) -> str:
+    # Fold accents so "Müller" and "Muller" get the same code
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(ch for ch in decomposed.upper() if "A" <= ch <= "Z")
+
+
+def soundex(name: str) -> str:
+    """American Soundex code of a name, or "" if it has no Latin letters."""
+    letters = _ascii_letters(name)
+    if not letters:
+        return ""
+
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], "")
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, "")
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # H and W do not separate letters with the same code, vowels do
+        if letter not in "HW":
+            previous = digit
+    return code.ljust(4, "0")
+
+
+def normalize_phone(phone: str) -> str:
+    """Digits of a phone number with all formatting removed."""
+    return "".join(ch for ch in phone if ch in "0123456789")
+
+
+def normalize_postal_code(postal_code: str) -> str:
+    return "".join(ch for ch in postal_code.upper() if ch.isalnum())
+
+
+def blocking_keys(customer) -> List[Tuple[str, str]]:
+    """Blocking keys of a customer (a model or schema with the customer fields)."""
+    keys = []
+
+    # Compare national numbers so "+1 555 123 4567" matches "555-123-4567"
+    phone = normalize_phone(customer.phone or "")[-10:]
+    if len(phone) == 10:
+        keys.append(("phone", phone))
+
+    first, last = soundex(customer.first_name or ""), soundex(customer.last_name or "")
+    if first and last and customer.date_of_birth:
+        names = "".join(sorted((first, last)))
+        keys.append(("name_dob", f"{names}:{customer.date_of_birth.isoformat()}"))
+
+    postal_code = normalize_postal_code(customer.postal_code or "")
+    if postal_code and last:
+        keys.append(("postal_name", f"{postal_code}:{last}"))
+
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find possible duplicate customers and print them as JSON lines."
+    )
+    parser.add_argument("--rebuild", action="store_true", help="Recompute all blocking keys first")
+    parser.add_argument("--max-block-size", type=int, default=None, help="Skip blocks larger than this")
+    args = parser.parse_args()
+
+    from app import crud, models
+    from app.config import settings
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            crud.DuplicateCRUD.rebuild_blocking_keys(db)
+
+        max_block_size = args.max_block_size or settings.dedup_max_block_size
+        for (customer_id, duplicate_id), matched_keys in crud.DuplicateCRUD.find_duplicate_pairs(db, max_block_size):
+            print(json.dumps({
+                "customer_ids": [customer_id, duplicate_id],
+                "matched_keys": matched_keys,
+                "score": round(len(matched_keys) / len(KEY_TYPES), 2),
+            }))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import hashlib
+import math
+import threading
+from collections import Counter
+from typing import List, Optional
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from app import models, sharding
+from app.config import settings
+
+# In-memory Bloom filter over every registered email, archived ones included.
+#
+# Registration looks an email up in the filter before querying the database:
+# a miss means this process has never seen the email and the existence check
+# of the live customers is skipped, while a hit (taken, or a false positive)
+# runs the usual query. The unique email index (the customer directory when
+# sharded) stays the final guard. Unsharded, that index does not cover
+# customers_archive, and archivals by other server processes never reach this
+# one's filter, so a miss still looks the email up in the archive (one indexed
+# query). The filter is loaded from the database at startup and emails are
+# added when a transaction flushes them, so they are in it before they commit.
+# Bits cannot be cleared: emails freed by a hard delete or an email change
+# stay in the filter as stale entries, which only cost false positives. Once
+# stale entries or growth past the sized capacity push the estimated
+# false-positive rate over twice the target, the filter is rebuilt in the
+# background. Writes made by other server processes show up after a restart.
+
+_SCAN_BATCH_SIZE = 10000
+
+
+def _positions(email: str, size: int, hashes: int) -> List[int]:
+    # Double hashing: two 64-bit halves of one digest give all the positions
+    digest = hashlib.blake2b(email.encode("utf-8"), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+    return [(first + i * second) % size for i in range(hashes)]
+
+
+class _Bits:
+    def __init__(self, capacity: int, false_positive_rate: float):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(false_positive_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.array = bytearray((self.size + 7) // 8)
+        self.set_bits = 0
+
+    def add(self, email: str) -> None:
+        array = self.array
+        for position in _positions(email, self.size, self.hashes):
+            mask = 1 << (position & 7)
+            if not array[position >> 3] & mask:
+                array[position >> 3] |= mask
+                self.set_bits += 1
+
+    def __contains__(self, email: str) -> bool:
+        array = self.array
+        return all(array[position >> 3] & (1 << (position & 7)) for position in _positions(email, self.size, self.hashes))
+
+    def estimated_false_positive_rate(self) -> float:
+        return (self.set_bits / self.size) ** self.hashes
+
+
+class EmailFilter:
+    def __init__(self):
+        # Serializes bit updates; lookups read without it
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._bits: Optional[_Bits] = None
+        self._pending: Optional[List[str]] = None
+        # Emails flushed by transactions that have not finished yet
+        self._uncommitted: Counter = Counter()
+        self._session_factory = None
+        self.built = False
+        self.entries = 0
+        self.stale_entries = 0
+        self.rebuilds = 0
+        self.checks = 0
+        self.definite_misses = 0
+        self.false_positives = 0
+
+    def rebuild(self, session_factory) -> None:
+        """Load the filter from the database, sized for twice the current emails."""
+        self._session_factory = session_factory
+        with self._rebuild_lock:
+            # Emails flushed while the scan runs, or flushed before it and
+            # committed too late for it to see, are added to the new filter too
+            with self._lock:
+                self._pending = list(self._uncommitted)
+            try:
+                db = session_factory()
+                try:
+                    bits, entries = self._scan(db)
+                finally:
+                    db.close()
+                with self._lock:
+                    for email in self._pending:
+                        bits.add(email)
+                    self._bits = bits
+                    self.entries = entries + len(self._pending)
+                    self.stale_entries = 0
+                    self.rebuilds += 1
+                    self.built = True
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def _scan(self, db: Session) -> tuple:
+        if sharding.get_router(db):
+            # The directory holds every email, archived customers keep theirs
+            connection = sharding.connection_for_shard(db, sharding.DIRECTORY)
+            tables = [models.CustomerDirectory.__table__]
+        else:
+            connection = sharding.connection_for_shard(db, None)
+            tables = [models.Customer.__table__, models.ArchivedCustomer.__table__]
+
+        count = sum(connection.execute(select(func.count()).select_from(table)).scalar() for table in tables)
+        bits = _Bits(max(settings.email_filter_capacity, 2 * count), settings.email_filter_false_positive_rate)
+        entries = 0
+        for table in tables:
+            result = connection.execution_options(yield_per=_SCAN_BATCH_SIZE).execute(select(table.c.email))
+            for batch in result.scalars().partitions():
+                for email in batch:
+                    bits.add(email)
+                entries += len(batch)
+        return bits, entries
+
+    def might_contain(self, email: str) -> bool:
+        """False if `email` is certainly not registered, True if it may be."""
+        bits = self._bits
+        if bits is None or not settings.email_filter_enabled:
+            return True
+        self.checks += 1
+        if email in bits:
+            return True
+        self.definite_misses += 1
+        return False
+
+    def record_false_positives(self, count: int = 1) -> None:
+        """Count emails the filter may have contained that the database did not."""
+        self.false_positives += count
+
+    def add(self, emails: List[str]) -> None:
+        with self._lock:
+            self._uncommitted.update(emails)
+            if self._pending is not None:
+                self._pending.extend(emails)
+            if self._bits is None:
+                return
+            for email in emails:
+                self._bits.add(email)
+                self.entries += 1
+            over_target = self._bits.estimated_false_positive_rate() > 2 * settings.email_filter_false_positive_rate
+        if over_target:
+            self._rebuild_in_background()
+
+    def finish(self, added: List[str], freed: List[str]) -> None:
+        """
+        End the transaction that flushed `added`. `freed` are emails it made
+        available again, they stay in the filter until it is rebuilt.
+        """
+        with self._lock:
+            for email in added:
+                self._uncommitted[email] -= 1
+                if self._uncommitted[email] <= 0:
+                    del self._uncommitted[email]
+            self.stale_entries += len(freed)
+
+    def _rebuild_in_background(self) -> None:
+        if self._session_factory is None or self._rebuild_lock.locked():
+            return
+        threading.Thread(target=self.rebuild, args=(self._session_factory,), daemon=True).start()
+
+    def stats(self) -> dict:
+        bits = self._bits
+        lookups = self.false_positives + self.definite_misses
+        return {
+            "enabled": settings.email_filter_enabled,
+            "built": self.built,
+            "entries": self.entries,
+            "stale_entries": self.stale_entries,
+            "capacity": bits.capacity if bits else 0,
+            "hashes": bits.hashes if bits else 0,
+            "memory_bytes": len(bits.array) if bits else 0,
+            "fill_ratio": round(bits.set_bits / bits.size, 4) if bits else 0.0,
+            "target_false_positive_rate": settings.email_filter_false_positive_rate,
+            "estimated_false_positive_rate": round(bits.estimated_false_positive_rate(), 6) if bits else 0.0,
+            # Of the checked emails that were not registered, the share the filter could not rule out
+            "observed_false_positive_rate": round(self.false_positives / lookups, 6) if lookups else 0.0,
+            "checks": self.checks,
+            "definite_misses": self.definite_misses,
+            "rebuilds": self.rebuilds,
+        }
+
+
+email_filter = EmailFilter()
+
+
+@event.listens_for(Session, "after_flush")
+def _add_flushed_emails(session, flush_context):
+    added = []
+    freed = session.info.setdefault("freed_emails", [])
+    for instance in session.new:
+        if isinstance(instance, models.Customer):
+            added.append(instance.email)
+
+    for instance in session.dirty:
+        if isinstance(instance, models.Customer):
+            history = inspect(instance).attrs.email.history
+            if history.has_changes():
+                added.extend(history.added)
+                freed.extend(history.deleted)
+
+    for instance in session.deleted:
+        if isinstance(instance, models.Customer):
+            freed.append(instance.email)
+
+    # Added before the commit, a rolled back email is only a stale entry
+    if added:
+        session.info.setdefault("flushed_emails", []).extend(added)
+        email_filter.add(added)
+
+
+@event.listens_for(Session, "after_commit")
+def _finish_committed_emails(session):
+    added = session.info.pop("flushed_emails", [])
+    freed = session.info.pop("freed_emails", [])
+    if added or freed:
+        email_filter.finish(added, freed)
+
+
+@event.listens_for(Session, "after_rollback")
+def _finish_rolled_back_emails(session):
+    added = session.info.pop("flushed_emails", [])
+    session.info.pop("freed_emails", None)
+    if added:
+        email_filter.finish(added, [])
@@ -0,0 +1,93 @@
+from typing import Dict, Tuple
+from sqlalchemy import and_, event, insert, inspect, update
+from sqlalchemy.orm import Session
+from app import models, sharding
+
+# Customer and employment counts per country/state/city, kept in the
+# geo_rollups table so location dashboards read one row per group instead of
+# scanning every customer. Counts are adjusted after every flush from the
+# attribute history of the flushed rows, in the same transaction. With
+# sharding each shard keeps the rollups of its own rows.
+
+LEVELS = ("country", "state", "city")
+
+# Model -> (rollup entity, location attributes, "active" attribute)
+TRACKED = {
+    models.Customer: ("customer", ("country", "state", "city"), "is_active"),
+    models.Employment: ("employment", ("work_country", "work_state", "work_city"), "is_current_employment"),
+}
+
+
+def _value(instance, attribute: str, previous: bool):
+    if previous:
+        history = inspect(instance).attrs[attribute].history
+        if history.deleted:
+            return history.deleted[0]
+    return getattr(instance, attribute)
+
+
+def _location(instance, attributes: tuple, active_attribute: str, previous: bool = False) -> Tuple[tuple, bool]:
+    location = tuple(_value(instance, attribute, previous) or "" for attribute in attributes)
+    # Unset flags default to True in both models
+    return location, _value(instance, active_attribute, previous) is not False
+
+
+@event.listens_for(Session, "after_flush")
+def _update_geo_rollups(session, flush_context):
+    # (shard, entity, location) -> [count delta, active count delta]
+    deltas: Dict[tuple, list] = {}
+
+    def add(instance, entity: str, location: tuple, active: bool, sign: int) -> None:
+        key = (sharding.shard_id_of(session, instance), entity, location)
+        delta = deltas.setdefault(key, [0, 0])
+        delta[0] += sign
+        delta[1] += sign if active else 0
+
+    for instances, change in ((session.new, "new"), (session.dirty, "dirty"), (session.deleted, "deleted")):
+        for instance in instances:
+            tracked = TRACKED.get(type(instance))
+            if not tracked:
+                continue
+            entity, attributes, active_attribute = tracked
+
+            if change == "new":
+                add(instance, entity, *_location(instance, attributes, active_attribute), 1)
+            elif change == "deleted":
+                add(instance, entity, *_location(instance, attributes, active_attribute, previous=True), -1)
+            else:
+                before = _location(instance, attributes, active_attribute, previous=True)
+                after = _location(instance, attributes, active_attribute)
+                if before != after:
+                    add(instance, entity, *before, -1)
+                    add(instance, entity, *after, 1)
+
+    apply_deltas(session, deltas)
+
+
+def apply_deltas(session: Session, deltas: Dict[tuple, list]) -> None:
+    """Add {(shard, entity, location): [count, active count]} deltas to the rollups."""
+    rollups = models.GeoRollup.__table__
+    for (shard_id, entity, (country, state, city)), (count, active_count) in deltas.items():
+        if not count and not active_count:
+            continue
+        connection = sharding.connection_for_shard(session, shard_id)
+        result = connection.execute(
+            update(rollups).where(and_(
+                rollups.c.entity == entity,
+                rollups.c.country == country,
+                rollups.c.state == state,
+                rollups.c.city == city
+            )).values(
+                count=rollups.c.count + count,
+                active_count=rollups.c.active_count + active_count
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(rollups).values(
+                entity=entity,
+                country=country,
+                state=state,
+                city=city,
+                count=count,
+                active_count=active_count
+            ))
@@ -0,0 +1,78 @@
+import asyncio
+import time
+from typing import Tuple
+from sqlalchemy import text
+from app.admission import admission_controller
+from app.config import settings
+from app.database import health_check_engines, pooled_engines
+from app.email_filter import email_filter
+
+
+def _ping(database_engine) -> None:
+    with database_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def _check_database(name: str) -> dict:
+    # Runs outside the request thread pool, so a saturated API can still report on itself
+    start = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(_ping, health_check_engines[name]),
+            settings.health_check_timeout_seconds
+        )
+    except asyncio.TimeoutError:
+        return {"reachable": False, "error": "timed out"}
+    except Exception as e:
+        return {"reachable": False, "error": str(e).splitlines()[0]}
+    return {"reachable": True, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+
+
+def _pool_stats(database_engine) -> dict:
+    pool = database_engine.pool
+    stats = {"checked_out": pool.checkedout()} if hasattr(pool, "checkedout") else {}
+    if hasattr(pool, "size") and hasattr(pool, "overflow"):
+        # A negative max_overflow means the pool can always grow
+        max_overflow = getattr(pool, "_max_overflow", -1)
+        stats["size"] = pool.size()
+        stats["overflow"] = max(pool.overflow(), 0)
+        stats["exhausted"] = max_overflow >= 0 and pool.checkedout() >= pool.size() + max_overflow
+    return stats
+
+
+async def check_health() -> Tuple[bool, dict]:
+    """
+    Check every database and report how loaded the API is.
+
+    Returns whether all databases are reachable, and a report whose status is
+    "unhealthy" if one is not, "degraded" while requests queue for admission
+    or a connection pool is exhausted, and "healthy" otherwise.
+    """
+    names = list(health_check_engines)
+    results = await asyncio.gather(*(_check_database(name) for name in names))
+    databases = dict(zip(names, results))
+    pools = {name: _pool_stats(database_engine) for name, database_engine in pooled_engines.items()}
+
+    reachable = all(result["reachable"] for result in results)
+    saturated = admission_controller.saturated() or any(pool.get("exhausted") for pool in pools.values())
+
+    if not reachable:
+        status, message = "unhealthy", "A database is unreachable"
+    elif saturated:
+        status, message = "degraded", "Customer Registration System API is running at capacity"
+    else:
+        status, message = "healthy", "Customer Registration System API is running"
+
+    return reachable, {
+        "status": status,
+        "message": message,
+        "success": reachable,
+        "databases": databases,
+        "admission": {
+            "enabled": settings.admission_control_enabled,
+            "classes": admission_controller.stats(),
+            "rate_limited": admission_controller.rate_limited,
+        },
+        "pools": pools,
+        "email_filter": email_filter.stats(),
+    }
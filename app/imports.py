@@ -0,0 +1,230 @@
+import csv
+import itertools
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app import crud, models, schemas
+from app.bulk_validation import validate_batch
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# CSV columns are the fields of CustomerRegistration without the nesting,
+# e.g. "email" or "company_name". Empty cells of optional fields are missing.
+CUSTOMER_COLUMNS = tuple(schemas.CustomerCreate.model_fields)
+EMPLOYMENT_COLUMNS = tuple(schemas.EmploymentCreate.model_fields)
+REQUIRED_COLUMNS = tuple(
+    name
+    for model in (schemas.CustomerCreate, schemas.EmploymentCreate)
+    for name, field in model.model_fields.items()
+    if field.is_required()
+)
+
+_COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def job_path(job_id: str) -> str:
+    return os.path.join(settings.import_directory, f"{job_id}.csv")
+
+
+def read_header(file: BinaryIO) -> Tuple[List[str], int]:
+    """
+    Parse the header of a CSV file, returning the columns and the byte
+    offset of the first row. Raises ValueError if the columns do not match
+    the registration fields.
+    """
+    line = file.readline()
+    try:
+        header = line.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV file must be UTF-8 encoded")
+    columns = [column.strip() for column in next(csv.reader([header]), [])]
+
+    unknown = [column for column in columns if column not in CUSTOMER_COLUMNS + EMPLOYMENT_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    duplicated = sorted({column for column in columns if columns.count(column) > 1})
+    if duplicated:
+        raise ValueError(f"Duplicated columns: {', '.join(duplicated)}")
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    return columns, len(line)
+
+
+class _RecordReader:
+    """CSV records of a file from a byte offset, tracking the offset just past the last record read."""
+
+    def __init__(self, file: BinaryIO, offset: int):
+        file.seek(offset)
+        self.file = file
+        self.offset = offset
+        # csv pulls one more line only while a quoted field is still open,
+        # so after each record `offset` is exactly where the next one starts
+        self._records = csv.reader(self._lines())
+
+    def _lines(self) -> Iterator[str]:
+        for line in self.file:
+            self.offset += len(line)
+            yield line.decode("utf-8")
+
+    def __iter__(self) -> Iterator[List[str]]:
+        return (record for record in self._records if record)
+
+
+def _registration(columns: List[str], record: List[str]) -> dict:
+    registration: Dict[str, dict] = {"customer": {}, "employment": {}}
+    for column, value in zip(columns, record):
+        if value == "" and column not in REQUIRED_COLUMNS:
+            continue
+        registration["customer" if column in CUSTOMER_COLUMNS else "employment"][column] = value
+    return registration
+
+
+def _format_errors(errors: list) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in errors)
+
+
+class ImportRunner:
+    """
+    Background importer for CSV files of registrations.
+
+    Uploads are saved to the import directory and imported one at a time by a
+    worker thread, in chunks of `import_chunk_size` rows. Each chunk is
+    validated column-wise and committed together with the job's checkpoint,
+    the byte offset of the next row. Imports interrupted by a crash or a
+    shutdown are picked up again from their checkpoint when the worker starts.
+    """
+
+    def __init__(self):
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="csv-importer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # The running import stops after its current chunk and resumes on the next start
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, db: Session, upload: BinaryIO, filename: str) -> models.ImportJob:
+        """Save an uploaded CSV file and queue its import. Raises ValueError for an unusable header."""
+        os.makedirs(settings.import_directory, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        path = job_path(job_id)
+
+        try:
+            with open(path, "wb") as file:
+                shutil.copyfileobj(upload, file, _COPY_BUFFER_SIZE)
+            with open(path, "rb") as file:
+                columns, header_bytes = read_header(file)
+        except Exception:
+            os.remove(path)
+            raise
+
+        job = crud.ImportJobCRUD.create_job(
+            db=db,
+            job_id=job_id,
+            filename=filename,
+            columns=columns,
+            header_bytes=header_bytes,
+            total_bytes=os.path.getsize(path)
+        )
+        self._wake.set()
+        return job
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            db = SessionLocal()
+            job = None
+            try:
+                job = crud.ImportJobCRUD.get_next_job(db)
+                if job:
+                    self._import(db, job)
+            except Exception:
+                logger.exception("CSV import failed")
+                db.rollback()
+                if job:
+                    self._fail(db, job, "Import failed unexpectedly, see the server log")
+            finally:
+                db.close()
+
+            if not job:
+                self._wake.wait(timeout=1.0)
+                self._wake.clear()
+
+    def _import(self, db: Session, job: models.ImportJob) -> None:
+        crud.ImportJobCRUD.start_job(db, job)
+        columns = json.loads(job.columns)
+        error = None
+
+        with open(job_path(job.id), "rb") as file:
+            reader = _RecordReader(file, job.bytes_processed)
+            records = iter(reader)
+            while not self._stop.is_set():
+                started = time.monotonic()
+                first_row = job.rows_processed + 1
+                try:
+                    chunk = list(itertools.islice(records, settings.import_chunk_size))
+                except (csv.Error, UnicodeDecodeError) as e:
+                    error = f"Unreadable CSV after row {job.rows_processed}: {e}"
+                    break
+                if not chunk:
+                    break
+
+                rows, row_numbers, row_errors = [], [], []
+                for row, record in enumerate(chunk, start=first_row):
+                    if len(record) != len(columns):
+                        row_errors.append((row, f"Expected {len(columns)} fields, found {len(record)}"))
+                        continue
+                    rows.append(_registration(columns, record))
+                    row_numbers.append(row)
+
+                registrations = []
+                validated, errors = validate_batch(schemas.CustomerRegistration, rows)
+                for index, (row, registration) in enumerate(zip(row_numbers, validated)):
+                    if registration is None:
+                        row_errors.append((row, _format_errors(errors[index])))
+                    else:
+                        registrations.append((row, registration))
+
+                crud.ImportJobCRUD.import_chunk(
+                    db=db,
+                    job=job,
+                    registrations=registrations,
+                    row_errors=row_errors,
+                    rows=len(chunk),
+                    bytes_processed=reader.offset,
+                    seconds=time.monotonic() - started
+                )
+
+        if error:
+            self._fail(db, job, error)
+        elif not self._stop.is_set():
+            crud.ImportJobCRUD.finish_job(db, job)
+            os.remove(job_path(job.id))
+
+    def _fail(self, db: Session, job: models.ImportJob, error: str) -> None:
+        crud.ImportJobCRUD.finish_job(db, job, error=error)
+        if os.path.exists(job_path(job.id)):
+            os.remove(job_path(job.id))
+
+
+import_runner = ImportRunner()
@@ -1,13 +1,26 @@
-from fastapi import FastAPI, HTTPException
+import time
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from app.admission import AdmissionControlMiddleware
 from app.api.api import api_router
+from app.compression import CompressionMiddleware
 from app.config import settings
-from app.database import engine
+from app.content_negotiation import error_response
+from app.database import LAST_WRITE_COOKIE, ReplicaSessionLocals, SessionLocal, engine, shard_engines
+from app.deadlines import DeadlineExceeded, DeadlineMiddleware
+from app.health import check_health
+from app.migrations import run_migrations
+from app.imports import import_runner
+from app.registration_queue import registration_queue
+from app.email_filter import email_filter
+from app.suggest import suggestion_index
 from app import models
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+# Create database tables and apply migrations to existing ones
+for database_engine in [engine, *shard_engines.values()]:
+    models.Base.metadata.create_all(bind=database_engine)
+    run_migrations(database_engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -29,23 +42,44 @@ app = FastAPI(
     
     #### Customers (`/api/v1/customers`)
     - `POST /` - Create a new customer
-    - `GET /` - List customers with pagination and filtering
+    - `GET /` - List customers with pagination and filtering (`include=employment` embeds their employment)
     - `GET /{customer_id}` - Get customer by ID with employment info
     - `PUT /{customer_id}` - Update customer information
     - `DELETE /{customer_id}` - Soft delete customer
     - `DELETE /{customer_id}/hard` - Permanently delete customer
     - `GET /email/{email}` - Get customer by email
+    - `GET /stats/geo` - Customer counts by country, state or city
+    - `GET /phone/{phone}` - Get customer by phone number (formatting ignored)
+    - `GET /{customer_id}/employments` - Employment history of a customer, newest first
+    - `GET /{customer_id}/possible-duplicates` - Find customers that may be the same person
     
     #### Employments (`/api/v1/employments`)
     - `POST /` - Create employment for a customer
     - `GET /` - List employments with pagination and filtering
+    - `GET /stats/geo` - Employment counts by work country, state or city
+    - `GET /suggest?field=company_name&prefix=...` - Typeahead suggestions for company names or job titles
     - `GET /{employment_id}` - Get employment by ID with customer info
-    - `GET /customer/{customer_id}` - Get employment by customer ID
+    - `GET /customer/{customer_id}` - Get the current employment of a customer
     - `PUT /{employment_id}` - Update employment information
     - `DELETE /{employment_id}` - Delete employment
     
     #### Registration (`/api/v1/registration`)
     - `POST /` - Register customer with employment in single request
+    - `POST /async` - Queue a registration for background processing (202 with ticket)
+    - `GET /tickets/{ticket_id}` - Get the status of a queued registration
+    
+    #### Imports (`/api/v1/imports`)
+    - `POST /` - Upload a CSV file of registrations for background import (202 with job)
+    - `GET /{job_id}` - Get the progress, throughput and row errors of an import
+    
+    #### Changes (`/api/v1/changes`)
+    - `GET /?since=<seq>` - Customer and employment changes after a sequence number (supports long polling)
+    
+    #### Admin (`/api/v1/admin`, requires the `X-Admin-Token` header)
+    - `POST /snapshots/` - Snapshot the live databases to the server's snapshot directory
+    - `GET /snapshots/download?database=primary` - Snapshot a live database and download it
+    - `POST /analytics/exports?format=arrow` - Export customers and employments as Arrow IPC or Parquet files
+    - `GET /analytics/exports/{table}?format=arrow` - Download the latest export of `customers` or `employments`
     
     ### Data Models:
     
@@ -87,7 +121,10 @@ app = FastAPI(
     The API returns appropriate HTTP status codes and detailed error messages:
     - `400 Bad Request`: Validation errors or business rule violations
     - `404 Not Found`: Resource not found
+    - `429 Too Many Requests`: Client request rate limit exceeded (when enabled), see `Retry-After`
     - `500 Internal Server Error`: Unexpected server errors
+    - `503 Service Unavailable`: Server at capacity, retry after the `Retry-After` seconds
+    - `504 Gateway Timeout`: A read ran past its deadline and its query was stopped
     
     ### Authentication:
     Currently, this API does not require authentication. In production, implement proper authentication and authorization.
@@ -98,6 +135,12 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
+# Add request deadlines, starting once a request is admitted
+app.add_middleware(DeadlineMiddleware)
+
+# Add admission control, inside CORS so rejections still carry CORS headers
+app.add_middleware(AdmissionControlMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -107,18 +150,94 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Add response compression middleware
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_minimum_size,
+    level=settings.compression_level,
+    route_levels=settings.compression_route_levels,
+    cache_bytes=settings.compression_cache_bytes,
+    cache_routes=settings.compression_cache_routes,
+)
+
+# Route a client's reads to the primary for a short window after its own writes
+@app.middleware("http")
+async def mark_recent_writes(request: Request, call_next):
+    response = await call_next(request)
+    if (
+        ReplicaSessionLocals
+        and settings.read_your_writes_seconds > 0
+        and request.method in ("POST", "PUT", "PATCH", "DELETE")
+        and response.status_code < 400
+    ):
+        response.set_cookie(
+            LAST_WRITE_COOKIE,
+            str(time.time()),
+            max_age=settings.read_your_writes_seconds,
+            httponly=True
+        )
+    return response
+
 # Include API router
 app.include_router(api_router, prefix=settings.api_v1_str)
 
+# Load the typeahead index, later writes keep it up to date
+@app.on_event("startup")
+def build_suggestion_index():
+    suggestion_index.rebuild(SessionLocal)
+
+# Load the email pre-check filter, later writes add their emails to it
+@app.on_event("startup")
+def build_email_filter():
+    if settings.email_filter_enabled:
+        email_filter.rebuild(SessionLocal)
+
+# Start and stop the background registration writer
+@app.on_event("startup")
+def start_registration_queue():
+    if settings.registration_queue_enabled:
+        registration_queue.start()
+
+
+@app.on_event("shutdown")
+def stop_registration_queue():
+    registration_queue.stop()
+
+# Start and stop the CSV importer, which resumes interrupted imports on start
+@app.on_event("startup")
+def start_import_runner():
+    import_runner.start()
+
+
+@app.on_event("shutdown")
+def stop_import_runner():
+    import_runner.stop()
+
 # Global exception handler
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
-    return JSONResponse(
+    return error_response(
+        request.headers.get("accept", ""),
         status_code=exc.status_code,
         content={
             "detail": exc.detail,
             "status_code": exc.status_code,
             "success": False
+        },
+        headers=getattr(exc, "headers", None)
+    )
+
+# Reads stopped at their deadline
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request, exc):
+    return error_response(
+        request.headers.get("accept", ""),
+        status_code=504,
+        content={
+            "detail": str(exc),
+            "status_code": 504,
+            "success": False,
+            "elapsed_ms": round(exc.elapsed * 1000)
         }
     )
 
@@ -141,12 +260,17 @@ async def root():
 async def health_check():
     """
     Health check endpoint to verify API status.
+    
+    Checks that every database answers a query and reports admission
+    control and connection pool load, and the size and false-positive
+    rate of the email pre-check filter. Returns 503 if a database is
+    unreachable; the status is "degraded" while the API is at capacity.
     """
-    return {
-        "status": "healthy",
-        "message": "Customer Registration System API is running",
-        "success": True
-    }
+    reachable, report = await check_health()
+    return JSONResponse(
+        status_code=200 if reachable else 503,
+        content=report
+    )
 
 if __name__ == "__main__":
     import uvicorn
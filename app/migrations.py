@@ -0,0 +1,143 @@
+from contextlib import nullcontext
+from datetime import datetime
+from sqlalchemy import Column, DateTime, MetaData, String, Table, insert, inspect, select, text
+from sqlalchemy.engine import Connection, Engine
+from app.dedup import blocking_keys, normalize_phone
+
+# Bring databases created by older versions up to date with the current models.
+# `Base.metadata.create_all` creates missing tables but never alters existing
+# ones, so column backfills and new indexes on existing tables live here.
+# Each migration runs once and is recorded in the schema_migrations table.
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", String(100), primary_key=True),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+def _backfill_updated_at(connection: Connection) -> None:
+    # updated_at used to be NULL until the first update
+    for table in ("customers", "employments"):
+        connection.execute(text(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL"))
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_updated_at ON {table} (updated_at)"))
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_created_at ON {table} (created_at)"))
+
+
+def _add_phone_normalized(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("customers")}
+    if "phone_normalized" not in columns:
+        connection.execute(text("ALTER TABLE customers ADD COLUMN phone_normalized VARCHAR(20)"))
+    
+    # Normalize in Python, SQL has no portable way to strip non-digits
+    rows = connection.execute(text("SELECT id, phone FROM customers WHERE phone_normalized IS NULL")).all()
+    if rows:
+        connection.execute(
+            text("UPDATE customers SET phone_normalized = :phone_normalized WHERE id = :id"),
+            [{"id": id, "phone_normalized": normalize_phone(phone)} for id, phone in rows]
+        )
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_customers_phone_normalized ON customers (phone_normalized)"))
+
+
+def _add_geo_indexes_and_rollups(connection: Connection) -> None:
+    for table, column in (
+        ("customers", "country"), ("customers", "state"), ("customers", "city"),
+        ("employments", "work_country"), ("employments", "work_city"),
+    ):
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})"))
+    
+    # Later changes keep the rollups up to date (app/geo.py)
+    connection.execute(text("DELETE FROM geo_rollups"))
+    connection.execute(text(
+        "INSERT INTO geo_rollups (entity, country, state, city, count, active_count) "
+        "SELECT 'customer', COALESCE(country, ''), COALESCE(state, ''), COALESCE(city, ''), COUNT(*), "
+        "SUM(CASE WHEN is_active = false THEN 0 ELSE 1 END) "
+        "FROM customers GROUP BY COALESCE(country, ''), COALESCE(state, ''), COALESCE(city, '')"
+    ))
+    connection.execute(text(
+        "INSERT INTO geo_rollups (entity, country, state, city, count, active_count) "
+        "SELECT 'employment', COALESCE(work_country, ''), COALESCE(work_state, ''), COALESCE(work_city, ''), COUNT(*), "
+        "SUM(CASE WHEN is_current_employment = false THEN 0 ELSE 1 END) "
+        "FROM employments GROUP BY COALESCE(work_country, ''), COALESCE(work_state, ''), COALESCE(work_city, '')"
+    ))
+
+
+def _add_employment_history_indexes(connection: Connection) -> None:
+    # Customers had at most one employment so far, the unique current index always applies
+    from app import models
+    
+    for index in models.Employment.__table__.indexes:
+        if index.name in ("ix_employments_current", "ix_employments_history"):
+            index.create(bind=connection, checkfirst=True)
+
+
+def _build_customer_read_model(connection: Connection) -> None:
+    # Existing customers get their read model rows, later writes keep them current
+    from app import read_model
+    
+    read_model.rebuild(connection)
+
+
+def _seed_change_log_lock(connection: Connection) -> None:
+    # The row change log writers lock, see ChangeLogCRUD.record
+    if connection.execute(text("SELECT COUNT(*) FROM change_log_lock")).scalar() == 0:
+        connection.execute(text("INSERT INTO change_log_lock (id) VALUES (1)"))
+
+
+def _backfill_blocking_keys(connection: Connection) -> None:
+    # Customers created before duplicate detection have no blocking keys. The
+    # keys live in the primary database, also when the customers are sharded;
+    # a shard's keys are committed there batch by batch, and a rerun after an
+    # interruption skips the customers that already have theirs.
+    from app import models
+    from app.database import engine
+    
+    customers = models.Customer.__table__
+    keys = models.CustomerBlockingKey.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(
+                customers.c.id, customers.c.first_name, customers.c.last_name,
+                customers.c.phone, customers.c.date_of_birth, customers.c.postal_code
+            ).where(customers.c.id > last_id).order_by(customers.c.id).limit(1000)
+        ).all()
+        if not rows:
+            return
+        last_id = rows[-1].id
+        
+        with nullcontext(connection) if connection.engine is engine else engine.begin() as directory:
+            keyed = set(directory.execute(
+                select(keys.c.customer_id).where(keys.c.customer_id.in_([row.id for row in rows]))
+            ).scalars())
+            values = [
+                {"customer_id": row.id, "key_type": key_type, "key_value": key_value}
+                for row in rows if row.id not in keyed
+                for key_type, key_value in blocking_keys(row)
+            ]
+            if values:
+                directory.execute(insert(keys), values)
+
+
+MIGRATIONS = [
+    ("0001_backfill_updated_at", _backfill_updated_at),
+    ("0002_add_phone_normalized", _add_phone_normalized),
+    ("0003_add_geo_indexes_and_rollups", _add_geo_indexes_and_rollups),
+    ("0004_add_employment_history_indexes", _add_employment_history_indexes),
+    ("0005_build_customer_read_model", _build_customer_read_model),
+    ("0006_seed_change_log_lock", _seed_change_log_lock),
+    ("0007_backfill_blocking_keys", _backfill_blocking_keys),
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    schema_migrations.create(bind=engine, checkfirst=True)
+    
+    with engine.begin() as connection:
+        applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+        for version, migration in MIGRATIONS:
+            if version in applied:
+                continue
+            migration(connection)
+            connection.execute(schema_migrations.insert().values(version=version, applied_at=datetime.utcnow()))
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, Text, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import BigInteger, Column, Integer, String, Date, Boolean, Text, ForeignKey, DateTime, Float, Index, Table, UniqueConstraint
+from sqlalchemy.orm import relationship, validates
+from sqlalchemy.sql import func, text
 from app.database import Base
+from app.dedup import normalize_phone
 
 
 class Customer(Base):
@@ -12,22 +13,51 @@ class Customer(Base):
     last_name = Column(String(50), nullable=False, index=True)
     email = Column(String(100), unique=True, nullable=False, index=True)
     phone = Column(String(20), nullable=False)
+    phone_normalized = Column(String(20), index=True)  # Digits only, kept in sync with phone
     date_of_birth = Column(Date, nullable=False)
     address = Column(Text, nullable=False)
-    city = Column(String(50), nullable=False)
-    state = Column(String(50), nullable=False)
+    city = Column(String(50), nullable=False, index=True)
+    state = Column(String(50), nullable=False, index=True)
     postal_code = Column(String(10), nullable=False)
-    country = Column(String(50), nullable=False)
+    country = Column(String(50), nullable=False, index=True)
     is_active = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), server_default=func.now(), onupdate=func.now(), index=True)
     
-    # Relationship with employment
-    employment = relationship("Employment", back_populates="customer", uselist=False)
+    # Employment history, newest first, and the current employment
+    employments = relationship(
+        "Employment",
+        back_populates="customer",
+        cascade="all, delete-orphan",
+        order_by="(Employment.start_date.desc(), Employment.id.desc())"
+    )
+    employment = relationship(
+        "Employment",
+        primaryjoin="and_(Customer.id == Employment.customer_id, Employment.is_current_employment == True)",
+        uselist=False,
+        viewonly=True
+    )
+    
+    @validates("phone")
+    def _normalize_phone(self, key, phone):
+        self.phone_normalized = normalize_phone(phone) if phone else None
+        return phone
 
 
 class Employment(Base):
     __tablename__ = "employments"
+    __table_args__ = (
+        # At most one current employment per customer, found with a single index lookup
+        Index(
+            "ix_employments_current",
+            "customer_id",
+            unique=True,
+            sqlite_where=text("is_current_employment = 1"),
+            postgresql_where=text("is_current_employment")
+        ),
+        # Employment history of a customer in display order
+        Index("ix_employments_history", "customer_id", "start_date", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
@@ -39,13 +69,152 @@ class Employment(Base):
     end_date = Column(Date, nullable=True)  # Null if currently employed
     salary = Column(String(50))
     work_address = Column(Text)
-    work_city = Column(String(50))
+    work_city = Column(String(50), index=True)
     work_state = Column(String(50))
     work_postal_code = Column(String(10))
-    work_country = Column(String(50))
+    work_country = Column(String(50), index=True)
     is_current_employment = Column(Boolean, default=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=func.now(), server_default=func.now(), onupdate=func.now(), index=True)
     
     # Relationship with customer
-    customer = relationship("Customer", back_populates="employment") 
\ No newline at end of file
+    customer = relationship("Customer", back_populates="employments")
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    key = Column(String(255), primary_key=True)
+    method = Column(String(10), nullable=False)
+    path = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)  # SHA-256 of the request body
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    
+    seq = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)  # customer, employment
+    entity_id = Column(Integer, nullable=False)
+    customer_id = Column(Integer, nullable=False, index=True)
+    operation = Column(String(20), nullable=False)  # create, update, delete, hard_delete, archive
+    data = Column(Text)  # JSON snapshot of the row after the change, null for hard deletes
+    created_at = Column(DateTime, nullable=False)
+
+
+class ChangeLogLock(Base):
+    # Single row locked by every transaction that appends to the change log,
+    # so change sequence numbers become visible in order (ChangeLogCRUD.record)
+    __tablename__ = "change_log_lock"
+    
+    id = Column(Integer, primary_key=True)
+
+
+class CustomerDirectory(Base):
+    # Email -> customer id index used to route lookups when customers are sharded
+    __tablename__ = "customer_directory"
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    customer_id = Column(Integer, primary_key=True, autoincrement=True)
+    email = Column(String(100), unique=True, nullable=False, index=True)
+
+
+class EmploymentIdAllocation(Base):
+    # Sequence for globally unique employment ids when customers are sharded
+    __tablename__ = "employment_id_allocations"
+    __table_args__ = {"sqlite_autoincrement": True}
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+
+
+class CustomerBlockingKey(Base):
+    # Duplicate-detection keys, customers sharing a key are possible duplicates (see app/dedup.py)
+    __tablename__ = "customer_blocking_keys"
+    __table_args__ = (Index("ix_customer_blocking_keys_key", "key_type", "key_value"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, nullable=False, index=True)
+    key_type = Column(String(20), nullable=False)  # phone, name_dob, postal_name
+    key_value = Column(String(100), nullable=False)
+
+
+class GeoRollup(Base):
+    # Precomputed counts per location, maintained on write (see app/geo.py)
+    __tablename__ = "geo_rollups"
+    __table_args__ = (UniqueConstraint("entity", "country", "state", "city", name="uq_geo_rollups_location"),)
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    entity = Column(String(20), nullable=False)  # customer, employment (work location)
+    country = Column(String(50), nullable=False, default="")  # Empty when not provided
+    state = Column(String(50), nullable=False, default="")
+    city = Column(String(50), nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    active_count = Column(Integer, nullable=False, default=0)  # Active customers / current employments
+
+
+class CustomerReadModel(Base):
+    # Pre-serialized customers served by the read endpoints (see app/read_model.py)
+    __tablename__ = "customer_read_model"
+    
+    id = Column(Integer, primary_key=True)  # The customer's id
+    # Copies of the customer columns the list endpoint filters and sorts on
+    email = Column(String(100), nullable=False, index=True)
+    first_name = Column(String(50), nullable=False)
+    last_name = Column(String(50), nullable=False)
+    city = Column(String(50), nullable=False, index=True)
+    state = Column(String(50), nullable=False, index=True)
+    country = Column(String(50), nullable=False, index=True)
+    is_active = Column(Boolean)
+    created_at = Column(DateTime(timezone=True), index=True)
+    updated_at = Column(DateTime(timezone=True), index=True)
+    data = Column(Text, nullable=False)  # CustomerResponse JSON
+    employment = Column(Text)  # EmploymentResponse JSON of the current (else latest) employment
+
+
+class ImportJob(Base):
+    # CSV registration imports and the checkpoint an interrupted import resumes from (see app/imports.py)
+    __tablename__ = "import_jobs"
+    
+    id = Column(String(32), primary_key=True)
+    filename = Column(String(255), nullable=False)
+    status = Column(String(20), nullable=False, index=True)  # pending, running, completed, failed
+    columns = Column(Text, nullable=False)  # JSON list of the CSV header
+    total_bytes = Column(BigInteger, nullable=False)
+    bytes_processed = Column(BigInteger, nullable=False)  # Offset of the first row not yet imported
+    rows_processed = Column(Integer, nullable=False, default=0)
+    rows_imported = Column(Integer, nullable=False, default=0)
+    rows_failed = Column(Integer, nullable=False, default=0)
+    processing_seconds = Column(Float, nullable=False, default=0)
+    errors = Column(Text)  # JSON list of the first row errors
+    error = Column(Text)  # Why a failed import stopped
+    created_at = Column(DateTime, nullable=False, index=True)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    completed_at = Column(DateTime)
+
+
+def _archive_table(source: Table, name: str, indexed: tuple) -> Table:
+    # Same columns as `source` without constraints or defaults, plus when the row was archived.
+    # Rows keep their original id, the surrogate key only makes every archived row unique.
+    return Table(
+        name,
+        Base.metadata,
+        Column("archive_id", Integer, primary_key=True, autoincrement=True),
+        *(
+            Column(column.name, column.type, nullable=column.nullable, index=column.name in indexed)
+            for column in source.columns
+        ),
+        Column("archived_at", DateTime, nullable=False, index=True),
+    )
+
+
+class ArchivedCustomer(Base):
+    # Inactive customers moved out of the customers table (see ArchiveCRUD)
+    __table__ = _archive_table(Customer.__table__, "customers_archive", ("id", "email", "updated_at"))
+
+
+class ArchivedEmployment(Base):
+    __table__ = _archive_table(Employment.__table__, "employments_archive", ("id", "customer_id"))
@@ -0,0 +1,142 @@
+import argparse
+from typing import Dict, Iterable, List, Mapping, Optional, Set
+from sqlalchemy import delete, event, insert, inspect, select
+from sqlalchemy.orm import Session
+from app import models, schemas, sharding
+
+# Customer read model (CQRS projection).
+#
+# customer_read_model keeps every customer pre-serialized: `data` holds the
+# CustomerResponse JSON and `employment` the EmploymentResponse JSON of the
+# employment shown with it (the current one, else the latest), next to
+# copies of the columns the customer list filters and sorts on. Detail
+# responses are `data` with the employment spliced in and list responses
+# join the `data` strings, so reads neither build ORM objects nor run
+# pydantic. Only JSON clients are served from it; MessagePack and CBOR
+# responses are encoded from the base tables instead of re-parsing the JSON.
+#
+# Rows are recomputed from the base tables after every flush that touches a
+# customer or one of its employments, on the same connection, so the read
+# model commits and rolls back with the write. Archiving removes rows
+# explicitly (it bypasses the ORM). With sharding each row lives on its
+# customer's shard.
+
+FILTER_COLUMNS = ("email", "first_name", "last_name", "city", "state", "country", "is_active", "created_at", "updated_at")
+
+_customers = models.Customer.__table__
+_employments = models.Employment.__table__
+_read_model = models.CustomerReadModel.__table__
+
+
+def detail_json(data: str, employment: Optional[str]) -> str:
+    """CustomerWithEmploymentResponse JSON from a read model row's two fragments."""
+    return f'{data[:-1]},"employment":{employment or "null"}}}'
+
+
+def list_json(customers: List[str], total: int, page: int, size: int) -> str:
+    """CustomerListResponse JSON from the `data` fragments of a page."""
+    return f'{{"customers":[{",".join(customers)}],"total":{total},"page":{page},"size":{size}}}'
+
+
+def _row(customer: Mapping, employment: Optional[Mapping]) -> dict:
+    return {
+        "id": customer["id"],
+        **{column: customer[column] for column in FILTER_COLUMNS},
+        "data": schemas.CustomerResponse(**customer).json(),
+        "employment": schemas.EmploymentResponse(**employment).json() if employment else None,
+    }
+
+
+def refresh(connection, customer_ids: Iterable[int]) -> None:
+    """Recompute the read model rows of `customer_ids` from the base tables on `connection`."""
+    customer_ids = list(customer_ids)
+    if not customer_ids:
+        return
+
+    customers = connection.execute(select(_customers).where(_customers.c.id.in_(customer_ids))).mappings().all()
+
+    # Current employment first, then the most recent, as ReadCRUD.get_employment_by_customer
+    shown: Dict[int, Mapping] = {}
+    for employment in connection.execute(
+        select(_employments).where(_employments.c.customer_id.in_(customer_ids)).order_by(
+            _employments.c.customer_id,
+            _employments.c.is_current_employment.desc(),
+            _employments.c.start_date.desc(),
+            _employments.c.id.desc()
+        )
+    ).mappings():
+        shown.setdefault(employment["customer_id"], employment)
+
+    remove(connection, customer_ids)
+    if customers:
+        connection.execute(
+            insert(_read_model),
+            [_row(customer, shown.get(customer["id"])) for customer in customers]
+        )
+
+
+def remove(connection, customer_ids: Iterable[int]) -> None:
+    connection.execute(delete(_read_model).where(_read_model.c.id.in_(list(customer_ids))))
+
+
+def rebuild(connection, batch_size: int = 1000) -> int:
+    """Regenerate the whole read model on `connection`, returning the number of customers."""
+    connection.execute(delete(_read_model))
+    count = 0
+    last_id = 0
+    while True:
+        customer_ids = list(connection.execute(
+            select(_customers.c.id).where(_customers.c.id > last_id).order_by(_customers.c.id).limit(batch_size)
+        ).scalars())
+        if not customer_ids:
+            return count
+        refresh(connection, customer_ids)
+        count += len(customer_ids)
+        last_id = customer_ids[-1]
+
+
+@event.listens_for(Session, "after_flush")
+def _refresh_read_model(session, flush_context):
+    router = sharding.get_router(session)
+    ids_by_shard: Dict[Optional[str], Set[int]] = {}
+
+    def touch(customer_id: Optional[int]) -> None:
+        if customer_id is not None:
+            ids_by_shard.setdefault(router.shard_for_id(customer_id) if router else None, set()).add(customer_id)
+
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(instance, models.Customer):
+            touch(instance.id)
+        elif isinstance(instance, models.Employment):
+            touch(instance.customer_id)
+            # An employment moved to another customer also leaves its old one
+            for customer_id in inspect(instance).attrs.customer_id.history.deleted:
+                touch(customer_id)
+
+    for shard_id, customer_ids in ids_by_shard.items():
+        refresh(sharding.connection_for_shard(session, shard_id), sorted(customer_ids))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Regenerate the customer read model from the customer and employment tables."
+    )
+    parser.add_argument("--batch-size", type=int, default=1000, help="Customers recomputed per statement")
+    args = parser.parse_args()
+
+    from app import crud
+    from app.database import SessionLocal, engine, shard_engines
+
+    for database_engine in [engine, *shard_engines.values()]:
+        models.Base.metadata.create_all(bind=database_engine)
+
+    db = SessionLocal()
+    try:
+        count = crud.CustomerReadModelCRUD.rebuild(db, batch_size=args.batch_size)
+        print(f"Rebuilt the read model of {count} customers")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+from app import crud, schemas
+from app.config import settings
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class RegistrationQueue:
+    """
+    In-process queue for accept-then-persist registrations.
+
+    Requests are validated and enqueued by the API, and a single writer thread
+    drains the queue in batches, committing each batch in one transaction.
+    """
+
+    def __init__(self):
+        self._queue: queue.Queue = queue.Queue(maxsize=settings.registration_queue_max_size)
+        self._tickets: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="registration-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        # The writer drains what is already queued before exiting
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, registration: schemas.CustomerRegistration) -> Optional[dict]:
+        """Enqueue a registration, returning its ticket or None if the queue is full."""
+        ticket = {
+            "ticket_id": uuid.uuid4().hex,
+            "status": schemas.RegistrationTicketStatus.PENDING,
+            "customer_id": None,
+            "error": None,
+            # time.time() values, shown as UTC datetimes by _public()
+            "submitted_at": time.time(),
+            "completed_at": None,
+        }
+
+        with self._lock:
+            self._prune_tickets()
+            self._tickets[ticket["ticket_id"]] = ticket
+
+        try:
+            self._queue.put_nowait((ticket["ticket_id"], registration))
+        except queue.Full:
+            with self._lock:
+                self._tickets.pop(ticket["ticket_id"], None)
+            return None
+
+        return _public(ticket)
+
+    def get_ticket(self, ticket_id: str) -> Optional[dict]:
+        with self._lock:
+            ticket = self._tickets.get(ticket_id)
+            return _public(ticket) if ticket else None
+
+    def _prune_tickets(self) -> None:
+        # Tickets are kept in submission order and the writer completes them in
+        # that order, so expired ones are at the front. The TTL runs from
+        # completion, a ticket that waited in the queue stays as long as any.
+        cutoff = time.time() - settings.registration_ticket_ttl_seconds
+        while self._tickets:
+            ticket = next(iter(self._tickets.values()))
+            if ticket["completed_at"] is None or ticket["completed_at"] > cutoff:
+                break
+            self._tickets.popitem(last=False)
+
+    def _run(self) -> None:
+        flush_interval = settings.registration_queue_flush_interval_ms / 1000
+
+        while not (self._stop.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+
+            # Group everything that arrives within the flush interval into one commit
+            deadline = time.monotonic() + flush_interval
+            while len(batch) < settings.registration_queue_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch: list) -> None:
+        db = SessionLocal()
+        try:
+            results = crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(
+                db=db,
+                registrations=[registration for _, registration in batch]
+            )
+        except Exception as e:
+            logger.exception("Registration batch failed")
+            db.rollback()
+            results = [(None, f"Registration failed: {str(e)}")] * len(batch)
+        finally:
+            db.close()
+
+        completed_at = time.time()
+        with self._lock:
+            for (ticket_id, _), (customer_id, error) in zip(batch, results):
+                ticket = self._tickets.get(ticket_id)
+                if not ticket:
+                    continue
+                ticket["customer_id"] = customer_id
+                ticket["error"] = error
+                ticket["status"] = (
+                    schemas.RegistrationTicketStatus.FAILED if error
+                    else schemas.RegistrationTicketStatus.COMPLETED
+                )
+                ticket["completed_at"] = completed_at
+
+
+def _public(ticket: dict) -> dict:
+    public = dict(ticket)
+    for name in ("submitted_at", "completed_at"):
+        if public[name] is not None:
+            public[name] = datetime.utcfromtimestamp(public[name])
+    return public
+
+
+registration_queue = RegistrationQueue()
@@ -122,6 +122,7 @@ class CustomerResponse(CustomerBase):
     is_active: bool
     created_at: datetime
     updated_at: Optional[datetime] = None
+    archived_at: Optional[datetime] = None  # Set only for archived customers
     
     class Config:
         from_attributes = True
@@ -153,6 +154,17 @@ class CustomerListResponse(BaseModel):
     size: int
 
 
+class CustomerWithEmploymentListResponse(BaseModel):
+    customers: list[CustomerWithEmploymentResponse]
+    total: int
+    page: int
+    size: int
+
+
+class CustomerInclude(str, Enum):
+    EMPLOYMENT = "employment"
+
+
 class EmploymentListResponse(BaseModel):
     employments: list[EmploymentWithCustomerResponse]
     total: int
@@ -160,6 +172,172 @@ class EmploymentListResponse(BaseModel):
     size: int
 
 
+class EmploymentHistoryResponse(BaseModel):
+    customer_id: int
+    employments: list[EmploymentResponse]
+    total: int
+    page: int
+    size: int
+
+
+class SuggestField(str, Enum):
+    COMPANY_NAME = "company_name"
+    JOB_TITLE = "job_title"
+
+
+class SuggestionResponse(BaseModel):
+    value: str
+    count: int
+
+
+class SuggestionListResponse(BaseModel):
+    field: SuggestField
+    prefix: str
+    suggestions: list[SuggestionResponse]
+
+
+# Asynchronous registration schemas
+class RegistrationTicketStatus(str, Enum):
+    PENDING = "pending"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class RegistrationTicketResponse(BaseModel):
+    ticket_id: str
+    status: RegistrationTicketStatus
+    customer_id: Optional[int] = None
+    error: Optional[str] = None
+    submitted_at: datetime
+    completed_at: Optional[datetime] = None
+
+
+# CSV import schemas
+class ImportJobStatus(str, Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ImportRowError(BaseModel):
+    row: int  # Data row number, the header not counted
+    error: str
+
+
+class ImportJobResponse(BaseModel):
+    job_id: str
+    filename: str
+    status: ImportJobStatus
+    total_bytes: int
+    bytes_processed: int
+    progress: float
+    rows_processed: int
+    rows_imported: int
+    rows_failed: int
+    rows_per_second: Optional[float] = None
+    errors: list[ImportRowError]
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+
+# Change log schemas
+class ChangeResponse(BaseModel):
+    seq: int
+    entity: str
+    entity_id: int
+    customer_id: int
+    operation: str
+    data: Optional[dict] = None
+    created_at: datetime
+
+
+class ChangeListResponse(BaseModel):
+    changes: list[ChangeResponse]
+    next_since: int
+    has_more: bool
+
+
+# Duplicate detection schemas
+class PossibleDuplicateResponse(BaseModel):
+    customer: CustomerResponse
+    matched_keys: list[str]
+    score: float
+
+
+class PossibleDuplicateListResponse(BaseModel):
+    customer_id: int
+    duplicates: list[PossibleDuplicateResponse]
+    total: int
+
+
+# Geographic statistics schemas
+class GeoLevel(str, Enum):
+    COUNTRY = "country"
+    STATE = "state"
+    CITY = "city"
+
+
+class GeoGroupResponse(BaseModel):
+    country: Optional[str] = None
+    state: Optional[str] = None
+    city: Optional[str] = None
+    count: int
+    active_count: int
+
+
+class GeoStatsResponse(BaseModel):
+    level: GeoLevel
+    groups: list[GeoGroupResponse]
+    total: int
+
+
+# Snapshot schemas
+class SnapshotResponse(BaseModel):
+    database: str  # "primary" or "shard_<id>"
+    path: str
+    bytes: int
+    pages: int
+    steps: int  # Backup steps, each copying up to SNAPSHOT_PAGES_PER_STEP pages
+    restarts: int  # Times a concurrent write made the copy start over
+    single_step: bool  # Finished in one step after too many restarts
+    duration_seconds: float
+    throughput_mb_per_second: Optional[float] = None
+    created_at: datetime
+
+
+class SnapshotListResponse(BaseModel):
+    snapshots: list[SnapshotResponse]
+
+
+# Analytics export schemas
+class AnalyticsExportFormat(str, Enum):
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+
+class AnalyticsTable(str, Enum):
+    CUSTOMERS = "customers"
+    EMPLOYMENTS = "employments"
+
+
+class AnalyticsExportResponse(BaseModel):
+    table: AnalyticsTable
+    format: AnalyticsExportFormat
+    path: str
+    rows: int
+    bytes: int
+    duration_seconds: float
+    created_at: datetime
+
+
+class AnalyticsExportListResponse(BaseModel):
+    exports: list[AnalyticsExportResponse]
+
+
 # Message responses
 class MessageResponse(BaseModel):
     message: str
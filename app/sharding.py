@@ -0,0 +1,304 @@
+import argparse
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional
+from sqlalchemy import delete, event, insert, inspect, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.horizontal_shard import ShardedSession
+from sqlalchemy.orm import Query, Session, sessionmaker
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, BooleanClauseList
+
+# Customers and employments are spread over the shard databases, every row
+# living on shard `id % N`. Employments are co-located with their customer by
+# giving them ids congruent to the customer id, and archived rows and read
+# model rows stay on their customer's shard. Everything else (the customer
+# directory, change log, idempotency keys) stays in the primary database,
+# which acts as the directory shard.
+#
+# The customer directory maps emails to customer ids, allocates customer ids
+# and enforces global email uniqueness. It is written through the session's
+# directory connection, so it rolls back with the session, but the session
+# commits the directory and the shards one after another. Unless two-phase
+# commit is enabled (SHARD_TWO_PHASE_COMMIT, on databases that support it), a
+# shard commit failing after the directory's leaves a directory entry without
+# a customer, its email taken; repair_directory() removes such entries.
+
+DIRECTORY = "directory"
+CUSTOMER_TABLES = ("customers", "customers_archive", "customer_read_model")
+EMPLOYMENT_TABLES = ("employments", "employments_archive")
+SHARDED_TABLES = CUSTOMER_TABLES + EMPLOYMENT_TABLES
+# Tables every shard keeps its own copy of, describing that shard's rows
+SHARD_LOCAL_TABLES = ("geo_rollups",)
+
+
+class ShardRouter:
+    def __init__(self, shard_engines: Dict[str, Engine]):
+        self.shard_ids = list(shard_engines)
+
+    def shard_for_id(self, id: int) -> str:
+        return self.shard_ids[id % len(self.shard_ids)]
+
+    def shard_chooser(self, mapper, instance, clause=None) -> str:
+        if mapper is None or mapper.local_table.name not in SHARDED_TABLES:
+            return DIRECTORY
+        if instance is not None:
+            state = inspect(instance)
+            if state.identity_token is not None:
+                return state.identity_token
+            return self.shard_for_id(instance.id)
+        raise ValueError(f"Cannot choose a shard for {mapper.class_.__name__} without an instance")
+
+    def identity_chooser(self, mapper, primary_key, *, lazy_loaded_from, **kw) -> List[str]:
+        if mapper.local_table.name not in SHARDED_TABLES:
+            return [DIRECTORY]
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token is not None:
+            return [lazy_loaded_from.identity_token]
+        return [self.shard_for_id(primary_key[0])]
+
+    def execute_chooser(self, orm_context) -> List[str]:
+        mapper = orm_context.bind_mapper
+        if mapper is not None and mapper.local_table.name in SHARD_LOCAL_TABLES:
+            return self.shard_ids
+        if mapper is None or mapper.local_table.name not in SHARDED_TABLES:
+            return [DIRECTORY]
+
+        # Related rows are co-located, so lazy loads stay on the parent's shard
+        lazy_loaded_from = orm_context.lazy_loaded_from
+        if lazy_loaded_from is not None and lazy_loaded_from.identity_token is not None:
+            return [lazy_loaded_from.identity_token]
+
+        table = mapper.local_table
+        statement = orm_context.statement
+
+        ids = _criteria_values(statement, table, "id")
+        if ids is None and table.name in EMPLOYMENT_TABLES:
+            ids = _criteria_values(statement, table, "customer_id")
+        if ids is None and table.name in CUSTOMER_TABLES:
+            emails = _criteria_values(statement, table, "email")
+            if emails is not None:
+                ids = lookup_customer_ids(orm_context.session, emails)
+
+        if ids is None:
+            return self.shard_ids
+        # A lookup that matches nothing still needs a shard to return an empty result
+        return sorted({self.shard_for_id(id) for id in ids}) or self.shard_ids[:1]
+
+    def scatter_gather(self, query: Query, order_by: list, skip: int, limit: int) -> tuple[list, int]:
+        """
+        Run a list query on every shard and merge the sorted pages.
+
+        Each shard returns at most `skip + limit` rows, so keyset pagination
+        (filtering past the last seen key, skip=0) keeps the per-shard cost at
+        `limit` rows.
+        """
+        query = query.order_by(*order_by)
+        keys = [column.key for column in order_by]
+
+        total = 0
+        pages = []
+        for shard_id in self.shard_ids:
+            shard_query = query.set_shard(shard_id)
+            total += shard_query.order_by(None).count()
+            pages.append(shard_query.limit(skip + limit).all())
+
+        merged = heapq.merge(*pages, key=lambda row: tuple(getattr(row, key) for key in keys))
+        return list(itertools.islice(merged, skip, skip + limit)), total
+
+
+def _criteria_values(statement, table, column_name: str) -> Optional[list]:
+    """Return the values a top-level `column == x` or `column IN (...)` criterion allows."""
+    whereclause = getattr(statement, "whereclause", None)
+    if whereclause is None:
+        return None
+
+    if isinstance(whereclause, BooleanClauseList) and whereclause.operator is operators.and_:
+        criteria = whereclause.clauses
+    else:
+        criteria = [whereclause]
+
+    for criterion in criteria:
+        if not isinstance(criterion, BinaryExpression) or not isinstance(criterion.right, BindParameter):
+            continue
+        column = criterion.left
+        if getattr(column, "table", None) is not table or column.key != column_name:
+            continue
+        if criterion.operator is operators.eq:
+            return [criterion.right.effective_value]
+        if criterion.operator is operators.in_op:
+            return list(criterion.right.effective_value)
+
+    return None
+
+
+def _directory_connection(session: Session):
+    return session.connection(bind_arguments={"shard_id": DIRECTORY})
+
+
+def lookup_customer_ids(session: Session, emails: list) -> List[int]:
+    from app import models
+
+    directory = models.CustomerDirectory.__table__
+    return list(_directory_connection(session).execute(
+        select(directory.c.customer_id).where(directory.c.email.in_(emails))
+    ).scalars())
+
+
+def _sync_directory(session: Session, flush_context, instances) -> None:
+    """Allocate ids for new rows and mirror email changes into the directory."""
+    from app import models
+
+    router: ShardRouter = session.info["shard_router"]
+    directory = models.CustomerDirectory.__table__
+    allocations = models.EmploymentIdAllocation.__table__
+
+    for instance in list(session.new):
+        if isinstance(instance, models.Customer) and instance.id is None:
+            result = _directory_connection(session).execute(
+                insert(directory).values(email=instance.email)
+            )
+            instance.id = result.inserted_primary_key[0]
+
+    for instance in list(session.new):
+        if isinstance(instance, models.Employment) and instance.id is None:
+            customer_id = instance.customer_id or instance.customer.id
+            result = _directory_connection(session).execute(insert(allocations).values())
+            # Keep the employment on its customer's shard: id % N == customer_id % N
+            shard_count = len(router.shard_ids)
+            instance.customer_id = customer_id
+            instance.id = result.inserted_primary_key[0] * shard_count + customer_id % shard_count
+
+    for instance in session.dirty:
+        if isinstance(instance, models.Customer) and inspect(instance).attrs.email.history.has_changes():
+            _directory_connection(session).execute(
+                update(directory).where(directory.c.customer_id == instance.id).values(email=instance.email)
+            )
+
+    for instance in session.deleted:
+        if isinstance(instance, models.Customer):
+            _directory_connection(session).execute(
+                delete(directory).where(directory.c.customer_id == instance.id)
+            )
+
+
+def make_sharded_sessionmaker(
+    directory_engine: Engine,
+    shard_engines: Dict[str, Engine],
+    twophase: bool = False
+) -> sessionmaker:
+    router = ShardRouter(shard_engines)
+    factory = sessionmaker(
+        class_=ShardedSession,
+        autocommit=False,
+        autoflush=False,
+        twophase=twophase,
+        shards={DIRECTORY: directory_engine, **shard_engines},
+        shard_chooser=router.shard_chooser,
+        identity_chooser=router.identity_chooser,
+        execute_chooser=router.execute_chooser,
+        info={"shard_router": router},
+    )
+    event.listen(factory, "before_flush", _sync_directory)
+    return factory
+
+
+def get_router(session: Session) -> Optional[ShardRouter]:
+    """Return the shard router for a sharded session, or None when sharding is disabled."""
+    return session.info.get("shard_router")
+
+
+def shard_id_of(session: Session, instance) -> Optional[str]:
+    """Return the shard holding a customer or employment row, or None when sharding is disabled."""
+    router = get_router(session)
+    if router is None:
+        return None
+    return inspect(instance).identity_token or router.shard_for_id(instance.id)
+
+
+def connection_for_shard(session: Session, shard_id: Optional[str]):
+    """The session's connection to a shard, or its only connection when sharding is disabled."""
+    if shard_id is None:
+        return session.connection()
+    return session.connection(bind_arguments={"shard_id": shard_id})
+
+
+def _orphaned_customer_ids(session: Session, customer_ids: List[int]) -> List[int]:
+    from app import models
+
+    router = get_router(session)
+    ids_by_shard: Dict[str, List[int]] = {}
+    for customer_id in customer_ids:
+        ids_by_shard.setdefault(router.shard_for_id(customer_id), []).append(customer_id)
+
+    found = set()
+    for shard_id, shard_customer_ids in ids_by_shard.items():
+        connection = connection_for_shard(session, shard_id)
+        for table in (models.Customer.__table__, models.ArchivedCustomer.__table__):
+            found.update(connection.execute(
+                select(table.c.id).where(table.c.id.in_(shard_customer_ids))
+            ).scalars())
+    return [customer_id for customer_id in customer_ids if customer_id not in found]
+
+
+def repair_directory(session_factory, grace_seconds: float = 5.0, batch_size: int = 1000) -> int:
+    """
+    Remove directory entries whose customer is on no shard, returning how many.
+
+    Entries are removed only if the customer is still missing `grace_seconds`
+    after they were first found, so a customer whose shard commit is just
+    behind its directory commit is left alone.
+    """
+    from app import models
+
+    directory = models.CustomerDirectory.__table__
+    candidates = []
+    db = session_factory()
+    try:
+        last_id = 0
+        while True:
+            customer_ids = list(_directory_connection(db).execute(
+                select(directory.c.customer_id).where(directory.c.customer_id > last_id)
+                .order_by(directory.c.customer_id).limit(batch_size)
+            ).scalars())
+            if not customer_ids:
+                break
+            candidates.extend(_orphaned_customer_ids(db, customer_ids))
+            last_id = customer_ids[-1]
+            # Read each batch in a fresh transaction, so the recheck below sees new commits
+            db.rollback()
+        if not candidates:
+            return 0
+
+        time.sleep(grace_seconds)
+        db.rollback()
+        orphaned = []
+        for start in range(0, len(candidates), batch_size):
+            orphaned.extend(_orphaned_customer_ids(db, candidates[start:start + batch_size]))
+        for start in range(0, len(orphaned), batch_size):
+            _directory_connection(db).execute(
+                delete(directory).where(directory.c.customer_id.in_(orphaned[start:start + batch_size]))
+            )
+        db.commit()
+        return len(orphaned)
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Remove customer directory entries left without a customer by a failed shard commit."
+    )
+    parser.add_argument("--grace-seconds", type=float, default=5.0, help="How long a missing customer may be in flight")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal, shard_engines
+
+    if not shard_engines:
+        print("Sharding is disabled, there is no customer directory to repair")
+        return
+    print(f"Removed {repair_directory(SessionLocal, grace_seconds=args.grace_seconds)} orphaned directory entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from fastapi import Request, Response
+from app.config import settings
+from app.content_negotiation import ContentNegotiationRoute
+from app.database import LAST_WRITE_COOKIE
+
+
+class SingleFlight:
+    """
+    Merge concurrent calls with the same key into one.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still running wait for the same result instead of starting their own.
+    Once the call finishes the key is released, so results are never reused
+    for later callers.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Tuple[asyncio.Task, Optional[Callable[[], None]]]] = {}
+
+    def _release(self, key: Hashable, task: asyncio.Task) -> None:
+        if key in self._calls and self._calls[key][0] is task:
+            del self._calls[key]
+
+    async def do(
+        self,
+        key: Hashable,
+        call: Callable[[], Awaitable[Any]],
+        on_share: Optional[Callable[[], None]] = None
+    ) -> Tuple[Any, bool]:
+        """
+        Return the result of `call` (or of the call already running for `key`)
+        and whether it was shared. The `on_share` of the caller that started
+        the call runs whenever another caller joins it.
+        """
+        running = self._calls.get(key)
+        shared = running is not None
+        if shared:
+            task, started_on_share = running
+            if started_on_share:
+                started_on_share()
+        else:
+            task = asyncio.ensure_future(call())
+            self._calls[key] = (task, on_share)
+            task.add_done_callback(lambda done: self._release(key, done))
+        # Shielded so a caller that goes away does not cancel the call for the others
+        return await asyncio.shield(task), shared
+
+
+single_flight = SingleFlight()
+
+
+class SingleFlightRoute(ContentNegotiationRoute):
+    """
+    Route that serves concurrent identical GET requests with one execution.
+
+    Requests are identical when they have the same path, query string and
+    Accept header. Every request gets its own copy of the one rendered
+    response, so the database query and serialization run once.
+    """
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def single_flight_handler(request: Request) -> Response:
+            # Clients inside their read-your-writes window read from the primary, keep them separate
+            if (
+                not settings.single_flight_enabled
+                or request.method != "GET"
+                or LAST_WRITE_COOKIE in request.cookies
+            ):
+                return await handler(request)
+
+            async def render() -> Tuple[bytes, int, list]:
+                # Snapshot the response before it is sent, middleware may edit the headers in place
+                response = await handler(request)
+                return response.body, response.status_code, list(response.raw_headers)
+
+            # Once other requests wait for this one's response, its client leaving must not cancel it
+            deadline = getattr(request.state, "deadline", None)
+            on_share = deadline.keep_on_disconnect if deadline else None
+
+            key = (request.url.path, request.url.query, request.headers.get("accept", ""))
+            (body, status_code, raw_headers), _ = await single_flight.do(key, render, on_share)
+
+            response = Response(content=body, status_code=status_code)
+            response.raw_headers = list(raw_headers)
+            return response
+
+        return single_flight_handler
@@ -0,0 +1,179 @@
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy.engine import Engine
+from app.config import settings
+
+# Online snapshots of the SQLite databases with the SQLite backup API.
+#
+# The backup copies `snapshot_pages_per_step` pages at a time on its own
+# connection and pauses between steps. In WAL mode it copies from one read
+# transaction: writers are never blocked and the snapshot is the database
+# as of the start. With a rollback journal a step holds a shared lock only
+# while it copies, so writers wait at most one step, and the pause lets
+# them in. A write by another connection restarts the copy from the start,
+# which keeps the snapshot consistent. After `snapshot_max_restarts`
+# restarts the remaining pages are copied in one step, so a busy database
+# is still snapshotted.
+
+
+class SnapshotError(Exception):
+    pass
+
+
+class SnapshotInProgress(SnapshotError):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+_lock = threading.Lock()
+
+
+def snapshot_databases() -> Dict[str, Engine]:
+    """The databases a snapshot covers by name: the primary and every shard."""
+    from app.database import engine, shard_engines
+
+    return {
+        "primary": engine,
+        **{f"shard_{shard_id}": shard_engine for shard_id, shard_engine in shard_engines.items()},
+    }
+
+
+def _database_path(database_engine: Engine) -> str:
+    path = database_engine.url.database
+    if database_engine.dialect.name != "sqlite" or not path or path == ":memory:":
+        raise SnapshotError("Online snapshots are supported for file-based SQLite databases only")
+    return path
+
+
+def _copy(source: sqlite3.Connection, path: str, pages: int, pause: float, max_restarts: Optional[int]) -> dict:
+    progress = {"steps": 0, "restarts": 0, "remaining": None, "pages": 0}
+
+    def on_progress(status, remaining, total):
+        # More pages left than after the previous step means the copy started over
+        if progress["remaining"] is not None and remaining > progress["remaining"]:
+            progress["restarts"] += 1
+            if max_restarts is not None and progress["restarts"] > max_restarts:
+                raise _TooManyRestarts()
+        progress["steps"] += 1
+        progress["remaining"] = remaining
+        progress["pages"] = total
+        if remaining and pause:
+            time.sleep(pause)
+
+    target = sqlite3.connect(path)
+    try:
+        source.backup(target, pages=pages, progress=on_progress)
+        # A single self-contained file, even when copied from a WAL database
+        target.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        target.close()
+    return progress
+
+
+def backup(
+    database_engine: Engine,
+    path: str,
+    pages_per_step: Optional[int] = None,
+    pause_ms: Optional[int] = None,
+    max_restarts: Optional[int] = None
+) -> dict:
+    """
+    Copy a live SQLite database to `path` without stopping writers,
+    returning the size, duration and throughput of the copy.
+    """
+    source_path = _database_path(database_engine)
+    pages_per_step = pages_per_step or settings.snapshot_pages_per_step
+    pause = (settings.snapshot_step_pause_ms if pause_ms is None else pause_ms) / 1000
+    max_restarts = settings.snapshot_max_restarts if max_restarts is None else max_restarts
+
+    # Written next to the destination and moved there once complete
+    partial_path = f"{path}.partial"
+    started = time.perf_counter()
+    source = sqlite3.connect(source_path, timeout=30, isolation_level=None)
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # Pin the current snapshot, later commits go to the WAL and are not seen
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        try:
+            progress = _copy(source, partial_path, pages_per_step, pause, max_restarts)
+            single_step = False
+        except _TooManyRestarts:
+            os.remove(partial_path)
+            progress = _copy(source, partial_path, -1, 0, None)
+            progress["restarts"] += max_restarts + 1
+            single_step = True
+        os.replace(partial_path, path)
+    except sqlite3.Error as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise SnapshotError(f"Snapshot failed: {e}")
+    finally:
+        source.close()
+
+    duration = time.perf_counter() - started
+    size = os.path.getsize(path)
+    return {
+        "path": path,
+        "bytes": size,
+        "pages": progress["pages"],
+        "steps": progress["steps"],
+        "restarts": progress["restarts"],
+        "single_step": single_step,
+        "duration_seconds": round(duration, 3),
+        "throughput_mb_per_second": round(size / duration / 1e6, 1) if duration else None,
+    }
+
+
+def create_snapshots(directory: Optional[str] = None, databases: Optional[List[str]] = None) -> List[dict]:
+    """
+    Snapshot the named databases (all by default) into a new timestamped
+    folder of `directory`. Only one snapshot runs at a time,
+    SnapshotInProgress is raised while another is in progress.
+    """
+    engines = snapshot_databases()
+    names = databases or list(engines)
+    unknown = [name for name in names if name not in engines]
+    if unknown:
+        raise SnapshotError(f"Unknown databases: {', '.join(unknown)}")
+
+    if not _lock.acquire(blocking=False):
+        raise SnapshotInProgress("Another snapshot is in progress")
+    try:
+        created_at = datetime.utcnow()
+        folder = os.path.join(directory or settings.snapshot_directory, created_at.strftime("%Y%m%dT%H%M%S%f"))
+        os.makedirs(folder, exist_ok=True)
+        return [
+            {"database": name, "created_at": created_at, **backup(engines[name], os.path.join(folder, f"{name}.db"))}
+            for name in names
+        ]
+    finally:
+        _lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Snapshot the live SQLite databases without stopping the API."
+    )
+    parser.add_argument("--directory", default=None, help="Defaults to SNAPSHOT_DIRECTORY")
+    parser.add_argument("--database", action="append", default=None, help="primary or shard_<id>, repeatable (default: all)")
+    args = parser.parse_args()
+
+    for snapshot in create_snapshots(directory=args.directory, databases=args.database):
+        print(
+            f"{snapshot['database']}: {snapshot['path']}, {snapshot['bytes']} bytes in "
+            f"{snapshot['duration_seconds']}s ({snapshot['throughput_mb_per_second']} MB/s, "
+            f"{snapshot['restarts']} restarts)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import bisect
+import heapq
+import threading
+from collections import Counter
+from typing import Dict, List, Tuple
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+from app import models
+
+# In-memory typeahead index of employment values (GET /employments/suggest).
+#
+# For each field the distinct values are kept as a sorted list of case-folded
+# keys, so the values starting with a prefix are a contiguous slice found
+# with two binary searches, plus how many employments use each spelling for
+# ranking. The index is loaded from the database at startup and then
+# adjusted from the employments flushed by every transaction this process
+# commits. Writes made by other server processes show up after a restart.
+
+FIELDS = ("company_name", "job_title")
+
+_MAX_CACHED_PREFIXES = 10000
+_LAST_CHARACTER = chr(0x10FFFF)
+
+
+def normalize(value: str) -> str:
+    """Case-folded value with runs of whitespace collapsed, keeping a trailing space."""
+    key = " ".join(value.split())
+    if key and value[-1:].isspace():
+        key += " "
+    return key.casefold()
+
+
+class SuggestionIndex:
+    def __init__(self, fields: Tuple[str, ...] = FIELDS):
+        self._lock = threading.Lock()
+        self.fields = fields
+        self.built = False
+        self._reset()
+
+    def _reset(self) -> None:
+        self._keys: Dict[str, List[str]] = {field: [] for field in self.fields}
+        self._totals: Dict[str, Dict[str, int]] = {field: {} for field in self.fields}
+        self._spellings: Dict[str, Dict[str, Counter]] = {field: {} for field in self.fields}
+        # Answers per (prefix, limit), dropped whenever the field changes
+        self._cache: Dict[str, Dict[Tuple[str, int], list]] = {field: {} for field in self.fields}
+
+    def rebuild(self, session_factory) -> None:
+        """Load the index from the database, replacing its contents."""
+        db = session_factory()
+        try:
+            with self._lock:
+                self._reset()
+                for field in self.fields:
+                    column = getattr(models.Employment, field)
+                    # Sharded sessions return one group per shard, the counts are added up
+                    for value, count in db.query(column, func.count()).group_by(column):
+                        self._add(field, value, count)
+                self.built = True
+        finally:
+            db.close()
+
+    def _add(self, field: str, value, count: int) -> None:
+        if not value:
+            return
+        key = normalize(value)
+        totals = self._totals[field]
+        spellings = self._spellings[field]
+
+        if key not in totals:
+            if count <= 0:
+                return
+            bisect.insort(self._keys[field], key)
+            totals[key] = 0
+            spellings[key] = Counter()
+        totals[key] += count
+        spellings[key][value] += count
+
+        if totals[key] <= 0:
+            keys = self._keys[field]
+            del keys[bisect.bisect_left(keys, key)]
+            del totals[key]
+            del spellings[key]
+        elif spellings[key][value] <= 0:
+            del spellings[key][value]
+        self._cache[field].clear()
+
+    def apply(self, deltas: Dict[Tuple[str, str], int]) -> None:
+        """Add {(field, value): count} changes to the index."""
+        if not self.built:
+            return
+        with self._lock:
+            for (field, value), count in deltas.items():
+                if count:
+                    self._add(field, value, count)
+
+    def _spelling(self, field: str, key: str) -> str:
+        # Most common spelling, ties broken alphabetically so the choice does not depend on load order
+        return min(self._spellings[field][key].items(), key=lambda item: (-item[1], item[0]))[0]
+
+    def suggest(self, field: str, prefix: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """
+        The `limit` most used values of `field` starting with `prefix`, ignoring
+        case, as (value, number of employments) pairs. Each value is shown in
+        its most common spelling.
+        """
+        key = normalize(prefix)
+        with self._lock:
+            cache = self._cache[field]
+            cached = cache.get((key, limit))
+            if cached is not None:
+                return cached
+
+            keys = self._keys[field]
+            totals = self._totals[field]
+            start = bisect.bisect_left(keys, key)
+            end = bisect.bisect_right(keys, key + _LAST_CHARACTER, start)
+            best = heapq.nsmallest(
+                limit,
+                (keys[i] for i in range(start, end)),
+                key=lambda candidate: (-totals[candidate], candidate)
+            )
+            result = [(self._spelling(field, match), totals[match]) for match in best]
+
+            if len(cache) >= _MAX_CACHED_PREFIXES:
+                cache.clear()
+            cache[(key, limit)] = result
+            return result
+
+
+suggestion_index = SuggestionIndex()
+
+
+def _value(instance, field: str, previous: bool):
+    if previous:
+        history = inspect(instance).attrs[field].history
+        if history.deleted:
+            return history.deleted[0]
+    return getattr(instance, field)
+
+
+def record(session: Session, employment, sign: int, previous: bool = False) -> None:
+    """Count an employment (model or row) in or out of the index when the session commits."""
+    deltas = session.info.setdefault("suggestion_deltas", Counter())
+    for field in FIELDS:
+        value = _value(employment, field, previous)
+        if value:
+            deltas[(field, value)] += sign
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_suggestion_deltas(session, flush_context):
+    for instance in session.new:
+        if isinstance(instance, models.Employment):
+            record(session, instance, 1)
+
+    for instance in session.deleted:
+        if isinstance(instance, models.Employment):
+            record(session, instance, -1, previous=True)
+
+    for instance in session.dirty:
+        if isinstance(instance, models.Employment) and any(
+            inspect(instance).attrs[field].history.has_changes() for field in FIELDS
+        ):
+            record(session, instance, -1, previous=True)
+            record(session, instance, 1)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_suggestion_deltas(session):
+    deltas = session.info.pop("suggestion_deltas", None)
+    if deltas:
+        suggestion_index.apply(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_suggestion_deltas(session):
+    session.info.pop("suggestion_deltas", None)
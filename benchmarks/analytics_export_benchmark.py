@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Compare loading all customers by paging the JSON API with an analytics export.
+
+Seeds customers with their employment, then loads every customer once by
+paging GET /customers with keyset pagination, 1000 per page, and once by
+exporting both tables and reading the customers file back through a memory
+map, in Arrow IPC and Parquet. Reports the time of each and, from a second
+run, the peak memory Python allocated (pyarrow's own buffers are not
+counted). Needs pyarrow.
+
+Usage: python benchmarks/analytics_export_benchmark.py [customers]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Benchmark against a throwaway database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/analytics_export_benchmark.db"
+os.environ["ANALYTICS_EXPORT_DIRECTORY"] = tempfile.mkdtemp()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from app import crud, schemas
+from app.analytics_export import create_export, read_export
+from app.config import settings
+from app.database import SessionLocal
+from app.main import app
+
+
+def seed(rows: int) -> None:
+    db = SessionLocal()
+    try:
+        for start in range(0, rows, 1000):
+            crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(db, [
+                schemas.CustomerRegistration(
+                    customer=schemas.CustomerCreate(
+                        first_name="John",
+                        last_name=f"Doe{i}",
+                        email=f"john.doe{i}@example.com",
+                        phone="+1-555-123-4567",
+                        date_of_birth="1990-01-15",
+                        address="123 Main Street",
+                        city="New York",
+                        state="NY",
+                        postal_code="10001",
+                        country="USA",
+                    ),
+                    employment=schemas.EmploymentCreate(
+                        company_name="Tech Corp",
+                        job_title="Software Engineer",
+                        employment_type="Full-time",
+                        start_date="2020-03-01",
+                    ),
+                )
+                for i in range(start, min(start + 1000, rows))
+            ])
+    finally:
+        db.close()
+
+
+def page_api(client: TestClient) -> int:
+    prefix = settings.api_v1_str
+    loaded = []
+    after_id = 0
+    while True:
+        response = client.get(f"{prefix}/customers/?limit=1000&after_id={after_id}")
+        assert response.status_code == 200, response.text
+        customers = response.json()["customers"]
+        if not customers:
+            return len(loaded)
+        loaded.extend(customers)
+        after_id = customers[-1]["id"]
+
+
+def export_and_read(export_format: str) -> int:
+    exports = create_export(export_format=export_format)
+    table = read_export(next(export["path"] for export in exports if export["table"] == "customers"))
+    return table.num_rows
+
+
+def measure(load) -> tuple:
+    """Rows, seconds, and peak MB allocated by Python in a second, traced run."""
+    start = time.perf_counter()
+    rows = load()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    load()
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return rows, seconds, peak
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    settings.single_flight_enabled = False
+    settings.admission_control_enabled = False
+    settings.request_deadline_bulk_ms = 0
+
+    with TestClient(app) as client:
+        seed(rows)
+        print(f"{rows} customers")
+        print(f"{'load':<28}{'rows':>10}{'seconds':>10}{'peak MB':>10}")
+        for name, load in (
+            ("JSON API, 1000 per page", lambda: page_api(client)),
+            ("Arrow IPC export + read", lambda: export_and_read("arrow")),
+            ("Parquet export + read", lambda: export_and_read("parquet")),
+        ):
+            loaded, seconds, peak = measure(load)
+            print(f"{name:<28}{loaded:>10}{seconds:>10.2f}{peak:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
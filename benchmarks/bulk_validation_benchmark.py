@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Compare column-wise batch validation with per-row Pydantic validation.
+
+Validates a batch of CustomerRegistration payloads both ways, checks that
+they produce the same objects, and reports the time taken by each.
+
+Usage: python benchmarks/bulk_validation_benchmark.py [rows]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pydantic import ValidationError
+from app import schemas
+from app.bulk_validation import validate_batch
+
+
+def build_rows(rows: int) -> list:
+    return [
+        {
+            "customer": {
+                "first_name": "John",
+                "last_name": f"Doe{i}",
+                "email": f"john.doe{i}@example.com",
+                "phone": "+1-555-123-4567",
+                "date_of_birth": "1990-01-15",
+                "address": "123 Main Street, Apartment 4B",
+                "city": "New York",
+                "state": "NY",
+                "postal_code": "10001",
+                "country": "USA",
+            },
+            "employment": {
+                "company_name": "Tech Corp",
+                "job_title": "Software Engineer",
+                "department": "Engineering",
+                "employment_type": "Full-time",
+                "start_date": "2020-03-01",
+                "salary": "$80,000",
+                "work_city": "New York",
+                "work_country": "USA",
+            },
+        }
+        for i in range(rows)
+    ]
+
+
+def validate_per_row(rows: list) -> list:
+    results = []
+    for row in rows:
+        try:
+            results.append(schemas.CustomerRegistration.model_validate(row))
+        except ValidationError:
+            results.append(None)
+    return results
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    payload = build_rows(rows)
+
+    start = time.perf_counter()
+    batch, _ = validate_batch(schemas.CustomerRegistration, payload)
+    batch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    per_row = validate_per_row(payload)
+    per_row_seconds = time.perf_counter() - start
+
+    identical = all(a.model_dump() == b.model_dump() for a, b in zip(batch, per_row))
+
+    print(f"{rows} registrations")
+    print(f"{'method':<12}{'seconds':>10}{'rows/s':>12}")
+    print(f"{'per-row':<12}{per_row_seconds:>10.2f}{rows / per_row_seconds:>12.0f}")
+    print(f"{'batch':<12}{batch_seconds:>10.2f}{rows / batch_seconds:>12.0f}")
+    print(f"identical results: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Compare the per-lookup overhead of the ORM and Core read paths.
+
+Looks up customers by id and by email, and current employments by customer,
+through CustomerCRUD/EmploymentCRUD (legacy Query API, ORM objects) and
+through ReadCRUD (prebuilt Core statements, row mappings). Each lookup
+includes building the response schema the endpoint would return, and uses a
+fresh session like a request does.
+
+Usage: python benchmarks/core_read_benchmark.py [lookups per path]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Benchmark against a throwaway database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/core_read_benchmark.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models, schemas
+from app.database import SessionLocal, engine
+
+ROWS = 1000
+
+
+def seed() -> None:
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        registrations = [
+            schemas.CustomerRegistration(
+                customer=schemas.CustomerCreate(
+                    first_name="John",
+                    last_name=f"Doe{i}",
+                    email=f"john.doe{i}@example.com",
+                    phone="+1-555-123-4567",
+                    date_of_birth="1990-01-15",
+                    address="123 Main Street",
+                    city="New York",
+                    state="NY",
+                    postal_code="10001",
+                    country="USA",
+                ),
+                employment=schemas.EmploymentCreate(
+                    company_name="Tech Corp",
+                    job_title="Software Engineer",
+                    employment_type="Full-time",
+                    start_date="2020-03-01",
+                ),
+            )
+            for i in range(ROWS)
+        ]
+        crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(db, registrations)
+    finally:
+        db.close()
+
+
+def orm_customer(db, i):
+    customer = crud.CustomerCRUD.get_customer(db, i)
+    return schemas.CustomerResponse.model_validate(customer)
+
+
+def core_customer(db, i):
+    return schemas.CustomerResponse(**crud.ReadCRUD.get_customer(db, i))
+
+
+def orm_customer_by_email(db, i):
+    customer = crud.CustomerCRUD.get_customer_by_email(db, f"john.doe{i - 1}@example.com")
+    return schemas.CustomerResponse.model_validate(customer)
+
+
+def core_customer_by_email(db, i):
+    return schemas.CustomerResponse(**crud.ReadCRUD.get_customer_by_email(db, f"john.doe{i - 1}@example.com"))
+
+
+def orm_employment(db, i):
+    return schemas.EmploymentResponse.model_validate(crud.EmploymentCRUD.get_employment_by_customer(db, i))
+
+
+def core_employment(db, i):
+    return schemas.EmploymentResponse.model_validate(crud.ReadCRUD.get_employment_by_customer(db, i))
+
+
+def measure(lookup, lookups: int) -> float:
+    """Microseconds per lookup."""
+    start = time.perf_counter()
+    for n in range(lookups):
+        db = SessionLocal()
+        try:
+            lookup(db, n % ROWS + 1)
+        finally:
+            db.close()
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def main():
+    lookups = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    seed()
+
+    cases = [
+        ("customer by id", orm_customer, core_customer),
+        ("customer by email", orm_customer_by_email, core_customer_by_email),
+        ("employment by customer", orm_employment, core_employment),
+    ]
+
+    print(f"{lookups} lookups per path, microseconds per lookup")
+    print(f"{'lookup':<26}{'ORM':>10}{'Core':>10}{'speedup':>10}")
+    for name, orm_lookup, core_lookup in cases:
+        # Warm up the statement caches
+        measure(orm_lookup, 100)
+        measure(core_lookup, 100)
+        orm = measure(orm_lookup, lookups)
+        core = measure(core_lookup, lookups)
+        print(f"{name:<26}{orm:>10.1f}{core:>10.1f}{orm / core:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
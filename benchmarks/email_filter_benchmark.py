@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Measure the email pre-check filter on registrations.
+
+Seeds customers, then registers new customers one at a time through the API
+and in batches of 1000, with the email filter enabled and disabled, and
+reports the mean time of each. With the filter the email existence query is
+skipped for new emails. Finally checks unregistered emails against the filter
+and compares the measured false-positive rate with the target, alongside the
+filter's memory.
+
+Usage: python benchmarks/email_filter_benchmark.py [registrations per run]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Benchmark against a throwaway database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/email_filter_benchmark.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from app import crud, schemas
+from app.config import settings
+from app.database import SessionLocal
+from app.email_filter import email_filter
+from app.main import app
+
+ROWS = 20000
+
+
+def registration(i: int) -> dict:
+    return {
+        "customer": {
+            "first_name": "John",
+            "last_name": f"Doe{i}",
+            "email": f"john.doe{i}@example.com",
+            "phone": "+1-555-123-4567",
+            "date_of_birth": "1990-01-15",
+            "address": "123 Main Street",
+            "city": "New York",
+            "state": "NY",
+            "postal_code": "10001",
+            "country": "USA",
+        },
+        "employment": {
+            "company_name": "Tech Corp",
+            "job_title": "Software Engineer",
+            "employment_type": "Full-time",
+            "start_date": "2020-03-01",
+        },
+    }
+
+
+def register_batches(first: int, count: int) -> None:
+    db = SessionLocal()
+    try:
+        for start in range(first, first + count, 1000):
+            crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(
+                db,
+                [schemas.CustomerRegistration(**registration(i)) for i in range(start, start + 1000)]
+            )
+    finally:
+        db.close()
+
+
+def measure_api(client: TestClient, first: int, count: int) -> float:
+    """Milliseconds per registration."""
+    prefix = settings.api_v1_str
+    start = time.perf_counter()
+    for i in range(first, first + count):
+        response = client.post(f"{prefix}/registration/", json=registration(i))
+        assert response.status_code == 201, response.text
+    return (time.perf_counter() - start) / count * 1000
+
+
+def measure_batches(first: int, count: int) -> float:
+    """Milliseconds per registration."""
+    start = time.perf_counter()
+    register_batches(first, count)
+    return (time.perf_counter() - start) / count * 1000
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    count = max(1000, count // 1000 * 1000)
+    settings.single_flight_enabled = False
+    settings.admission_control_enabled = False
+
+    with TestClient(app) as client:
+        register_batches(0, ROWS)
+        started = time.perf_counter()
+        email_filter.rebuild(SessionLocal)
+        print(f"filter built from {ROWS} emails in {time.perf_counter() - started:.2f}s")
+
+        print(f"{count} registrations per run, milliseconds per registration")
+        print(f"{'path':<18}{'no filter':>12}{'filter':>10}{'speedup':>10}")
+        next_id = ROWS
+        for name, measure in (("API, one by one", lambda first: measure_api(client, first, count)),
+                              ("batches of 1000", lambda first: measure_batches(first, count))):
+            timings = {}
+            for enabled in (False, True):
+                settings.email_filter_enabled = enabled
+                timings[enabled] = measure(next_id)
+                next_id += count
+            print(f"{name:<18}{timings[False]:>12.3f}{timings[True]:>10.3f}{timings[False] / timings[True]:>9.2f}x")
+
+    probes = 100000
+    hits = sum(email_filter.might_contain(f"nobody{i}@example.org") for i in range(probes))
+    stats = email_filter.stats()
+    print(
+        f"false positives: {hits / probes:.4f} measured, {stats['estimated_false_positive_rate']:.4f} estimated, "
+        f"{stats['target_false_positive_rate']:.4f} target; "
+        f"{stats['entries']} emails in {stats['memory_bytes'] / 1024:.0f} KiB, {stats['hashes']} hashes"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Compare customer reads served from the read model with the base table path.
+
+Requests customer details by id and by email, and list pages of 100
+customers, through the API with the read model enabled and disabled, and
+reports the mean latency of each. With the read model the responses are
+stored JSON fragments; without it the rows are loaded and serialized per
+request. Coalescing and admission control are turned off so every request
+runs its own query.
+
+Usage: python benchmarks/read_model_benchmark.py [requests per endpoint]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# Benchmark against a throwaway database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/read_model_benchmark.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from app import crud, schemas
+from app.config import settings
+from app.database import SessionLocal
+from app.main import app
+
+ROWS = 1000
+
+
+def seed() -> None:
+    db = SessionLocal()
+    try:
+        registrations = [
+            schemas.CustomerRegistration(
+                customer=schemas.CustomerCreate(
+                    first_name="John",
+                    last_name=f"Doe{i}",
+                    email=f"john.doe{i}@example.com",
+                    phone="+1-555-123-4567",
+                    date_of_birth="1990-01-15",
+                    address="123 Main Street",
+                    city="New York",
+                    state="NY",
+                    postal_code="10001",
+                    country="USA",
+                ),
+                employment=schemas.EmploymentCreate(
+                    company_name="Tech Corp",
+                    job_title="Software Engineer",
+                    employment_type="Full-time",
+                    start_date="2020-03-01",
+                ),
+            )
+            for i in range(ROWS)
+        ]
+        crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(db, registrations)
+    finally:
+        db.close()
+
+
+def measure(client: TestClient, url, requests: int) -> float:
+    """Milliseconds per request."""
+    start = time.perf_counter()
+    for n in range(requests):
+        response = client.get(url(n))
+        assert response.status_code == 200, response.text
+    return (time.perf_counter() - start) / requests * 1000
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    settings.single_flight_enabled = False
+    settings.admission_control_enabled = False
+    prefix = settings.api_v1_str
+
+    cases = [
+        ("customer by id", lambda n: f"{prefix}/customers/{n % ROWS + 1}"),
+        ("customer by email", lambda n: f"{prefix}/customers/email/john.doe{n % ROWS}@example.com"),
+        ("list, 100 per page", lambda n: f"{prefix}/customers/?skip={n % 10 * 100}&limit=100"),
+    ]
+
+    with TestClient(app) as client:
+        seed()
+        print(f"{requests} requests per endpoint, milliseconds per request")
+        print(f"{'endpoint':<22}{'tables':>10}{'read model':>12}{'speedup':>10}")
+        for name, url in cases:
+            # Warm up the statement caches
+            for enabled in (False, True):
+                settings.read_model_enabled = enabled
+                measure(client, url, 50)
+            settings.read_model_enabled = False
+            tables = measure(client, url, requests)
+            settings.read_model_enabled = True
+            projected = measure(client, url, requests)
+            print(f"{name:<22}{tables:>10.2f}{projected:>12.2f}{tables / projected:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
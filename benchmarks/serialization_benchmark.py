@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare JSON, MessagePack and CBOR for a customer list response.
+
+Encodes a page of CustomerWithEmploymentResponse items the way the API does
+and reports payload size and encode/decode time per format.
+
+Usage: python benchmarks/serialization_benchmark.py [rows]
+"""
+
+import json
+import os
+import sys
+import timeit
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app import schemas
+from app.content_negotiation import CBOR, JSON, MSGPACK, _decoders, _encoders
+
+
+def build_payload(rows: int) -> dict:
+    customers = []
+    for i in range(rows):
+        customers.append(schemas.CustomerWithEmploymentResponse(
+            id=i,
+            first_name="John",
+            last_name=f"Doe{i}",
+            email=f"john.doe{i}@example.com",
+            phone="+1-555-123-4567",
+            date_of_birth=date(1990, 1, 15),
+            address="123 Main Street, Apartment 4B",
+            city="New York",
+            state="NY",
+            postal_code="10001",
+            country="USA",
+            is_active=True,
+            created_at=datetime(2024, 1, 1, 12, 0, 0),
+            updated_at=datetime(2024, 6, 1, 12, 0, 0),
+            employment=schemas.EmploymentResponse(
+                id=i,
+                customer_id=i,
+                company_name="Tech Corp",
+                job_title="Software Engineer",
+                department="Engineering",
+                employment_type="Full-time",
+                start_date=date(2020, 3, 1),
+                salary="$80,000",
+                work_city="New York",
+                work_country="USA",
+                created_at=datetime(2024, 1, 1, 12, 0, 0),
+                updated_at=datetime(2024, 6, 1, 12, 0, 0),
+            ),
+        ))
+    return jsonable_encoder({"customers": customers, "total": rows, "page": 1, "size": rows})
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    payload = build_payload(rows)
+    number = 20
+
+    encoders = {JSON: lambda content: JSONResponse(content).body, **_encoders()}
+    decoders = {JSON: json.loads, **_decoders()}
+
+    print(f"{rows} customers with employment, best of 5 x {number} runs")
+    print(f"{'format':<22}{'bytes':>10}{'encode ms':>12}{'decode ms':>12}")
+    for media_type in (JSON, MSGPACK, CBOR):
+        if media_type not in encoders:
+            print(f"{media_type:<22}  (not installed)")
+            continue
+        body = encoders[media_type](payload)
+        encode = min(timeit.repeat(lambda: encoders[media_type](payload), number=number, repeat=5)) / number
+        decode = min(timeit.repeat(lambda: decoders[media_type](body), number=number, repeat=5)) / number
+        print(f"{media_type:<22}{len(body):>10}{encode * 1000:>12.2f}{decode * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
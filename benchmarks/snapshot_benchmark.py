@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Measure how online snapshots affect the latency of live requests.
+
+Runs a mix of customer reads and registrations for a few seconds, once on
+its own and once while snapshots of the database are taken back to back,
+and reports p50/p99 request latency of both runs with the snapshot
+duration, throughput and restarts. Pass --wal to run the database in WAL
+mode, where the copy reads one snapshot and never restarts.
+
+Usage: python benchmarks/snapshot_benchmark.py [seconds per run] [--wal]
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Benchmark against a throwaway database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/snapshot_benchmark.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from app import crud, schemas
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.main import app
+from app.snapshots import create_snapshots
+
+ROWS = 20000
+
+
+def registration(i: int) -> dict:
+    return {
+        "customer": {
+            "first_name": "John",
+            "last_name": f"Doe{i}",
+            "email": f"john.doe{i}@example.com",
+            "phone": "+1-555-123-4567",
+            "date_of_birth": "1990-01-15",
+            "address": "123 Main Street",
+            "city": "New York",
+            "state": "NY",
+            "postal_code": "10001",
+            "country": "USA",
+        },
+        "employment": {
+            "company_name": "Tech Corp",
+            "job_title": "Software Engineer",
+            "employment_type": "Full-time",
+            "start_date": "2020-03-01",
+        },
+    }
+
+
+def seed() -> None:
+    db = SessionLocal()
+    try:
+        for start in range(0, ROWS, 1000):
+            crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(
+                db,
+                [schemas.CustomerRegistration(**registration(i)) for i in range(start, start + 1000)]
+            )
+    finally:
+        db.close()
+
+
+def run_traffic(client: TestClient, seconds: float, first_id: int) -> list:
+    """Alternate reads and registrations for `seconds`, returning request latencies in milliseconds."""
+    prefix = settings.api_v1_str
+    latencies = []
+    deadline = time.monotonic() + seconds
+    n = 0
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        if n % 2:
+            client.post(f"{prefix}/registration/", json=registration(first_id + n))
+        else:
+            client.get(f"{prefix}/customers/{n % ROWS + 1}")
+        latencies.append((time.perf_counter() - start) * 1000)
+        n += 1
+    return latencies
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    seconds = float(args[0]) if args else 5.0
+    settings.single_flight_enabled = False
+    settings.admission_control_enabled = False
+
+    if "--wal" in sys.argv:
+        with engine.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode=WAL")
+
+    with TestClient(app) as client:
+        seed()
+        directory = tempfile.mkdtemp()
+
+        baseline = run_traffic(client, seconds, ROWS)
+
+        snapshots = []
+        stop = threading.Event()
+
+        def snapshot_loop():
+            while not stop.is_set():
+                snapshots.extend(create_snapshots(directory=directory, databases=["primary"]))
+
+        thread = threading.Thread(target=snapshot_loop)
+        thread.start()
+        during = run_traffic(client, seconds, ROWS * 10)
+        stop.set()
+        thread.join()
+
+    print(f"{'run':<18}{'requests':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, latencies in (("no snapshot", baseline), ("during snapshots", during)):
+        print(f"{name:<18}{len(latencies):>10}{statistics.median(latencies):>10.2f}{percentile(latencies, 0.99):>10.2f}")
+    print(
+        f"{len(snapshots)} snapshots of {snapshots[-1]['bytes'] / 1e6:.1f} MB, "
+        f"mean {statistics.mean(s['duration_seconds'] for s in snapshots):.3f}s, "
+        f"{statistics.mean(s['throughput_mb_per_second'] for s in snapshots):.0f} MB/s, "
+        f"{sum(s['restarts'] for s in snapshots)} restarts, "
+        f"{sum(s['single_step'] for s in snapshots)} finished in a single step"
+    )
+
+
+if __name__ == "__main__":
+    main()
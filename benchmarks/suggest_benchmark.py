@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Compare typeahead lookups in the suggestion index with the search query.
+
+Seeds employments with a few thousand distinct company names, then types
+each test name one character at a time. Every keystroke is answered by
+EmploymentCRUD.get_employments(search=...) (the `ilike('%..%')` scan that
+`GET /employments/?search=` runs) and by the in-memory suggestion index,
+first with a cold cache and then again with a warm one.
+
+Usage: python benchmarks/suggest_benchmark.py [employments]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Benchmark against a throwaway database
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/suggest_benchmark.db"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import crud, models, schemas
+from app.database import SessionLocal, engine
+from app.suggest import SuggestionIndex
+
+WORDS = ["Tech", "Global", "Acme", "North", "Blue", "Star", "Data", "Prime", "Green", "Atlas", "Nova", "Summit"]
+SUFFIXES = ["Corp", "Labs", "Systems", "Group", "Holdings", "Partners", "Solutions", "Industries"]
+
+
+def seed(rows: int) -> list:
+    random.seed(42)
+    names = [f"{a} {b} {c}" for a in WORDS for b in WORDS for c in SUFFIXES if a != b]
+    models.Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        registrations = [
+            schemas.CustomerRegistration(
+                customer=schemas.CustomerCreate(
+                    first_name="John",
+                    last_name=f"Doe{i}",
+                    email=f"john.doe{i}@example.com",
+                    phone="+1-555-123-4567",
+                    date_of_birth="1990-01-15",
+                    address="123 Main Street",
+                    city="New York",
+                    state="NY",
+                    postal_code="10001",
+                    country="USA",
+                ),
+                employment=schemas.EmploymentCreate(
+                    # Skewed so some companies are much more common than others
+                    company_name=names[int(random.paretovariate(1.2)) % len(names)],
+                    job_title="Software Engineer",
+                    employment_type="Full-time",
+                    start_date="2020-03-01",
+                ),
+            )
+            for i in range(rows)
+        ]
+        for start in range(0, rows, 1000):
+            crud.CustomerRegistrationCRUD.create_customers_with_employment_batch(db, registrations[start:start + 1000])
+    finally:
+        db.close()
+    return names
+
+
+def keystrokes(name: str) -> list:
+    return [name[:length] for length in range(1, len(name) + 1)]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    names = seed(rows)
+    typed = [prefix for name in random.sample(names, 10) for prefix in keystrokes(name)]
+
+    index = SuggestionIndex()
+    start = time.perf_counter()
+    index.rebuild(SessionLocal)
+    print(f"{rows} employments, {len(names)} possible company names, index built in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        for prefix in typed:
+            crud.EmploymentCRUD.get_employments(db, limit=10, search=prefix)
+        search = (time.perf_counter() - start) / len(typed)
+    finally:
+        db.close()
+
+    timings = []
+    for _ in ("cold", "warm"):
+        start = time.perf_counter()
+        for prefix in typed:
+            index.suggest("company_name", prefix, 10)
+        timings.append((time.perf_counter() - start) / len(typed))
+
+    print(f"{len(typed)} keystrokes, microseconds per keystroke")
+    print(f"{'search query (ilike)':<28}{search * 1e6:>12.1f}")
+    print(f"{'suggestion index, cold':<28}{timings[0] * 1e6:>12.1f}")
+    print(f"{'suggestion index, cached':<28}{timings[1] * 1e6:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()